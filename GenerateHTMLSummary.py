@@ -6,20 +6,31 @@ JSON files. It uses the data_processing, statistics, and html_generation modules
 to process the data, calculate statistics, and generate the HTML report.
 """
 import argparse
+import os
 import sys
-from typing import Any
+from typing import Any, Dict, List, Optional
 
 from gui import *
-from data_processing import load_spotify_data, process_spotify_data, aggregate_yearly_data
+from data_processing import iter_spotify_stores, process_spotify_data, process_spotify_data_incremental, \
+    aggregate_yearly_data, validate_spotify_files, export_signature
+from date_range import parse_date_range
+from entry_filter import EntryFilter
+from json_backends import AUTO_DECODER, DECODERS, resolve_decoder
+from stats_backends import AUTO_BACKEND, STATS_BACKENDS, resolve_backend
 from html_generation import build_year_tabs, build_all_section, build_year_sections, build_stats_html, \
     generate_html_content, write_html_to_file, generate_personality_html
-from statistics import calculate_all_stats
+from statistics import STATS, calculate_all_stats, calculate_year_stats
+from memory_guard import MemoryGuard
 from logging_config import configure_logging, log_exception, log_system_info
 
 # The script version. You can check the changelog at the GitHub URL to see if there is a new version.
 VERSION = "1.15.3"
 GITHUB_URL = "https://github.com/mbektic/Simple-SESH-Sumary/blob/main/CHANGELOG.md"
 
+# Aggregates of the last run in this process, so running again from the GUI with
+# only a different MIN_MILLISECONDS does not read the export again
+_last_run: Dict[str, Any] = {}
+
 # Parse command line arguments
 def parse_args():
     parser = argparse.ArgumentParser(description='Generate HTML summary from Spotify Extended Streaming History')
@@ -28,8 +39,69 @@ def parse_args():
     parser.add_argument('--log-file', help='Specify a log file name')
     parser.add_argument('--no-console-log', action='store_true', help='Disable console logging')
     parser.add_argument('--skip-gui', action='store_true', help='Skip GUI and use config.py values')
+    parser.add_argument('--workers', type=int, help='Number of worker processes used to read the JSON files (overrides config.py)')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the parsed entry cache')
+    parser.add_argument('--prefetch', type=int, metavar='N',
+                        help='Number of JSON files read ahead on a background thread, 0 to disable (overrides config.py)')
+    parser.add_argument('--json-decoder', choices=[*DECODERS, AUTO_DECODER],
+                        help='Library used to decode the JSON files (overrides config.py)')
+    parser.add_argument('--stats-backend', choices=[*STATS_BACKENDS, AUTO_BACKEND],
+                        help='Library used to calculate the statistics (overrides config.py)')
+    parser.add_argument('--session-gap', type=float, metavar='MINUTES',
+                        help='Plays further apart than this start a new listening session (overrides config.py)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Start from the stored aggregates and only apply new or changed files')
+    parser.add_argument('--from', dest='date_from', metavar='YYYY-MM-DD',
+                        help='Only include listens from this date on (overrides config.py)')
+    parser.add_argument('--to', dest='date_to', metavar='YYYY-MM-DD',
+                        help='Only include listens up to and including this date (overrides config.py)')
+    parser.add_argument('--filter', metavar='EXPRESSION',
+                        help='Only include listens matching a filter expression, '
+                             'e.g. \'platform ~ "android" and not incognito_mode\' (overrides config.py)')
+    parser.add_argument('--max-memory', type=int, metavar='MB',
+                        help='Stop if peak memory use goes over this many megabytes (overrides config.py)')
+    parser.add_argument('--validate-only', action='store_true',
+                        help='Only check the JSON files and log any problems, without building a report')
+    parser.add_argument('--sample', type=float, metavar='FRACTION',
+                        help='Share of the entries checked with --validate-only, e.g. 0.1 (overrides config.py)')
+    parser.add_argument('--stats', metavar='NAMES',
+                        help='Only calculate and print these comma-separated statistics or groups, '
+                             'without building a report. "list" shows the names')
     return parser.parse_args()
 
+
+def apply_cli_overrides(config: Any) -> None:
+    """
+    Override configuration values with any that were given on the command line.
+
+    Args:
+        config: Configuration object to update
+    """
+    if args.workers is not None:
+        config.WORKERS = args.workers
+    if args.no_cache:
+        config.USE_CACHE = False
+    if args.prefetch is not None:
+        config.PREFETCH_FILES = args.prefetch
+    if args.json_decoder is not None:
+        config.JSON_DECODER = args.json_decoder
+    if args.stats_backend is not None:
+        config.STATS_BACKEND = args.stats_backend
+    if args.session_gap is not None:
+        config.SESSION_GAP_MINUTES = args.session_gap
+    if args.incremental:
+        config.INCREMENTAL = True
+    if args.date_from is not None:
+        config.DATE_FROM = args.date_from
+    if args.date_to is not None:
+        config.DATE_TO = args.date_to
+    if args.filter is not None:
+        config.FILTER = args.filter
+    if args.max_memory is not None:
+        config.MAX_MEMORY_MB = args.max_memory
+    if args.sample is not None:
+        config.VALIDATE_SAMPLE = args.sample
+
 # Configure logging based on command line arguments
 args = parse_args()
 configure_logging(
@@ -38,10 +110,46 @@ configure_logging(
     console=not args.no_console_log
 )
 
-# Log system information for troubleshooting
-log_system_info()
+def validate_export(config: Any) -> bool:
+    """
+    Check the JSON files of an export and log any problems, without building a report.
+
+    Args:
+        config: Configuration object with attributes:
+            - INPUT_DIR: Directory containing JSON files
+            - WORKERS: Number of worker processes used to check the JSON files
+            - JSON_DECODER: Name of the JSON decoder backend, or "auto"
+            - VALIDATE_SAMPLE: Share of the entries to check
+
+    Returns:
+        bool: True if every file is usable, False otherwise
+    """
+    json_decoder = resolve_decoder(config.JSON_DECODER)
+    log_system_info(json_decoder)
+    return validate_spotify_files(config.INPUT_DIR, config.VALIDATE_SAMPLE, config.WORKERS, json_decoder)
+
 
-def count_plays_from_directory(config: Any, progress_callback=None) -> None:
+def list_stats() -> None:
+    """
+    Print the statistic groups and the statistics each produces.
+    """
+    for group in STATS.groups.values():
+        print(f"{group.name}: {', '.join(group.outputs)}")
+
+
+def print_stats(stats: Any, names: List[str]) -> None:
+    """
+    Print statistics as "name: value" lines.
+
+    Args:
+        stats: Mapping of statistic names to values
+        names: Names of the statistics to print
+    """
+    for name in names:
+        print(f"{name}: {stats[name]}")
+
+
+def count_plays_from_directory(config: Any, progress_callback=None, stats_names: Optional[List[str]] = None) -> None:
     """
     Process Spotify streaming history JSON files and generate an HTML summary report.
 
@@ -50,21 +158,55 @@ def count_plays_from_directory(config: Any, progress_callback=None) -> None:
             - MIN_MILLISECONDS: Minimum milliseconds for a play to count
             - INPUT_DIR: Directory containing JSON files
             - OUTPUT_FILE: Base name for the output HTML file
+            - WORKERS: Number of worker processes used to read the JSON files
+            - USE_CACHE: Whether to use the parsed entry cache
+            - PREFETCH_FILES: Number of JSON files read ahead on a background thread
+            - JSON_DECODER: Name of the JSON decoder backend, or "auto"
+            - STATS_BACKEND: Name of the statistics backend, or "auto"
+            - SESSION_GAP_MINUTES: Plays further apart than this start a new listening session
+            - INCREMENTAL: Whether to start from the stored aggregates of the last run
+            - DATE_FROM: First day to include (YYYY-MM-DD), or "" for no limit
+            - DATE_TO: Last day to include (YYYY-MM-DD), or "" for no limit
+            - FILTER: Filter expression listens must match, or "" for no filter
+            - MAX_MEMORY_MB: Highest allowed peak memory use in megabytes, 0 for no limit
         progress_callback: Optional callback function to report progress.
             The callback should accept two parameters:
             - step (str): The current processing step
             - progress (float): Progress value between 0.0 and 1.0
+        stats_names: Statistics or groups to calculate and print instead of building
+            the report, None to build the report
 
     Returns:
         None
 
     Raises:
+        ValueError: If one of stats_names is not a statistic or group
         FileNotFoundError: If the input directory does not exist.
         PermissionError: If files cannot be read or written due to permission issues
     """
     MIN_MILLISECONDS = config.MIN_MILLISECONDS
     input_dir = config.INPUT_DIR
     output_html = config.OUTPUT_FILE + ".html"
+    workers = config.WORKERS
+    use_cache = config.USE_CACHE
+    prefetch = config.PREFETCH_FILES
+    incremental = config.INCREMENTAL
+    time_range = parse_date_range(config.DATE_FROM, config.DATE_TO)
+    entry_filter = EntryFilter(config.FILTER) if config.FILTER.strip() else None
+    memory_guard = MemoryGuard(config.MAX_MEMORY_MB)
+    json_decoder = resolve_decoder(config.JSON_DECODER)
+    stats_backend = resolve_backend(config.STATS_BACKEND)
+    session_gap_ms = round(config.SESSION_GAP_MINUTES * 60_000)
+    # Check the names before spending any time on loading
+    stats_keys = STATS.resolve(stats_names) if stats_names is not None else None
+
+    # Log system information for troubleshooting
+    log_system_info(json_decoder, stats_backend)
+
+    # The stored aggregates cover the whole history, they cannot be limited to a range or filter
+    if incremental and (time_range is not None or entry_filter is not None):
+        logging.warning("⚠️ Incremental mode is not used with a date range or filter, processing all matching files.")
+        incremental = False
 
     # Define a helper function to update progress
     def update_progress(step, progress):
@@ -76,65 +218,81 @@ def count_plays_from_directory(config: Any, progress_callback=None) -> None:
     update_progress("Starting", 0.0)
 
     try:
-        # Load Spotify data from JSON files
-        update_progress("Loading data", 0.1)
-        try:
-            entries = load_spotify_data(input_dir)
-            if not entries:
-                logging.warning("No valid entries found in the input directory.")
-                update_progress("Completed", 1.0)
-                return
-        except Exception as e:
-            logging.error(f"Error loading Spotify data: {e}")
-            log_exception()
-            raise
-
-        # Process Spotify data
-        update_progress("Processing data", 0.3)
+        # Load, validate, deduplicate and process Spotify data in a single pass
+        update_progress("Loading and processing data", 0.1)
         try:
-            (
-                yearly, dates_set, first_ts, first_entry, last_ts, last_entry,
-                artist_set, album_set, track_set, artist_tracks, daily_counts,
-                monthly_counts, weekday_counts, hour_counts, play_times,
-                play_counted, skip_count, offline_count, track_skip_counts, otd_data
-            ) = process_spotify_data(entries, MIN_MILLISECONDS)
+            run_key = (os.path.abspath(input_dir), config.DATE_FROM, config.DATE_TO, config.FILTER,
+                       export_signature(input_dir))
+            acc = _last_run.get("accumulator") if _last_run.get("key") == run_key else None
+            if acc is not None and acc.supports_threshold(MIN_MILLISECONDS):
+                logging.info(f"Export unchanged, reusing the aggregates of the last run with MIN_MILLISECONDS "
+                             f"{MIN_MILLISECONDS}")
+                acc.set_threshold(MIN_MILLISECONDS)
+            elif incremental:
+                acc = process_spotify_data_incremental(input_dir, MIN_MILLISECONDS, workers, use_cache, prefetch,
+                                                       json_decoder)
+            else:
+                stores = iter_spotify_stores(input_dir, workers, use_cache, time_range, entry_filter, prefetch,
+                                             json_decoder)
+                stores = memory_guard.watch(stores, "loading the JSON files")
+                acc = process_spotify_data(stores, MIN_MILLISECONDS)
+            _last_run.update(key=run_key, accumulator=acc)
         except Exception as e:
             logging.error(f"Error processing Spotify data: {e}")
             log_exception()
             raise
 
+        if acc.first_ts is None:
+            logging.warning("No valid entries found in the input directory.")
+            update_progress("Completed", 1.0)
+            return
+
+        memory_guard.check("loading the JSON files")
+
         # Aggregate yearly data
         update_progress("Aggregating data", 0.5)
         try:
+            yearly = acc.named_yearly()
             all_data = aggregate_yearly_data(yearly)
         except Exception as e:
             logging.error(f"Error aggregating yearly data: {e}")
             log_exception()
             raise
 
-        # Calculate all statistics
+        # Calculate the requested statistics, or all of them for the report.
+        # Independent statistic groups are spread over the worker threads.
         update_progress("Calculating statistics", 0.6)
         try:
-            stats_data = calculate_all_stats(
-                yearly, all_data, dates_set, first_ts, first_entry, last_ts, last_entry,
-                artist_set, album_set, track_set, artist_tracks, daily_counts,
-                monthly_counts, weekday_counts, hour_counts, play_times,
-                play_counted, skip_count, offline_count, track_skip_counts
-            )
+            stats_data = calculate_all_stats(acc, all_data, yearly, stats_backend, session_gap_ms,
+                                             stats_keys if stats_keys is not None else STATS.keys(), workers)
         except Exception as e:
             logging.error(f"Error calculating statistics: {e}")
             log_exception()
             raise
 
+        if stats_keys is not None:
+            print_stats(stats_data, stats_keys)
+            memory_guard.report()
+            update_progress("Completed", 1.0)
+            return
+
+        # Calculate the same statistics for each year, from the year's partition of the aggregates
+        try:
+            year_stats = calculate_year_stats(acc, yearly, stats_backend, session_gap_ms, STATS.keys(), workers)
+        except Exception as e:
+            logging.error(f"Error calculating yearly statistics: {e}")
+            log_exception()
+            raise
+
         # Build HTML content
         update_progress("Building HTML", 0.7)
         try:
             years = sorted(yearly.keys())
             tabs = build_year_tabs(years)
             all_section = build_all_section(all_data)
-            year_sections = build_year_sections(years, yearly)
+            year_sections = build_year_sections(years, yearly, year_stats)
             sections = all_section + year_sections
-            stats_html = build_stats_html(stats_data, daily_counts, otd_data)
+            stats_html = build_stats_html(stats_data, acc.daily_counts, acc.on_this_day_json())
         except Exception as e:
             logging.error(f"Error building HTML content: {e}")
             log_exception()
@@ -163,6 +321,9 @@ def count_plays_from_directory(config: Any, progress_callback=None) -> None:
             log_exception()
             raise
 
+        memory_guard.check("building the report")
+        memory_guard.report()
+
         # Complete
         update_progress("Completed", 1.0)
 
@@ -174,21 +335,32 @@ def count_plays_from_directory(config: Any, progress_callback=None) -> None:
 
 if __name__ == "__main__":
     try:
-        if args.skip_gui or (len(sys.argv) > 1 and sys.argv[1].lower() == 'true'):
+        if args.skip_gui or args.validate_only or args.stats is not None or (len(sys.argv) > 1 and sys.argv[1].lower() == 'true'):
             logging.info("Running in command-line mode")
+            if args.stats is not None and args.stats.strip().lower() == "list":
+                list_stats()
+                sys.exit(0)
             config = load_config()
+            apply_cli_overrides(config)
             # Validate configuration before processing
             if not config.validate_config():
                 logging.error("Configuration validation failed. Please check your config.py file.")
                 sys.exit(1)
             try:
-                count_plays_from_directory(config)
+                if args.validate_only:
+                    sys.exit(0 if validate_export(config) else 1)
+                if args.stats is not None:
+                    names = [name.strip() for name in args.stats.split(",") if name.strip()]
+                    count_plays_from_directory(config, stats_names=names)
+                else:
+                    count_plays_from_directory(config)
             except Exception as e:
                 logging.error(f"Error during processing: {e}")
                 log_exception()
                 sys.exit(1)
         else:
             logging.info("Starting GUI")
+            apply_cli_overrides(config)
             root = tk.Tk()
             app = ConfigApp(root)
             load_style(root)
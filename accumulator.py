@@ -0,0 +1,753 @@
+"""
+Listening accumulator for Spotify Extended Streaming History.
+
+This module contains the ListeningAccumulator class, which holds every
+aggregate built while processing streaming history records. Accumulators
+can be merged, so partial aggregates built from different files, processes
+or time ranges can be combined into one.
+
+Artists, tracks and albums are keyed by the integer IDs of the accumulator's
+EntityDictionary; the named_* methods resolve them to report labels. Each
+distinct (artist, track, album) combination gets a combo index, so a record
+updates one count and one playtime per year instead of one per entity.
+
+Whether a play counts depends on MIN_MILLISECONDS, so play counts are not
+stored as totals but as small histograms over playtime buckets. The counts
+for a threshold are read from the buckets above it, which lets the threshold
+change without processing the export again.
+
+The aggregates are partitioned by year while the records are added: each
+year keeps its own tables, hour and playtime histograms, skips and first and
+last plays, and the all-time values are sums over the years. A year_view of
+the accumulator holds a single partition, so every statistic can be
+calculated for one year the same way as for the whole history.
+"""
+import json
+import logging
+from array import array
+from bisect import bisect_left
+from collections import defaultdict, Counter
+from itertools import compress
+from datetime import date, datetime
+from typing import Dict, Any, Set, DefaultDict, List, Optional, Tuple
+
+from date_range import EPOCH_ORDINAL
+from day_index import DayIndex
+from entity_dictionary import EntityDictionary
+from entry_store import EntryStore, FLAG_OFFLINE, FLAG_SKIPPED, MS_PER_DAY, MS_PER_HOUR, datetime_to_ms
+from running_stats import epoch_day_to_date
+
+# Keys of the per-year aggregate tables
+YEARLY_KEYS = ["artist_counts", "artist_time", "track_counts", "track_time", "album_counts", "album_time"]
+
+# Play counts can be switched to any threshold that is a whole number of
+# seconds up to two minutes, plus the threshold the accumulator was built with
+BUCKET_STEP_MS = 1000
+BUCKET_LIMIT_MS = 120_000
+
+# 1970-01-01 was a Thursday
+EPOCH_WEEKDAY = 3
+
+# On This Day keys hold the track ID above these bits and the day and bucket below
+OTD_TRACK_SHIFT = 32
+OTD_CODE_MASK = (1 << OTD_TRACK_SHIFT) - 1
+
+
+def year_day_range(year: int) -> Tuple[int, int]:
+    """
+    Get the days of a year.
+
+    Args:
+        year (int): The year
+
+    Returns:
+        Tuple[int, int]: Days since the Unix epoch of January 1 and December 31
+    """
+    first = date(year, 1, 1).toordinal() - EPOCH_ORDINAL
+    return first, date(year, 12, 31).toordinal() - EPOCH_ORDINAL
+
+
+class YearPartition:
+    """
+    The aggregates of the plays of a single year.
+
+    Attributes:
+        counts: Plays keyed by combo index * number of buckets + bucket
+        time: Playtime keyed by combo index
+        hour_hist: Counter of plays keyed by hour * number of buckets + bucket
+        play_hist: Number of plays per bucket
+        offline_hist: Number of offline plays per bucket
+        track_skip_counts: Counter of skips per track ID
+        first_ts: First timestamp
+        first_entry: First entry
+        last_ts: Last timestamp
+        last_entry: Last entry
+    """
+
+    __slots__ = ("counts", "time", "hour_hist", "play_hist", "offline_hist", "track_skip_counts", "first_ts",
+                 "first_entry", "last_ts", "last_entry")
+
+    def __init__(self, buckets: int):
+        """
+        Create a partition with no plays.
+
+        Args:
+            buckets (int): Number of playtime buckets
+        """
+        self.counts: DefaultDict[int, int] = defaultdict(int)
+        self.time: DefaultDict[int, int] = defaultdict(int)
+        self.hour_hist: Counter = Counter()
+        self.play_hist = array("q", bytes(8 * buckets))
+        self.offline_hist = array("q", bytes(8 * buckets))
+        self.track_skip_counts: Counter = Counter()
+        self.first_ts: Optional[datetime] = None
+        self.first_entry: Optional[Dict[str, Any]] = None
+        self.last_ts: Optional[datetime] = None
+        self.last_entry: Optional[Dict[str, Any]] = None
+
+    def merge(self, other: "YearPartition", combo_map: List[int], track_map: List[int], buckets: int) -> None:
+        """
+        Add the plays of another partition of the same year.
+
+        Args:
+            other (YearPartition): The partition whose plays are added
+            combo_map (List[int]): Combo index in this partition's accumulator of each of the other's
+            track_map (List[int]): Track ID in this partition's accumulator of each of the other's
+            buckets (int): Number of playtime buckets
+        """
+        for code, value in other.counts.items():
+            self.counts[combo_map[code // buckets] * buckets + code % buckets] += value
+        for combo, value in other.time.items():
+            self.time[combo_map[combo]] += value
+        self.hour_hist.update(other.hour_hist)
+        for bucket in range(buckets):
+            self.play_hist[bucket] += other.play_hist[bucket]
+            self.offline_hist[bucket] += other.offline_hist[bucket]
+        for track, count in other.track_skip_counts.items():
+            self.track_skip_counts[track_map[track]] += count
+        if other.first_ts is not None and (self.first_ts is None or other.first_ts < self.first_ts):
+            self.first_ts = other.first_ts
+            self.first_entry = other.first_entry
+        if other.last_ts is not None and (self.last_ts is None or other.last_ts > self.last_ts):
+            self.last_ts = other.last_ts
+            self.last_entry = other.last_entry
+
+
+def bucket_edges(min_milliseconds: int) -> List[int]:
+    """
+    Get the playtime bucket edges of an accumulator.
+
+    Bucket b holds the plays with edges[b] < ms_played <= edges[b + 1], and the
+    last bucket every longer play, so the plays counted with a threshold that
+    is one of the edges are exactly those in the buckets from its index on.
+
+    Args:
+        min_milliseconds (int): Threshold the accumulator is built with
+
+    Returns:
+        List[int]: The sorted edges, starting at 0
+    """
+    edges = set(range(0, BUCKET_LIMIT_MS + 1, BUCKET_STEP_MS))
+    edges.add(min_milliseconds)
+    return sorted(edges)
+
+
+class CountedPlays:
+    """
+    The play counts of an accumulator for one MIN_MILLISECONDS threshold.
+
+    Attributes:
+        yearly: Play counts and playtimes per year, keyed by YEARLY_KEYS and entity ID
+        daily_counts: Counter of plays per day
+        monthly_counts: Counter of plays per (year, month)
+        weekday_counts: Counter of plays per weekday
+        hour_counts: Counter of plays per hour
+        play_times: Epoch milliseconds of the counted plays
+        play_counted: Total number of plays counted
+        offline_count: Number of offline plays counted
+        date_to_tracks: On This Day index counting plays per (track ID, date)
+    """
+
+    __slots__ = ("yearly", "daily_counts", "monthly_counts", "weekday_counts", "hour_counts", "play_times",
+                 "play_counted", "offline_count", "date_to_tracks")
+
+    def __init__(self, acc: "ListeningAccumulator", yearly: Optional[Dict[int, Dict[str, DefaultDict[int, int]]]] = None):
+        """
+        Sum the buckets of an accumulator above its current threshold.
+
+        Args:
+            acc (ListeningAccumulator): The accumulator
+            yearly (Optional[Dict[int, Dict[str, DefaultDict[int, int]]]]): Yearly tables already summed
+                for the same threshold, used instead of summing the years again
+        """
+        nb = len(acc.edges)
+        first = acc.edges.index(acc.min_milliseconds)
+
+        combos = acc.combos
+        self.yearly: Dict[int, Dict[str, DefaultDict[int, int]]] = {}
+        for year, part in acc.yearly.items():
+            if yearly is not None and year in yearly:
+                self.yearly[year] = yearly[year]
+                continue
+            tables = self.yearly[year] = {key: defaultdict(int) for key in YEARLY_KEYS}
+            artist_counts, track_counts, album_counts = \
+                tables["artist_counts"], tables["track_counts"], tables["album_counts"]
+            for code, count in part.counts.items():
+                if code % nb >= first:
+                    artist, track, album = combos[code // nb]
+                    artist_counts[artist] += count
+                    track_counts[track] += count
+                    album_counts[album] += count
+            artist_time, track_time, album_time = tables["artist_time"], tables["track_time"], tables["album_time"]
+            for combo, ms_played in part.time.items():
+                artist, track, album = combos[combo]
+                artist_time[artist] += ms_played
+                track_time[track] += ms_played
+                album_time[album] += ms_played
+
+        self.daily_counts = Counter()
+        self.monthly_counts = Counter()
+        self.weekday_counts = Counter()
+        days = {}
+        for day_key, count in enumerate(acc.days.counts(first), acc.days.start or 0):
+            if count:
+                day = days[day_key] = epoch_day_to_date(day_key)
+                self.daily_counts[day] += count
+                self.monthly_counts[(day.year, day.month)] += count
+                self.weekday_counts[(day_key + EPOCH_WEEKDAY) % 7] += count
+
+        self.hour_counts = Counter()
+        self.play_counted = 0
+        self.offline_count = 0
+        for part in acc.yearly.values():
+            for code, count in part.hour_hist.items():
+                if code % nb >= first:
+                    self.hour_counts[code // nb] += count
+            self.play_counted += sum(part.play_hist[first:])
+            self.offline_count += sum(part.offline_hist[first:])
+
+        # Turn the buckets into a 0/1 mask in one C-level pass
+        mask = acc.play_buckets.tobytes().translate(bytes(int(b >= first) for b in range(256)))
+        self.play_times = array("q", compress(acc.play_ts, mask))
+
+        self.date_to_tracks = Counter()
+        for key, count in acc.otd_hist.items():
+            code = key & OTD_CODE_MASK
+            if code % nb >= first:
+                track = key >> OTD_TRACK_SHIFT
+                day_key = code // nb
+                day = days.get(day_key)
+                if day is None:
+                    day = days[day_key] = epoch_day_to_date(day_key)
+                self.date_to_tracks[(track, day)] += count
+
+
+class ListeningAccumulator:
+    """
+    Mergeable aggregate state for Spotify streaming history records.
+
+    Play counts are kept per playtime bucket (see bucket_edges). daily_counts,
+    play_times and the other play count properties are views of the buckets
+    for the current threshold. The hour and playtime histograms, skips and
+    first and last plays are kept per year; the properties of the same name
+    combine the years.
+
+    Attributes:
+        min_milliseconds: Minimum milliseconds for a play to count
+        edges: Playtime bucket edges, see bucket_edges
+        entities: Dictionary of the artist, track and album IDs used as keys below
+        combos: (artist ID, track ID, album ID) of each combo index
+        yearly: Dictionary of YearPartition per year
+        days: Plays per listening day and bucket, which also give the days played,
+            streaks and hiatuses
+        artist_set: Set of artist IDs
+        album_set: Set of album IDs
+        track_set: Set of track IDs
+        artist_tracks: Dictionary mapping artist IDs to their track IDs
+        play_ts: Epoch milliseconds of the plays
+        play_buckets: Bucket of each play in play_ts
+        plays_in_order: False once a play was added before the previous one
+        otd_hist: On This Day index counting plays keyed by track ID << OTD_TRACK_SHIFT
+            | epoch day * len(edges) + bucket
+    """
+
+    __slots__ = (
+        "min_milliseconds", "edges", "entities", "combos", "_combo_ids", "yearly", "days",
+        "artist_set", "album_set", "track_set", "artist_tracks",
+        "play_ts", "play_buckets", "plays_in_order", "otd_hist", "_counted",
+    )
+
+    def __init__(self, min_milliseconds: int):
+        """
+        Create an empty accumulator.
+
+        Args:
+            min_milliseconds (int): Minimum milliseconds for a play to count
+        """
+        self.min_milliseconds = min_milliseconds
+        self.edges = bucket_edges(min_milliseconds)
+        self.entities = EntityDictionary()
+        self.combos: List[Tuple[int, int, int]] = []
+        self._combo_ids: Dict[Tuple[int, int, int], int] = {}
+        self.yearly: Dict[int, YearPartition] = {}
+        self.days = DayIndex(len(self.edges))
+        self.artist_set: Set[int] = set()
+        self.album_set: Set[int] = set()
+        self.track_set: Set[int] = set()
+        self.artist_tracks: DefaultDict[int, Set[int]] = defaultdict(set)
+        self.play_ts = array("q")
+        self.play_buckets = array("B")
+        self.plays_in_order = True
+        self.otd_hist: Counter = Counter()
+        self._counted: Optional[CountedPlays] = None
+
+    def __getstate__(self):
+        # The counts for the current threshold are rebuilt when needed
+        return {name: getattr(self, name) for name in self.__slots__ if name != "_counted"}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._counted = None
+
+    def supports_threshold(self, min_milliseconds: int) -> bool:
+        """
+        Check whether the play counts for a threshold can be read from the buckets.
+
+        Args:
+            min_milliseconds (int): Minimum milliseconds for a play to count
+
+        Returns:
+            bool: True if the threshold is one of the bucket edges
+        """
+        return min_milliseconds in self.edges
+
+    def set_threshold(self, min_milliseconds: int) -> None:
+        """
+        Switch the play counts to another threshold without processing the records again.
+
+        Args:
+            min_milliseconds (int): Minimum milliseconds for a play to count
+
+        Raises:
+            ValueError: If the threshold is not one of the bucket edges
+        """
+        if not self.supports_threshold(min_milliseconds):
+            raise ValueError(
+                f"Play counts for a threshold of {min_milliseconds} ms are not kept, use whole seconds "
+                f"up to {BUCKET_LIMIT_MS} ms or {self.edges[-1]} ms"
+            )
+        if min_milliseconds != self.min_milliseconds:
+            self.min_milliseconds = min_milliseconds
+            self._counted = None
+
+    def _combo_id(self, ids: Tuple[int, int, int]) -> int:
+        combo = self._combo_ids.get(ids)
+        if combo is None:
+            combo = self._combo_ids[ids] = len(self.combos)
+            self.combos.append(ids)
+        return combo
+
+    def partition(self, year: int) -> YearPartition:
+        """
+        Get the partition of a year, adding it if needed.
+
+        Args:
+            year (int): The year
+
+        Returns:
+            YearPartition: The aggregates of the year's plays
+        """
+        part = self.yearly.get(year)
+        if part is None:
+            part = self.yearly[year] = YearPartition(len(self.edges))
+        return part
+
+    def _ends(self):
+        parts = [part for part in self.yearly.values() if part.first_ts is not None]
+        if not parts:
+            return None, None
+        return min(parts, key=lambda part: part.first_ts), max(parts, key=lambda part: part.last_ts)
+
+    @property
+    def first_ts(self) -> Optional[datetime]:
+        """First timestamp."""
+        first, _ = self._ends()
+        return first.first_ts if first is not None else None
+
+    @property
+    def first_entry(self) -> Optional[Dict[str, Any]]:
+        """First entry."""
+        first, _ = self._ends()
+        return first.first_entry if first is not None else None
+
+    @property
+    def last_ts(self) -> Optional[datetime]:
+        """Last timestamp."""
+        _, last = self._ends()
+        return last.last_ts if last is not None else None
+
+    @property
+    def last_entry(self) -> Optional[Dict[str, Any]]:
+        """Last entry."""
+        _, last = self._ends()
+        return last.last_entry if last is not None else None
+
+    @property
+    def skip_count(self) -> int:
+        """Number of skipped tracks."""
+        return sum(sum(part.track_skip_counts.values()) for part in self.yearly.values())
+
+    @property
+    def track_skip_counts(self) -> Counter:
+        """Counter of skips per track ID."""
+        skips = Counter()
+        for part in self.yearly.values():
+            skips.update(part.track_skip_counts)
+        return skips
+
+    def counted(self) -> CountedPlays:
+        """
+        Get the play counts for the current threshold.
+
+        Returns:
+            CountedPlays: The counts, built on first use and kept until the data or threshold changes
+        """
+        if self._counted is None:
+            self._counted = CountedPlays(self)
+        return self._counted
+
+    @property
+    def daily_counts(self) -> Counter:
+        """Counter of plays per day."""
+        return self.counted().daily_counts
+
+    @property
+    def monthly_counts(self) -> Counter:
+        """Counter of plays per (year, month)."""
+        return self.counted().monthly_counts
+
+    @property
+    def weekday_counts(self) -> Counter:
+        """Counter of plays per weekday."""
+        return self.counted().weekday_counts
+
+    @property
+    def hour_counts(self) -> Counter:
+        """Counter of plays per hour."""
+        return self.counted().hour_counts
+
+    @property
+    def play_times(self) -> array:
+        """Epoch milliseconds of the counted plays."""
+        return self.counted().play_times
+
+    @property
+    def play_counted(self) -> int:
+        """Total number of plays counted."""
+        return self.counted().play_counted
+
+    @property
+    def offline_count(self) -> int:
+        """Number of offline plays counted."""
+        return self.counted().offline_count
+
+    @property
+    def date_to_tracks(self) -> Counter:
+        """On This Day index counting plays per (track ID, date)."""
+        return self.counted().date_to_tracks
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """
+        Add a single normalized record.
+
+        Records are added a store at a time, so this builds a one-record store;
+        prefer add_store when there are many records.
+
+        Args:
+            record (Dict[str, Any]): Record as built by normalize_entry
+        """
+        store = EntryStore()
+        store.append_record(record)
+        self.add_store(store)
+
+    def add_store(self, store: EntryStore) -> None:
+        """
+        Add every record of an EntryStore.
+
+        Args:
+            store (EntryStore): The normalized records to add
+        """
+        names = store.lookup()
+        entities = self.entities
+        edges = self.edges
+        nb = len(edges)
+        otd_hist = self.otd_hist
+        days = self.days
+        day_hist = days.hist
+        add_play_ts = self.play_ts.append
+        add_play_bucket = self.play_buckets.append
+        self._counted = None
+
+        # Only a few thousand distinct days and name combinations occur in a
+        # file, so the date details and entity IDs are looked up once for each
+        day_info = {}
+        entity_ids = {}
+        year_tables = {}
+        # [first ms, its index, last ms, its index] of the plays of each year in the store
+        year_ends = {}
+
+        last_play = self.play_ts[-1] if self.play_ts else -(1 << 63)
+        plays_in_order = self.plays_in_order
+        last_day = day_row = None
+
+        for i, (ts, ms_played, artist_sid, track_sid, album_sid, uri_sid, flags) in enumerate(zip(
+            store.ts, store.ms_played, store.artist, store.track, store.album, store.uri, store.flags
+        )):
+            try:
+                # Skip entries with no playtime
+                if ms_played <= 0:
+                    continue
+
+                bucket = bisect_left(edges, ms_played) - 1
+                day_key = ts // MS_PER_DAY
+                info = day_info.get(day_key)
+                if info is None:
+                    info = day_info[day_key] = (epoch_day_to_date(day_key).year, day_key * nb)
+                year, day_code = info
+
+                name_key = (artist_sid, track_sid, album_sid, uri_sid)
+                ids = entity_ids.get(name_key)
+                if ids is None:
+                    artist, track, album = entities.entry_ids(
+                        names[artist_sid], names[track_sid], names[album_sid], names[uri_sid]
+                    )
+                    ids = entity_ids[name_key] = (self._combo_id((artist, track, album)), track)
+                    if names[artist_sid]:
+                        self.artist_set.add(artist)
+                        self.track_set.add(track)
+                        self.album_set.add(album)
+                        self.artist_tracks[artist].add(track)
+                combo, track = ids
+
+                # ─── On This Day index ─────────────────────────────────────
+                otd_hist[track << OTD_TRACK_SHIFT | day_code + bucket] += 1
+
+                # Process entries with artist information
+                if not names[artist_sid]:
+                    continue
+
+                tables = year_tables.get(year)
+                if tables is None:
+                    part = self.partition(year)
+                    ends = year_ends[year] = [
+                        datetime_to_ms(part.first_ts) if part.first_ts is not None else None, None,
+                        datetime_to_ms(part.last_ts) if part.last_ts is not None else None, None,
+                    ]
+                    tables = year_tables[year] = (part.counts, part.time, part.hour_hist, part.play_hist,
+                                                  part.offline_hist, part.track_skip_counts, ends)
+                counts, times, hour_hist, play_hist, offline_hist, track_skip_counts, ends = tables
+
+                # ─── update stats info ─────────────────────────────────
+                if day_key != last_day:
+                    day_row = days.row(day_key)
+                    last_day = day_key
+                if ends[0] is None or ts < ends[0]:
+                    ends[0] = ts
+                    ends[1] = i
+                if ends[2] is None or ts > ends[2]:
+                    ends[2] = ts
+                    ends[3] = i
+
+                day_hist[day_row + bucket] += 1
+                hour_hist[ts // MS_PER_HOUR % 24 * nb + bucket] += 1
+                if ts < last_play:
+                    plays_in_order = False
+                add_play_ts(ts)
+                add_play_bucket(bucket)
+                last_play = ts
+                play_hist[bucket] += 1
+                if flags & FLAG_OFFLINE:
+                    offline_hist[bucket] += 1
+
+                if flags & FLAG_SKIPPED:
+                    track_skip_counts[track] += 1
+                # ───────────────────────────────────────────────────────────
+
+                # Update counts and times
+                counts[combo * nb + bucket] += 1
+                times[combo] += ms_played
+            except Exception as e:
+                # Catch any unexpected errors during entry processing
+                logging.error(f"Error processing entry: {e}")
+
+        self.plays_in_order = plays_in_order
+
+        for year, (_, first_index, _, last_index) in year_ends.items():
+            part = self.yearly[year]
+            if first_index is not None:
+                part.first_entry = store.record(first_index)
+                part.first_ts = part.first_entry["dt"]
+            if last_index is not None:
+                part.last_entry = store.record(last_index)
+                part.last_ts = part.last_entry["dt"]
+
+    def merge(self, other: "ListeningAccumulator") -> "ListeningAccumulator":
+        """
+        Merge another accumulator into this one.
+
+        The two accumulators must have been built from disjoint sets of records,
+        otherwise those plays are counted twice.
+
+        Args:
+            other (ListeningAccumulator): The accumulator to merge into this one
+
+        Returns:
+            ListeningAccumulator: This accumulator, for chaining
+
+        Raises:
+            ValueError: If the accumulators use different playtime buckets
+        """
+        if other.edges != self.edges:
+            raise ValueError(
+                f"Cannot merge accumulators built with different thresholds "
+                f"({self.min_milliseconds} and {other.min_milliseconds})"
+            )
+        nb = len(self.edges)
+
+        artist_map, track_map, album_map = self.entities.remap(other.entities)
+        combo_map = [
+            self._combo_id((artist_map[artist], track_map[track], album_map[album]))
+            for artist, track, album in other.combos
+        ]
+
+        for year, part in other.yearly.items():
+            self.partition(year).merge(part, combo_map, track_map, nb)
+
+        # The play order only holds for records added in order
+        if not self.play_ts:
+            self.plays_in_order = other.plays_in_order
+        elif other.play_ts:
+            self.plays_in_order = False
+
+        self.days.merge(other.days)
+
+        self.artist_set.update(artist_map[eid] for eid in other.artist_set)
+        self.album_set.update(album_map[eid] for eid in other.album_set)
+        self.track_set.update(track_map[eid] for eid in other.track_set)
+        for artist, tracks in other.artist_tracks.items():
+            self.artist_tracks[artist_map[artist]].update(track_map[eid] for eid in tracks)
+
+        self.play_ts.extend(other.play_ts)
+        self.play_buckets.extend(other.play_buckets)
+        for key, count in other.otd_hist.items():
+            self.otd_hist[track_map[key >> OTD_TRACK_SHIFT] << OTD_TRACK_SHIFT | key & OTD_CODE_MASK] += count
+
+        self._counted = None
+        return self
+
+    def year_view(self, year: int) -> "ListeningAccumulator":
+        """
+        Get an accumulator holding only the plays of one year.
+
+        The view shares the year's partition, entities and day counts with this
+        accumulator instead of copying them, so it is cheap to build but must not
+        have records added to it. On This Day data is not included.
+
+        Args:
+            year (int): The year
+
+        Returns:
+            ListeningAccumulator: Accumulator with the year's plays at the same threshold
+        """
+        view = ListeningAccumulator(self.min_milliseconds)
+        view.edges = self.edges
+        view.entities = self.entities
+        view.combos = self.combos
+        view._combo_ids = self._combo_ids
+        part = self.yearly.get(year)
+        if part is None:
+            view.days = DayIndex(len(self.edges))
+            return view
+        view.yearly = {year: part}
+
+        first_day, last_day = year_day_range(year)
+        view.days = self.days.slice(first_day, last_day)
+
+        # The entities played that year are those of the year's combos
+        combos = self.combos
+        for combo in part.time:
+            artist, track, album = combos[combo]
+            view.artist_set.add(artist)
+            view.track_set.add(track)
+            view.album_set.add(album)
+            view.artist_tracks[artist].add(track)
+
+        start_ms, end_ms = first_day * MS_PER_DAY, (last_day + 1) * MS_PER_DAY
+        if self.plays_in_order:
+            lo, hi = bisect_left(self.play_ts, start_ms), bisect_left(self.play_ts, end_ms)
+            view.play_ts = self.play_ts[lo:hi]
+            view.play_buckets = self.play_buckets[lo:hi]
+        else:
+            in_year = [start_ms <= ts < end_ms for ts in self.play_ts]
+            view.play_ts = array("q", compress(self.play_ts, in_year))
+            view.play_buckets = array("B", compress(self.play_buckets, in_year))
+        view.plays_in_order = self.plays_in_order
+        # The year's tables for the threshold are the same as in this accumulator's counts
+        view._counted = CountedPlays(view, self.counted().yearly)
+        return view
+
+    def on_this_day_json(self) -> str:
+        """
+        Build the On This Day data for the report.
+
+        Returns:
+            str: JSON mapping MM-DD to the tracks played more than twice on that date
+        """
+        # Convert to JSON-ready format, excluding any entries with two plays or fewer
+        otd = {}
+        day_keys = {}
+        for (track, day), count in self.date_to_tracks.items():
+            keys = day_keys.get(day)
+            if keys is None:
+                keys = day_keys[day] = (day.strftime("%m-%d"), day.isoformat())
+            tracks = otd.setdefault(keys[0], [])
+            if count > 2:
+                tracks.append({"track": self.entities.track_label(track, " — "), "date": keys[1], "count": count})
+
+        return json.dumps(otd, indent=2)
+
+    def named_yearly(self) -> Dict[int, Dict[str, DefaultDict[str, int]]]:
+        """
+        Resolve the yearly tables to the labels shown in the report.
+
+        Returns:
+            Dict[int, Dict[str, DefaultDict[str, int]]]: Yearly statistics keyed by
+                artist name and "Track - Artist" / "Album - Artist" labels
+        """
+        labels = {
+            "artist": self.entities.artist_label,
+            "track": self.entities.track_label,
+            "album": self.entities.album_label,
+        }
+        named = {}
+        for year, ydata in self.counted().yearly.items():
+            named[year] = {}
+            for key in YEARLY_KEYS:
+                label = labels[key.split("_")[0]]
+                table = named[year][key] = defaultdict(int)
+                for eid, value in ydata[key].items():
+                    table[label(eid)] += value
+        return named
+
+    def named_track_skip_counts(self) -> Counter:
+        """
+        Resolve the skip counts to track labels.
+
+        Returns:
+            Counter: Skips per "Track - Artist" label
+        """
+        named = Counter()
+        for track, count in self.track_skip_counts.items():
+            named[self.entities.track_label(track)] += count
+        return named
@@ -0,0 +1,136 @@
+"""
+Stored aggregate state for incremental ingestion of Spotify Extended Streaming History.
+
+This module saves the ListeningAccumulator of the last run together with the
+high-water timestamp of the records it contains, so a later run only has to
+apply the records of newly added export files.
+"""
+import logging
+import os
+import pickle
+from datetime import timedelta
+from typing import Dict, Any, Optional
+
+from accumulator import ListeningAccumulator
+from dedupe import KEY_SCHEME
+
+# Name of the state file inside the cache directory
+STATE_FILE_NAME = "state.pickle"
+
+# Bumped whenever the layout of the state (or of ListeningAccumulator) changes
+STATE_VERSION = 8
+
+# Records this far before the high-water timestamp are still checked against the
+# stored dedupe keys instead of being dropped, since offline plays can show up in
+# a later export with a timestamp before the end of the previous one.
+OVERLAP_WINDOW = timedelta(days=7)
+OVERLAP_WINDOW_MS = OVERLAP_WINDOW // timedelta(milliseconds=1)
+
+
+def new_aggregate_state(min_milliseconds: int) -> Dict[str, Any]:
+    """
+    Create an empty aggregate state.
+
+    Args:
+        min_milliseconds (int): Minimum milliseconds for a play to count
+
+    Returns:
+        Dict[str, Any]: State with:
+            - version: STATE_VERSION
+            - accumulator: Aggregates of every record applied so far
+            - high_water: Epoch milliseconds of the newest record applied, or None
+            - key_scheme: dedupe.KEY_SCHEME of the stored keys
+            - boundary_keys: 64-bit dedupe keys of the records inside the overlap window, mapped to their epoch milliseconds
+            - files: Size and modification time of the files already applied, keyed by source_key
+    """
+    return {
+        "version": STATE_VERSION,
+        "accumulator": ListeningAccumulator(min_milliseconds),
+        "high_water": None,
+        "key_scheme": KEY_SCHEME,
+        "boundary_keys": {},
+        "files": {},
+    }
+
+
+def _state_path(cache_dir: str) -> str:
+    return os.path.join(cache_dir, STATE_FILE_NAME)
+
+
+def load_aggregate_state(cache_dir: str, min_milliseconds: int) -> Dict[str, Any]:
+    """
+    Load the stored aggregate state, or create an empty one if it cannot be used.
+
+    Args:
+        cache_dir (str): Cache directory holding the state file
+        min_milliseconds (int): Minimum milliseconds for a play to count
+
+    Returns:
+        Dict[str, Any]: The stored state, or a new empty state
+    """
+    path = _state_path(cache_dir)
+    if not os.path.exists(path):
+        logging.info("No stored aggregate state found, processing all files")
+        return new_aggregate_state(min_milliseconds)
+
+    try:
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+        logging.warning(f"Ignoring unreadable aggregate state {path}: {e}")
+        return new_aggregate_state(min_milliseconds)
+
+    if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+        logging.info("Stored aggregate state is from another version, processing all files")
+        return new_aggregate_state(min_milliseconds)
+
+    if state["key_scheme"] != KEY_SCHEME:
+        logging.info("Stored aggregate state was written by another Python version, processing all files")
+        return new_aggregate_state(min_milliseconds)
+
+    # Play counts are kept per playtime bucket, so most thresholds can be switched to
+    accumulator = state["accumulator"]
+    if accumulator.min_milliseconds != min_milliseconds:
+        if not accumulator.supports_threshold(min_milliseconds):
+            logging.info("Stored aggregate state cannot be used with this MIN_MILLISECONDS, processing all files")
+            return new_aggregate_state(min_milliseconds)
+        logging.info(f"Switching the stored aggregates to MIN_MILLISECONDS {min_milliseconds}")
+        accumulator.set_threshold(min_milliseconds)
+
+    return state
+
+
+def save_aggregate_state(cache_dir: str, state: Dict[str, Any]) -> None:
+    """
+    Save the aggregate state. Failures are logged and otherwise ignored.
+
+    Args:
+        cache_dir (str): Cache directory to hold the state file
+        state (Dict[str, Any]): The state to save
+    """
+    path = _state_path(cache_dir)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except (OSError, pickle.PicklingError) as e:
+        logging.warning(f"Could not save aggregate state to {path}: {e}")
+
+
+def prune_boundary_keys(boundary_keys: Dict[Any, int], high_water: Optional[int]) -> Dict[Any, int]:
+    """
+    Keep only the dedupe keys that fall inside the overlap window.
+
+    Args:
+        boundary_keys (Dict[Any, int]): Dedupe keys mapped to their epoch milliseconds
+        high_water (Optional[int]): Epoch milliseconds of the newest record applied
+
+    Returns:
+        Dict[Any, int]: The keys no older than high_water - OVERLAP_WINDOW
+    """
+    if high_water is None:
+        return {}
+    cutoff = high_water - OVERLAP_WINDOW_MS
+    return {key: ts for key, ts in boundary_keys.items() if ts >= cutoff}
@@ -1,13 +1,22 @@
 import os
 import logging
 
+from date_range import parse_date_range
+from entry_filter import EntryFilter
+from json_backends import AUTO_DECODER, DECODERS, DEFAULT_DECODER
+from stats_backends import AUTO_BACKEND, STATS_BACKENDS
+
 # Minimum number of milliseconds that you listened to the song.
 #     Changing this will drastically alter the final counts.
+#     Whole seconds up to 120000 can be switched to without reading the JSON files again
+#     (see INCREMENTAL).
 MIN_MILLISECONDS = 20000
 
 
 # Directory, or folder, on your computer where your Spotify JSON files are located.
 #     The easiest method is to just put them in the sesh folder.
+#     You can also point this at the my_spotify_data.zip archive from Spotify
+#     (or a single .json.gz file) and it will be read without extracting it.
 INPUT_DIR = ""
 
 
@@ -16,6 +25,81 @@ INPUT_DIR = ""
 OUTPUT_FILE = "summary"
 
 
+# Number of worker processes used to read and validate the JSON files in parallel.
+#     1 reads the files one after another. Setting this to the number of CPU cores
+#     speeds up loading large exports with many files. The statistic groups that do not
+#     depend on each other are also calculated on this many threads.
+WORKERS = 1
+
+
+# Keep a cache of the parsed JSON files in a ".sesh_cache" folder inside the input directory.
+#     Later runs over the same export then skip reading the JSON files again,
+#     which is much faster when you only change the other settings.
+USE_CACHE = True
+
+
+# Number of JSON files read ahead on a background thread while the current one is processed.
+#     This hides the time spent waiting for a slow disk or network share (NAS).
+#     Each file read ahead is held in memory, 0 turns reading ahead off.
+#     Not used when WORKERS is above 1, since the worker processes read in parallel anyway.
+PREFETCH_FILES = 1
+
+
+# Library used to decode the JSON files: "json" (built into Python), "orjson" or "auto".
+#     orjson is several times faster but has to be installed separately (pip install orjson)
+#     and decodes each file in one go, so it uses more memory on large files.
+#     "auto" uses orjson when it is installed. Falls back to "json" if orjson is missing.
+JSON_DECODER = "json"
+
+
+# How the statistics are calculated: "python", "numpy" or "auto".
+#     numpy is much faster on very large histories but has to be installed separately
+#     (pip install numpy). Both give exactly the same results.
+#     "auto" uses numpy when it is installed. Falls back to "python" if numpy is missing.
+STATS_BACKEND = "auto"
+
+
+# Plays more than this many minutes apart start a new listening session.
+SESSION_GAP_MINUTES = 30
+
+
+# Keep the aggregated results between runs and only apply listens from new or changed
+#     JSON files. Useful when you regularly drop a newer export into the input directory.
+#     Changing MIN_MILLISECONDS to whole seconds up to 120000 reuses the stored results,
+#     any other change reprocesses everything automatically.
+INCREMENTAL = False
+
+
+# Only include listens from DATE_FROM up to and including DATE_TO, written as YYYY-MM-DD.
+#     Leave either empty for no limit on that side. JSON files whose names or cached
+#     contents lie entirely outside the range are not read at all, so a one year
+#     report of a large export is much faster. An invalid date stops the run.
+DATE_FROM = ""
+DATE_TO = ""
+
+
+# Only include listens matching this filter expression. Leave empty to include everything.
+#     Compare any field of the JSON entries, for example:
+#         platform ~ "android" and conn_country == "US" and not incognito_mode
+#         artist == "Radiohead" and ts >= 2019-01-01 and ts <= 2019-12-31
+#     Operators are == != < <= > >= and ~ (contains, ignoring case). Combine them with
+#     and, or, not and parentheses. artist, track, album and uri are short for the
+#     master_metadata_* and spotify_track_uri fields, which are compared after missing
+#     names are filled in with "Unknown Artist", "Unknown Track" or "Unknown Album".
+FILTER = ""
+
+
+# Stop with an error if the script's memory use (peak RSS) goes over this many megabytes.
+#     0 means no limit. The peak memory use is always written to the log.
+MAX_MEMORY_MB = 0
+
+
+# Share of the entries checked when only validating an export (--validate-only), between 0 and 1.
+#     1.0 checks every entry. 0.1 checks every 10th entry, spread evenly over each file,
+#     which is faster and still shows which kinds of problems the export has.
+VALIDATE_SAMPLE = 1.0
+
+
 def validate_config():
     """
     Validate configuration values and ensure they are within acceptable ranges.
@@ -24,26 +108,101 @@ def validate_config():
     Returns:
         bool: True if validation succeeded, False if critical errors were found
     """
-    global MIN_MILLISECONDS, INPUT_DIR, OUTPUT_FILE
+    global MIN_MILLISECONDS, INPUT_DIR, OUTPUT_FILE, WORKERS, USE_CACHE, PREFETCH_FILES, INCREMENTAL, DATE_FROM, DATE_TO, \
+        FILTER, MAX_MEMORY_MB, JSON_DECODER, VALIDATE_SAMPLE, STATS_BACKEND, SESSION_GAP_MINUTES
 
     # Validate MIN_MILLISECONDS
     if not isinstance(MIN_MILLISECONDS, int) or MIN_MILLISECONDS < 0:
         logging.warning(f"Invalid MIN_MILLISECONDS value: {MIN_MILLISECONDS}. Setting to default (20000).")
         MIN_MILLISECONDS = 20000
 
+    # Validate WORKERS
+    if not isinstance(WORKERS, int) or WORKERS < 1:
+        logging.warning(f"Invalid WORKERS value: {WORKERS}. Setting to default (1).")
+        WORKERS = 1
+
+    # Validate USE_CACHE
+    if not isinstance(USE_CACHE, bool):
+        logging.warning(f"Invalid USE_CACHE value: {USE_CACHE}. Setting to default (True).")
+        USE_CACHE = True
+
+    # Validate PREFETCH_FILES
+    if not isinstance(PREFETCH_FILES, int) or PREFETCH_FILES < 0:
+        logging.warning(f"Invalid PREFETCH_FILES value: {PREFETCH_FILES}. Setting to default (1).")
+        PREFETCH_FILES = 1
+
+    # Validate JSON_DECODER
+    if JSON_DECODER not in DECODERS and JSON_DECODER != AUTO_DECODER:
+        logging.warning(f"Invalid JSON_DECODER value: {JSON_DECODER!r}. Setting to default ({DEFAULT_DECODER!r}).")
+        JSON_DECODER = DEFAULT_DECODER
+
+    # Validate STATS_BACKEND
+    if STATS_BACKEND not in STATS_BACKENDS and STATS_BACKEND != AUTO_BACKEND:
+        logging.warning(f"Invalid STATS_BACKEND value: {STATS_BACKEND!r}. Setting to default ({AUTO_BACKEND!r}).")
+        STATS_BACKEND = AUTO_BACKEND
+
+    # Validate SESSION_GAP_MINUTES
+    if isinstance(SESSION_GAP_MINUTES, bool) or not isinstance(SESSION_GAP_MINUTES, (int, float)) \
+            or SESSION_GAP_MINUTES <= 0:
+        logging.warning(f"Invalid SESSION_GAP_MINUTES value: {SESSION_GAP_MINUTES}. Setting to default (30).")
+        SESSION_GAP_MINUTES = 30
+
+    # Validate INCREMENTAL
+    if not isinstance(INCREMENTAL, bool):
+        logging.warning(f"Invalid INCREMENTAL value: {INCREMENTAL}. Setting to default (False).")
+        INCREMENTAL = False
+
+    # Validate MAX_MEMORY_MB
+    if not isinstance(MAX_MEMORY_MB, int) or MAX_MEMORY_MB < 0:
+        logging.warning(f"Invalid MAX_MEMORY_MB value: {MAX_MEMORY_MB}. Setting to default (0, no limit).")
+        MAX_MEMORY_MB = 0
+
+    # Validate VALIDATE_SAMPLE
+    if isinstance(VALIDATE_SAMPLE, bool) or not isinstance(VALIDATE_SAMPLE, (int, float)) \
+            or not 0 < VALIDATE_SAMPLE <= 1:
+        logging.warning(f"Invalid VALIDATE_SAMPLE value: {VALIDATE_SAMPLE}. Setting to default (1.0).")
+        VALIDATE_SAMPLE = 1.0
+
+    # Validate DATE_FROM and DATE_TO, a mistyped date must not silently report the whole history
+    if not isinstance(DATE_FROM, str) or not isinstance(DATE_TO, str):
+        logging.error(f"Invalid date range: {DATE_FROM!r} to {DATE_TO!r}. Dates must be written as YYYY-MM-DD.")
+        return False
+    try:
+        parse_date_range(DATE_FROM, DATE_TO)
+    except ValueError as e:
+        logging.error(f"Invalid date range: {e}")
+        return False
+
+    # Validate FILTER
+    if not isinstance(FILTER, str):
+        logging.warning(f"Invalid FILTER value: {FILTER!r}. Setting to default (no filter).")
+        FILTER = ""
+    elif FILTER.strip():
+        try:
+            EntryFilter(FILTER)
+        except ValueError as e:
+            logging.error(f"Invalid FILTER expression: {e}")
+            return False
+
     # Validate INPUT_DIR
     if not INPUT_DIR or not isinstance(INPUT_DIR, str):
         logging.error("INPUT_DIR cannot be empty and must be a string.")
         return False
 
-    # Create the input directory if it doesn't exist
-    try:
-        if not os.path.exists(INPUT_DIR):
-            logging.info(f"Creating input directory: {INPUT_DIR}")
-            os.makedirs(INPUT_DIR, exist_ok=True)
-    except Exception as e:
-        logging.error(f"Failed to create input directory: {e}")
-        return False
+    # A ZIP archive or compressed file must already exist, there is nothing to create
+    if INPUT_DIR.lower().endswith((".zip", ".json.gz")):
+        if not os.path.isfile(INPUT_DIR):
+            logging.error(f"Input file does not exist: {INPUT_DIR}")
+            return False
+    else:
+        # Create the input directory if it doesn't exist
+        try:
+            if not os.path.exists(INPUT_DIR):
+                logging.info(f"Creating input directory: {INPUT_DIR}")
+                os.makedirs(INPUT_DIR, exist_ok=True)
+        except Exception as e:
+            logging.error(f"Failed to create input directory: {e}")
+            return False
 
     # Validate OUTPUT_FILE
     if not OUTPUT_FILE or not isinstance(OUTPUT_FILE, str):
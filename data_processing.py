@@ -4,619 +4,1014 @@ Data processing module for Spotify Extended Streaming History.
 This module contains functions for loading, validating, and processing
 Spotify Extended Streaming History data.
 """
+import io
 import json
 import logging
-import os
-from collections import defaultdict, Counter
-from datetime import datetime
-from typing import Dict, List, Any, Tuple, Set, DefaultDict, Optional, Generator
+import zipfile
+import zlib
+from collections import defaultdict, deque, Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from itertools import islice
+from typing import IO, Dict, List, Any, Tuple, DefaultDict, Optional, Generator, Iterable, Iterator, Union
+
+from accumulator import ListeningAccumulator
+from aggregate_state import OVERLAP_WINDOW_MS, load_aggregate_state, new_aggregate_state, prune_boundary_keys, \
+    save_aggregate_state
+from date_range import TimeRange, filename_time_range, filter_store, in_range, intersect_ranges, ranges_overlap
+from dedupe import StreamingDeduplicator, store_dedupe_keys
+from entry_cache import get_cache_dir, has_cached_result, load_cached_result, load_cached_time_range, \
+    save_cached_result
+from entry_filter import EntryFilter
+from entry_store import EntryStore, datetime_to_ms
+from input_sources import MappedSource, find_json_sources, map_source, open_source, read_source, source_key, \
+    source_name, source_signature
+from json_backends import DEFAULT_DECODER, iter_json_entries
+from ordered_merge import NO_LATER_RECORDS, merge_stores
+from prefetch import read_ahead
+from timestamps import parse_timestamp, parse_timestamps
+
+# Fields that must be present for an entry to be considered at all
+REQUIRED_FIELDS = ['ts', 'ms_played']
+
+# Longest playtime accepted for a single entry before it is capped (24 hours)
+MAX_MS_PLAYED = 24 * 60 * 60 * 1000
+
+# Number of decoded entries validated and normalized together
+NORMALIZE_BATCH_SIZE = 2048
+
+
+def normalize_entry(
+    entry: Any,
+    now_ms: int,
+    invalid_reasons: Counter,
+    inconsistencies: Counter,
+    ts_ms: Optional[int] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Validate, parse and fix a single raw Spotify streaming history entry.
+
+    This is the only place an entry's timestamp is parsed. Every later stage
+    (deduplication, aggregation, On This Day) works on the returned record.
+
+    Args:
+        entry (Any): The raw entry as decoded from JSON
+        now_ms (int): Current time in epoch milliseconds, used for the future timestamp check
+        invalid_reasons (Counter): Counter to track why entries were rejected
+        inconsistencies (Counter): Counter to track types of inconsistencies fixed
+        ts_ms (Optional[int]): The entry's timestamp if already parsed by
+            parse_timestamps, otherwise it is parsed here
+
+    Returns:
+        Optional[Dict[str, Any]]: The normalized record, or None if the entry is invalid
+    """
+    if not isinstance(entry, dict):
+        invalid_reasons["not_dict"] += 1
+        return None
+
+    # Check that required fields exist
+    missing_fields = [field for field in REQUIRED_FIELDS if field not in entry]
+    if missing_fields:
+        invalid_reasons[f"missing_{','.join(missing_fields)}"] += 1
+        return None
+
+    # Validate and parse the timestamp
+    ts = entry["ts"]
+    if not isinstance(ts, str):
+        invalid_reasons["ts_not_string"] += 1
+        return None
+    if ts_ms is None:
+        try:
+            ts_ms = parse_timestamp(ts)
+        except ValueError:
+            invalid_reasons["invalid_timestamp"] += 1
+            return None
+
+    # Validate ms_played is a positive number
+    ms_played = entry["ms_played"]
+    if not isinstance(ms_played, (int, float)) or ms_played < 0:
+        invalid_reasons["invalid_ms_played"] += 1
+        return None
+
+    # Check for unreasonably large ms_played values (more than 24 hours)
+    if ms_played > MAX_MS_PLAYED:
+        ms_played = MAX_MS_PLAYED
+        inconsistencies["excessive_playtime"] += 1
+
+    # Check for future timestamps and set them to the current time
+    if ts_ms > now_ms:
+        ts_ms = now_ms
+        inconsistencies["future_timestamp"] += 1
+
+    artist = entry.get("master_metadata_album_artist_name")
+    track_name = entry.get("master_metadata_track_name")
+    album_name = entry.get("master_metadata_album_album_name")
+
+    # Check for missing artist but present track or album
+    if not artist and (track_name or album_name):
+        artist = "Unknown Artist"
+        inconsistencies["missing_artist"] += 1
+
+    # Check for missing track but present artist
+    if not track_name and artist:
+        track_name = "Unknown Track"
+        inconsistencies["missing_track"] += 1
+
+    # Check for a missing album but present artist
+    if not album_name and artist:
+        album_name = "Unknown Album"
+        inconsistencies["missing_album"] += 1
+
+    return {
+        "ts_ms": ts_ms,
+        "ms_played": ms_played,
+        "master_metadata_album_artist_name": artist,
+        "master_metadata_track_name": track_name,
+        "master_metadata_album_album_name": album_name,
+        "spotify_track_uri": entry.get("spotify_track_uri"),
+        "skipped": entry.get("skipped"),
+        "offline": entry.get("offline"),
+        "shuffle": entry.get("shuffle"),
+    }
 
-def validate_spotify_json(data: List[Dict[str, Any]]) -> bool:
+def normalize_spotify_json(
+    data: Union[List[Any], Iterator[Any]],
+    inconsistencies: Counter,
+    invalid_reasons: Counter,
+    time_range: Optional[TimeRange] = None,
+    entry_filter: Optional[EntryFilter] = None
+) -> Tuple[EntryStore, int]:
     """
-    Validate the structure of Spotify streaming history JSON data.
+    Validate and normalize the entries of one Spotify streaming history JSON file.
+
+    Entries are consumed in batches, so a decoder that yields them as the file
+    is read never has more than one batch of raw entries alive at once.
 
     Args:
-        data (List[Dict[str, Any]]): The parsed JSON data to validate
+        data (Union[List[Any], Iterator[Any]]): The decoded entries, as a list or as
+            an iterator such as iter_json_entries returns
+        inconsistencies (Counter): Counter to track types of inconsistencies fixed
+        invalid_reasons (Counter): Counter to track why entries were rejected
+        time_range (Optional[TimeRange]): Only keep valid entries in this range.
+            Entries outside it are not counted as invalid.
+        entry_filter (Optional[EntryFilter]): Only keep entries matching this filter.
+            It is checked on the normalized record, like on cached entries, with the
+            raw entry's other fields added when the filter reads them.
 
     Returns:
-        bool: True if the data is valid, False otherwise
+        Tuple[EntryStore, int]: The normalized records of all valid entries, and
+            the number of entries in the file
 
     Raises:
-        ValueError: If the data is not a list or is empty
+        ValueError: If the data is not a list
     """
-    if not isinstance(data, list):
+    if not isinstance(data, (list, Iterator)):
         raise ValueError("Spotify data must be a list of entries")
 
-    if not data:
-        logging.warning("Spotify data is empty")
-        return False
+    now_ms = datetime_to_ms(datetime.now(timezone.utc))
+    store = EntryStore()
+    append_record = store.append_record
+    entries = iter(data)
+    total = 0
+    raw_fields = entry_filter is not None and entry_filter.needs_raw_entries
+
+    while True:
+        batch = list(islice(entries, NORMALIZE_BATCH_SIZE))
+        if not batch:
+            break
+        total += len(batch)
+
+        # Convert the batch's timestamps in one go
+        timestamps = parse_timestamps(entry.get("ts") if isinstance(entry, dict) else None for entry in batch)
+
+        for entry, ts_ms in zip(batch, timestamps):
+            record = normalize_entry(entry, now_ms, invalid_reasons, inconsistencies, ts_ms)
+            if record is None or (time_range is not None and not in_range(record["ts_ms"], time_range)):
+                continue
+            if entry_filter is not None and not entry_filter.matches(record, entry if raw_fields else None):
+                continue
+            append_record(record)
 
-    # Check all entries for the basic structure
-    required_fields = ['ts', 'ms_played']
-    optional_metadata_fields = [
-        'master_metadata_album_artist_name',
-        'master_metadata_track_name',
-        'master_metadata_album_album_name'
-    ]
+    return store, total
 
-    valid_entries = 0
-    invalid_entries = 0
-    invalid_reasons = Counter()
+def validate_spotify_json(
+    data: Union[List[Any], Iterator[Any]],
+    inconsistencies: Counter,
+    invalid_reasons: Counter,
+    sample_rate: float = 1.0
+) -> Tuple[int, int]:
+    """
+    Validate a stratified sample of the entries of one Spotify streaming history JSON file.
 
-    for i, entry in enumerate(data):
-        if not isinstance(entry, dict):
-            invalid_entries += 1
-            invalid_reasons["not_dict"] += 1
-            continue
+    The sampled entries go through the same checks as in normalize_spotify_json,
+    so the counters mean the same, but no records are built. The sample takes
+    every n-th entry of each batch, starting at a different offset in each
+    batch, so it is spread evenly over the whole file.
 
-        # Check that required fields exist
-        missing_fields = [field for field in required_fields if field not in entry]
-        if missing_fields:
-            invalid_entries += 1
-            invalid_reasons[f"missing_{','.join(missing_fields)}"] += 1
-            continue
+    Args:
+        data (Union[List[Any], Iterator[Any]]): The decoded entries, as a list or as
+            an iterator such as iter_json_entries returns
+        inconsistencies (Counter): Counter to track types of inconsistencies found
+        invalid_reasons (Counter): Counter to track why entries were rejected
+        sample_rate (float): Share of the entries to check, between 0 and 1
 
-        # Validate timestamp format
-        try:
-            if not isinstance(entry["ts"], str):
-                invalid_reasons["ts_not_string"] += 1
-                continue
+    Returns:
+        Tuple[int, int]: The number of entries in the file and the number checked
 
-            # Try to parse the timestamp
-            datetime.fromisoformat(entry["ts"].replace("Z", "+00:00"))
-        except (ValueError, TypeError):
-            invalid_entries += 1
-            invalid_reasons["invalid_timestamp"] += 1
-            continue
+    Raises:
+        ValueError: If the data is not a list
+    """
+    if not isinstance(data, (list, Iterator)):
+        raise ValueError("Spotify data must be a list of entries")
 
-        # Validate ms_played is a positive number
-        try:
-            ms_played = entry["ms_played"]
-            if not isinstance(ms_played, (int, float)) or ms_played < 0:
-                invalid_entries += 1
-                invalid_reasons["invalid_ms_played"] += 1
-                continue
-        except (KeyError, TypeError):
-            invalid_entries += 1
-            invalid_reasons["missing_ms_played"] += 1
-            continue
+    step = max(1, round(1 / sample_rate))
+    now_ms = datetime_to_ms(datetime.now(timezone.utc))
+    entries = iter(data)
+    total = 0
+    checked = 0
+    batch_number = 0
+
+    while True:
+        batch = list(islice(entries, NORMALIZE_BATCH_SIZE))
+        if not batch:
+            break
+        total += len(batch)
+
+        sample = batch[batch_number % step::step]
+        batch_number += 1
+        checked += len(sample)
+        timestamps = parse_timestamps(entry.get("ts") if isinstance(entry, dict) else None for entry in sample)
+        for entry, ts_ms in zip(sample, timestamps):
+            normalize_entry(entry, now_ms, invalid_reasons, inconsistencies, ts_ms)
+
+    return total, checked
+
+def _open_input(file: str, data: Optional[Union[bytes, MappedSource]]) -> IO[bytes]:
+    # Prefer read-ahead data, then a memory map, then a buffered (decompressing) read
+    if isinstance(data, bytes):
+        return io.BytesIO(data)
+    if data is None:
+        data = map_source(file)
+    return data if data is not None else open_source(file)
+
+def read_spotify_json_file(
+    file: str,
+    time_range: Optional[TimeRange] = None,
+    entry_filter: Optional[EntryFilter] = None,
+    data: Optional[Union[bytes, MappedSource]] = None,
+    json_decoder: str = DEFAULT_DECODER
+) -> Dict[str, Any]:
+    """
+    Read, validate and normalize a single Spotify streaming history JSON file.
+
+    This does no logging and never raises for bad input, so it can run unchanged
+    in a worker process and send its compact result back to the parent.
+
+    Args:
+        file (str): Source string of the JSON file
+        time_range (Optional[TimeRange]): Only keep entries in this range
+        entry_filter (Optional[EntryFilter]): Only keep entries matching this filter
+        data (Optional[Union[bytes, MappedSource]]): Contents or mapping of the file if
+            already read ahead, otherwise it is mapped or opened here
+        json_decoder (str): Name of the JSON decoder backend to use
+
+    Returns:
+        Dict[str, Any]: Result of loading the file:
+            - entries: EntryStore of the normalized valid entries
+            - total: Number of entries in the file
+            - inconsistencies: Counter of inconsistencies fixed
+            - invalid_reasons: Counter of reasons entries were rejected
+            - error: Error message if the file could not be read, otherwise None
+    """
+    result = {
+        "entries": EntryStore(),
+        "total": 0,
+        "inconsistencies": Counter(),
+        "invalid_reasons": Counter(),
+        "error": None,
+    }
+    try:
+        # The standard library backend decodes entries as the file is read
+        with _open_input(file, data) as f:
+            result["entries"], result["total"] = normalize_spotify_json(
+                iter_json_entries(f, json_decoder), result["inconsistencies"], result["invalid_reasons"],
+                time_range, entry_filter
+            )
+    except (OSError, EOFError, zipfile.BadZipFile, zlib.error, json.JSONDecodeError) as e:
+        result["error"] = f"Error reading {file}: {e}"
+    except ValueError as e:
+        result["error"] = f"Invalid data format in {file}: {e}"
+    return result
+
+def _uses_cache(cache_dir: Optional[str], entry_filter: Optional[EntryFilter]) -> bool:
+    # Filters on fields the cache does not keep must see the raw entries
+    return cache_dir is not None and not (entry_filter is not None and entry_filter.needs_raw_entries)
+
+def _prefetch_source(
+    file: str,
+    cache_dir: Optional[str],
+    entry_filter: Optional[EntryFilter]
+) -> Optional[Union[bytes, MappedSource]]:
+    """
+    Read a JSON file ahead of time, unless it will be loaded from the cache.
+
+    Plain files are pulled into the OS page cache and handed over as a memory
+    map, so no copy of them is held in memory. Compressed files are read and
+    decompressed into bytes.
+
+    Args:
+        file (str): Source string of the JSON file
+        cache_dir (Optional[str]): Cache directory, or None if caching is disabled
+        entry_filter (Optional[EntryFilter]): Filter the file will be read with
+
+    Returns:
+        Optional[Union[bytes, MappedSource]]: The warmed mapping or contents of
+            the file, or None if it has a usable cache entry
+    """
+    if _uses_cache(cache_dir, entry_filter) and has_cached_result(file, cache_dir):
+        return None
+    mapped = map_source(file)
+    if mapped is None:
+        return read_source(file)
+    try:
+        mapped.warm()
+    except OSError:
+        mapped.close()
+        raise
+    return mapped
+
+def read_spotify_json_file_cached(
+    file: str,
+    cache_dir: Optional[str],
+    time_range: Optional[TimeRange] = None,
+    entry_filter: Optional[EntryFilter] = None,
+    data: Optional[Union[bytes, MappedSource]] = None,
+    json_decoder: str = DEFAULT_DECODER
+) -> Dict[str, Any]:
+    """
+    Read a Spotify streaming history JSON file, using the parsed entry cache when possible.
+
+    The cache always holds every entry of the file, so with caching enabled the
+    date range and filter are applied after the file is loaded rather than while
+    decoding. A filter on fields the cache does not keep (such as platform)
+    bypasses the cache and is applied while decoding.
+
+    Args:
+        file (str): Source string of the JSON file
+        cache_dir (Optional[str]): Cache directory, or None to disable caching
+        time_range (Optional[TimeRange]): Only keep entries in this range
+        entry_filter (Optional[EntryFilter]): Only keep entries matching this filter
+        data (Optional[Union[bytes, MappedSource]]): Contents or mapping of the file if already read ahead
+        json_decoder (str): Name of the JSON decoder backend to use
+
+    Returns:
+        Dict[str, Any]: Result shaped like read_spotify_json_file's, with an extra
+            "cached" flag telling whether it came from the cache
+    """
+    if not _uses_cache(cache_dir, entry_filter):
+        result = read_spotify_json_file(file, time_range, entry_filter, data, json_decoder)
+        result["cached"] = False
+        return result
+
+    result = load_cached_result(file, cache_dir)
+    if result is not None:
+        result["cached"] = True
+        if isinstance(data, MappedSource):
+            data.close()
+    else:
+        result = read_spotify_json_file(file, data=data, json_decoder=json_decoder)
+        if result["error"] is None:
+            save_cached_result(file, cache_dir, result)
+        result["cached"] = False
+
+    if time_range is not None:
+        result["entries"] = filter_store(result["entries"], time_range)
+    if entry_filter is not None:
+        result["entries"] = entry_filter.select(result["entries"])
+    return result
+
+def check_file_validity(file: str, result: Dict[str, Any]) -> bool:
+    """
+    Log the validation results of a loaded file and decide whether to use it.
 
-        # Entry passed all validation checks
-        valid_entries += 1
+    Args:
+        file (str): Source string of the JSON file
+        result (Dict[str, Any]): Result returned by read_spotify_json_file or
+            validate_spotify_json_file
+
+    Returns:
+        bool: True if at least 70% of the file's (checked) entries are valid, False otherwise
+    """
+    if not result["total"]:
+        logging.warning("Spotify data is empty")
+        return False
 
-    # Log validation results
-    total_entries = len(data)
-    valid_percentage = (valid_entries / total_entries) * 100 if total_entries > 0 else 0
+    # Entries left out by the date range are valid, so count the rejected ones
+    total_entries = result.get("checked", result["total"])
+    invalid_entries = sum(result["invalid_reasons"].values())
+    valid_entries = total_entries - invalid_entries
+    valid_percentage = (valid_entries / total_entries) * 100 if total_entries else 100.0
 
     if invalid_entries > 0:
-        logging.warning(f"Found {invalid_entries} invalid entries out of {total_entries} ({invalid_entries/total_entries:.1%})")
-        for reason, count in invalid_reasons.most_common():
+        sampled = " sampled" if total_entries < result["total"] else ""
+        logging.warning(f"Found {invalid_entries} invalid entries out of {total_entries}{sampled} "
+                        f"({invalid_entries/total_entries:.1%})")
+        for reason, count in result["invalid_reasons"].most_common():
             logging.warning(f"  - {reason}: {count} entries")
 
     # If at least 70% of the entries are valid, consider the data valid
     return valid_percentage >= 70.0
 
-def load_spotify_json_files(input_dir: str) -> Generator[Dict[str, Any], None, None]:
+def validate_spotify_json_file(
+    file: str,
+    sample_rate: float = 1.0,
+    json_decoder: str = DEFAULT_DECODER
+) -> Dict[str, Any]:
     """
-    Generator function to load and yield Spotify streaming history entries from JSON files.
+    Check a Spotify streaming history JSON file without loading its records.
+
+    Like read_spotify_json_file this does no logging and never raises for bad
+    input, so it can run in a worker process.
 
     Args:
-        input_dir (str): Directory containing JSON files
+        file (str): Source string of the JSON file
+        sample_rate (float): Share of the entries to check, between 0 and 1
+        json_decoder (str): Name of the JSON decoder backend to use
 
-    Yields:
-        Dict[str, Any]: Individual Spotify streaming history entries
+    Returns:
+        Dict[str, Any]: Result of checking the file:
+            - total: Number of entries in the file
+            - checked: Number of entries checked
+            - inconsistencies: Counter of inconsistencies found in the checked entries
+            - invalid_reasons: Counter of reasons checked entries were rejected
+            - error: Error message if the file could not be read, otherwise None
+    """
+    result = {
+        "total": 0,
+        "checked": 0,
+        "inconsistencies": Counter(),
+        "invalid_reasons": Counter(),
+        "error": None,
+    }
+    try:
+        with _open_input(file, None) as f:
+            result["total"], result["checked"] = validate_spotify_json(
+                iter_json_entries(f, json_decoder), result["inconsistencies"], result["invalid_reasons"],
+                sample_rate
+            )
+    except (OSError, EOFError, zipfile.BadZipFile, zlib.error, json.JSONDecodeError) as e:
+        result["error"] = f"Error reading {file}: {e}"
+    except ValueError as e:
+        result["error"] = f"Invalid data format in {file}: {e}"
+    return result
+
+def validate_spotify_files(
+    input_dir: str,
+    sample_rate: float = 1.0,
+    workers: int = 1,
+    json_decoder: str = DEFAULT_DECODER
+) -> bool:
+    """
+    Check every JSON file of an export and log what is wrong with them, without building a report.
+
+    Args:
+        input_dir (str): Directory, ZIP archive or .json.gz file containing the JSON files
+        sample_rate (float): Share of each file's entries to check, between 0 and 1
+        workers (int): Number of worker processes used to check files in parallel
+        json_decoder (str): Name of the JSON decoder backend to use
+
+    Returns:
+        bool: True if every file can be read and is usable, False otherwise
 
     Raises:
         FileNotFoundError: If the input directory does not exist
+        ValueError: If the input is a file that is not a ZIP archive or JSON file
     """
-    if not os.path.exists(input_dir):
-        raise FileNotFoundError(f"Input directory '{input_dir}' does not exist")
-
-    json_files = [
-        os.path.join(input_dir, filename)
-        for filename in os.listdir(input_dir)
-        if filename.endswith(".json")
-    ]
-
+    json_files = find_json_sources(input_dir)
     if not json_files:
         logging.warning("⚠️ No JSON files found in the directory.")
-        return
-
-    total_files = len(json_files)
-    logging.info(f"Loading data from {total_files} JSON files in {input_dir}")
-
-    for i, file in enumerate(json_files, 1):
-        try:
-            logging.info(f"Processing file {i}/{total_files}: {os.path.basename(file)}")
-
-            with open(file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+        return False
 
-            # Validate the JSON data structure
-            if not validate_spotify_json(data):
-                logging.warning(f"⚠️ File {file} has invalid data structure, skipping")
-                continue
+    logging.info(f"Validating {len(json_files)} JSON files in {input_dir}"
+                 f"{f' ({sample_rate:.0%} sample)' if sample_rate < 1 else ''}")
 
-            # Yield entries one at a time
-            for entry in data:
-                yield entry
+    check = partial(validate_spotify_json_file, sample_rate=sample_rate, json_decoder=json_decoder)
+    workers = min(workers, len(json_files))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(check, json_files))
+    else:
+        results = map(check, json_files)
 
-        except (FileNotFoundError, json.JSONDecodeError) as e:
-            logging.error(f"⚠️ Error reading {file}: {e}")
+    usable = 0
+    total = checked = 0
+    invalid_reasons = Counter()
+    inconsistencies = Counter()
+    for i, (file, result) in enumerate(zip(json_files, results), 1):
+        logging.info(f"Checking file {i}/{len(json_files)}: {source_name(file)}")
+        if result["error"]:
+            logging.error(f"⚠️ {result['error']}")
             continue
-        except ValueError as e:
-            logging.error(f"⚠️ Invalid data format in {file}: {e}")
+        if not check_file_validity(file, result):
+            logging.warning(f"⚠️ File {file} has invalid data structure, it would be skipped")
             continue
+        usable += 1
+        total += result["total"]
+        checked += result["checked"]
+        invalid_reasons.update(result["invalid_reasons"])
+        inconsistencies.update(result["inconsistencies"])
+
+    logging.info(f"{usable} of {len(json_files)} files are usable, {checked} of their {total} entries checked")
+    if invalid_reasons:
+        logging.info(f"{sum(invalid_reasons.values())} checked entries would be dropped:")
+        for reason, count in invalid_reasons.most_common():
+            logging.info(f"  - {reason}: {count}")
+    if inconsistencies:
+        logging.info(f"{sum(inconsistencies.values())} inconsistencies would be fixed:")
+        for reason, count in inconsistencies.most_common():
+            logging.info(f"  - {reason}: {count}")
 
-def load_spotify_data(input_dir: str) -> List[Dict[str, Any]]:
+    return usable == len(json_files)
+
+def _read_files(
+    json_files: List[str],
+    workers: int,
+    cache_dir: Optional[str],
+    time_range: Optional[TimeRange] = None,
+    entry_filter: Optional[EntryFilter] = None,
+    prefetch: int = 0,
+    json_decoder: str = DEFAULT_DECODER
+) -> Iterator[Dict[str, Any]]:
     """
-    Load Spotify streaming history data from JSON files in the specified directory.
-    Performs validation, deduplication, and consistency checks on the data.
-    Uses generators for memory-efficient processing of large datasets.
+    Read JSON files in order, either in this process or on a process pool.
 
     Args:
-        input_dir (str): Directory containing JSON files
+        json_files (List[str]): Paths of the files to read
+        workers (int): Number of worker processes, 1 reads sequentially
+        cache_dir (Optional[str]): Cache directory, or None to disable caching
+        time_range (Optional[TimeRange]): Only keep entries in this range
+        entry_filter (Optional[EntryFilter]): Only keep entries matching this filter
+        prefetch (int): Number of files read ahead on a background thread when
+            reading sequentially, 0 to read each file when it is processed
+        json_decoder (str): Name of the JSON decoder backend to use
 
-    Returns:
-        List[Dict[str, Any]]: List of valid Spotify streaming history entries
+    Yields:
+        Dict[str, Any]: Result of read_spotify_json_file_cached for each file, in input order
+    """
+    read = partial(read_spotify_json_file_cached, cache_dir=cache_dir, time_range=time_range,
+                   entry_filter=entry_filter, json_decoder=json_decoder)
+    workers = min(workers, len(json_files))
+    if workers <= 1:
+        if prefetch > 0 and len(json_files) > 1:
+            fetch = partial(_prefetch_source, cache_dir=cache_dir, entry_filter=entry_filter)
+            for file, data in read_ahead(json_files, fetch, prefetch):
+                yield read(file, data=data)
+            return
+        yield from map(read, json_files)
+        return
 
-    Raises:
-        FileNotFoundError: If the input directory does not exist
+    # Keep only one file per worker in flight, so finished results do not pile
+    # up in memory while the parent is still aggregating an earlier file
+    logging.info(f"Reading files with {workers} worker processes")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        files = iter(json_files)
+        pending = deque(executor.submit(read, file) for file in islice(files, workers))
+        while pending:
+            result = pending.popleft().result()
+            next_file = next(files, None)
+            if next_file is not None:
+                pending.append(executor.submit(read, next_file))
+            yield result
+
+def file_outside_range(file: str, time_range: TimeRange, cache_dir: Optional[str]) -> bool:
     """
-    # Use generator to load entries
-    all_entries = list(load_spotify_json_files(input_dir))
+    Check, without opening a JSON file, whether none of its entries can fall in a date range.
 
-    if not all_entries:
-        logging.warning("No valid entries found in any of the JSON files.")
-        return []
+    The years in Spotify's file names (e.g. Streaming_History_Audio_2019-2020_3.json)
+    are used first, then the earliest and latest timestamp stored in the file's cache.
 
-    # Log the initial count of entries
-    initial_count = len(all_entries)
-    logging.info(f"Loaded {initial_count} entries")
+    Args:
+        file (str): Source string of the JSON file
+        time_range (TimeRange): The date range
+        cache_dir (Optional[str]): Cache directory, or None if caching is disabled
 
-    # Check for and remove duplicate entries
-    logging.info("Checking for duplicate entries...")
-    deduplicated_entries = check_for_duplicates(all_entries)
+    Returns:
+        bool: True if the file can be skipped
+    """
+    name_range = filename_time_range(source_name(file))
+    if name_range is not None and not ranges_overlap(name_range[0], name_range[1] - 1, time_range):
+        return True
 
-    # Perform data consistency checks
-    logging.info("Performing data consistency checks...")
-    validated_entries = perform_data_consistency_checks(deduplicated_entries)
+    if cache_dir is not None:
+        cached_range = load_cached_time_range(file, cache_dir)
+        if cached_range is not None:
+            first_ts, last_ts = cached_range
+            return first_ts is None or not ranges_overlap(first_ts, last_ts, time_range)
 
-    # Log the final count of entries
-    final_count = len(validated_entries)
-    if final_count != initial_count:
-        logging.info(f"After validation and deduplication: {final_count} entries ({initial_count - final_count} removed)")
+    return False
 
-    return validated_entries
+def file_start_bound(file: str, cache_dir: Optional[str]) -> Optional[int]:
+    """
+    Get the earliest timestamp a JSON file can hold, without opening it.
 
-def process_entry(
-    entry: Dict[str, Any], 
-    min_milliseconds: int,
-    yearly: DefaultDict[int, Dict[str, DefaultDict[str, int]]],
-    dates_set: Set[datetime.date],
-    first_ts: Optional[datetime],
-    first_entry: Optional[Dict[str, Any]],
-    last_ts: Optional[datetime],
-    last_entry: Optional[Dict[str, Any]],
-    artist_set: Set[str],
-    album_set: Set[str],
-    track_set: Set[str],
-    artist_tracks: DefaultDict[str, Set[str]],
-    daily_counts: Counter,
-    monthly_counts: Counter,
-    weekday_counts: Counter,
-    hour_counts: Counter,
-    play_times: List[datetime],
-    play_counted: int,
-    skip_count: int,
-    offline_count: int,
-    track_skip_counts: Counter
-) -> Tuple[
-    DefaultDict[int, Dict[str, DefaultDict[str, int]]],
-    Set[datetime.date],
-    Optional[datetime],
-    Optional[Dict[str, Any]],
-    Optional[datetime],
-    Optional[Dict[str, Any]],
-    Set[str],
-    Set[str],
-    Set[str],
-    DefaultDict[str, Set[str]],
-    Counter,
-    Counter,
-    Counter,
-    Counter,
-    List[datetime],
-    int,
-    int,
-    int,
-    Counter
-]:
-    """
-    Process a single Spotify streaming history entry and update statistics.
+    The earliest timestamp stored in the file's cache is used first, then the
+    first year in Spotify's file name (e.g. Streaming_History_Audio_2019-2020_3.json).
 
     Args:
-        entry (Dict[str, Any]): The entry to process
-        min_milliseconds (int): Minimum milliseconds for a play to count
-        yearly: Dictionary of yearly statistics
-        dates_set: Set of dates played
-        first_ts: First timestamp
-        first_entry: First entry
-        last_ts: Last timestamp
-        last_entry: Last entry
-        artist_set: Set of artists
-        album_set: Set of albums
-        track_set: Set of tracks
-        artist_tracks: Dictionary mapping artists to their tracks
-        daily_counts: Counter of plays per day
-        monthly_counts: Counter of plays per month
-        weekday_counts: Counter of plays per weekday
-        hour_counts: Counter of plays per hour
-        play_times: List of play timestamps
-        play_counted: Total number of plays counted
-        skip_count: Number of skipped tracks
-        offline_count: Number of offline plays
-        track_skip_counts: Counter of skips per track
+        file (str): Source string of the JSON file
+        cache_dir (Optional[str]): Cache directory, or None if caching is disabled
 
     Returns:
-        Tuple containing updated statistics
+        Optional[int]: Epoch milliseconds (NO_LATER_RECORDS if the file has no valid
+            entries), or None if it is not known
     """
-    try:
-        # Skip entries with no playtime or missing required fields
-        if not entry.get("ms_played") or entry["ms_played"] <= 0:
-            return (
-                yearly, dates_set, first_ts, first_entry, last_ts, last_entry,
-                artist_set, album_set, track_set, artist_tracks, daily_counts,
-                monthly_counts, weekday_counts, hour_counts, play_times,
-                play_counted, skip_count, offline_count, track_skip_counts
-            )
+    if cache_dir is not None:
+        cached_range = load_cached_time_range(file, cache_dir)
+        if cached_range is not None:
+            first_ts, _ = cached_range
+            return first_ts if first_ts is not None else NO_LATER_RECORDS
 
-        # Skip entries with a missing timestamp
-        if "ts" not in entry:
-            logging.warning(f"Entry missing timestamp, skipping: {entry.get('master_metadata_track_name', 'Unknown track')}")
-            return (
-                yearly, dates_set, first_ts, first_entry, last_ts, last_entry,
-                artist_set, album_set, track_set, artist_tracks, daily_counts,
-                monthly_counts, weekday_counts, hour_counts, play_times,
-                play_counted, skip_count, offline_count, track_skip_counts
-            )
+    name_range = filename_time_range(source_name(file))
+    return name_range[0] if name_range is not None else None
 
-        # Year Filter
-        # if int(entry.get("ts")[:4]) < 2018:
-        #     logging.info(f"Skipping entry because it's less than the year filter, skipping: {entry.get('master_metadata_track_name', 'Unknown track')} Time: {entry.get('ts')[:4]}")
-        #     return (
-        #         yearly, dates_set, first_ts, first_entry, last_ts, last_entry,
-        #         artist_set, album_set, track_set, artist_tracks, daily_counts,
-        #         monthly_counts, weekday_counts, hour_counts, play_times,
-        #         play_counted, skip_count, offline_count, track_skip_counts
-        #         )
-
-        # Process entries with artist information
-        if entry.get("master_metadata_album_artist_name"):
-            # Get the artist name or use fallback
-            artist = entry.get("master_metadata_album_artist_name", "Unknown Artist")
-
-            # Handle missing track or album names gracefully
-            track_name = entry.get("master_metadata_track_name", "Unknown Track")
-            album_name = entry.get("master_metadata_album_album_name", "Unknown Album")
-
-            # Create full track and album identifiers
-            track = f"{track_name} - {artist}"
-            album = f"{album_name} - {artist}"
-
-            # Parse timestamp with error handling
-            try:
-                dt = datetime.fromisoformat(entry["ts"].replace("Z", "+00:00"))
-                year = dt.year
-            except (ValueError, TypeError) as e:
-                logging.warning(f"Invalid timestamp format in entry, using current year: {e}")
-                dt = datetime.now()
-                year = dt.year
-
-            y = yearly[year]
-
-            # ─── update stats info ─────────────────────────────────
-            dates_set.add(dt.date())
-            if first_ts is None or dt < first_ts:
-                first_ts = dt
-                first_entry = entry
-            if last_ts is None or dt > last_ts:
-                last_ts = dt
-                last_entry = entry
-
-            if entry["ms_played"] > min_milliseconds:
-                daily_counts[dt.date()] += 1
-                monthly_counts[(dt.year, dt.month)] += 1
-                weekday_counts[dt.weekday()] += 1
-                hour_counts[dt.hour] += 1
-                play_times.append(dt)
-                play_counted += 1
-                if entry.get("offline"):
-                    offline_count += 1
-
-            if entry.get("skipped"):
-                skip_count += 1
-                track_skip_counts[track] += 1
-
-            artist_set.add(artist)
-            track_set.add(track)
-            album_set.add(album)
-            artist_tracks[artist].add(track)
-            # ───────────────────────────────────────────────────────────
-
-            # Update counts and times
-            if entry.get("ms_played") > min_milliseconds:
-                y["artist_counts"][artist] += 1
-                y["track_counts"][track] += 1
-                y["album_counts"][album] += 1
-
-            # Update play times
-            y["artist_time"][artist] += entry["ms_played"]
-            y["track_time"][track] += entry["ms_played"]
-            y["album_time"][album] += entry["ms_played"]
-    except Exception as e:
-        # Catch any unexpected errors during entry processing
-        logging.error(f"Error processing entry: {e}")
-
-    return (
-        yearly, dates_set, first_ts, first_entry, last_ts, last_entry,
-        artist_set, album_set, track_set, artist_tracks, daily_counts,
-        monthly_counts, weekday_counts, hour_counts, play_times,
-        play_counted, skip_count, offline_count, track_skip_counts
-    )
-
-def process_spotify_data(entries: List[Dict[str, Any]], min_milliseconds: int) -> tuple[
-    defaultdict[Any, dict[str, defaultdict[Any, int]]] | defaultdict[int, dict[str, defaultdict[str, int]]], set[
-        Any], datetime | None, dict[str, Any] | None, datetime | None, dict[str, Any] | None, set[Any] | set[str], set[
-        Any] | set[str], set[Any] | set[str], defaultdict[Any, set] | defaultdict[str, set[str]], Counter[
-        Any] | Counter, Counter[Any] | Counter, Counter[Any] | Counter, Counter[Any] | Counter, list[Any] | list[
-        datetime], int, int, int, Counter[Any] | Counter, str]:
-    """
-    Process Spotify streaming history entries and extract statistics.
-    Uses a generator-based approach for memory efficiency.
+def later_starts(json_files: List[str], cache_dir: Optional[str]) -> List[Optional[int]]:
+    """
+    Get, for each JSON file, the earliest timestamp any of the files after it can hold.
 
     Args:
-        entries (List[Dict[str, Any]]): List of Spotify streaming history entries
-        min_milliseconds (int): Minimum milliseconds for a play to count
+        json_files (List[str]): Source strings of the JSON files, in reading order
+        cache_dir (Optional[str]): Cache directory, or None if caching is disabled
 
     Returns:
-        Tuple containing various statistics:
-            - yearly: Dictionary of yearly statistics
-            - dates_set: Set of dates played
-            - first_ts: First timestamp
-            - first_entry: First entry
-            - last_ts: Last timestamp
-            - last_entry: Last entry
-            - artist_set: Set of artists
-            - album_set: Set of albums
-            - track_set: Set of tracks
-            - artist_tracks: Dictionary mapping artists to their tracks
-            - daily_counts: Counter of plays per day
-            - monthly_counts: Counter of plays per month
-            - weekday_counts: Counter of plays per weekday
-            - hour_counts: Counter of plays per hour
-            - play_times: List of play timestamps
-            - play_counted: Total number of plays counted
-            - skip_count: Number of skipped tracks
-            - offline_count: Number of offline plays
-            - track_skip_counts: Counter of skips per track
-    """
-    yearly = defaultdict(lambda: {
-        "artist_counts": defaultdict(int),
-        "artist_time": defaultdict(int),
-        "track_counts": defaultdict(int),
-        "track_time": defaultdict(int),
-        "album_counts": defaultdict(int),
-        "album_time": defaultdict(int),
-    })
-
-    dates_set = set()
-    first_ts = None
-    first_entry = None
-    last_ts = None
-    last_entry = None
-    artist_set = set()
-    album_set = set()
-    track_set = set()
-    artist_tracks = defaultdict(set)
-    daily_counts = Counter()
-    monthly_counts = Counter()
-    weekday_counts = Counter()
-    hour_counts = Counter()
-    play_times = []
-    play_counted = 0
-    skip_count = 0
-    offline_count = 0
-    track_skip_counts = Counter()
-
-    # Process entries one at a time
-    for entry in entries:
-        (
-            yearly, dates_set, first_ts, first_entry, last_ts, last_entry,
-            artist_set, album_set, track_set, artist_tracks, daily_counts,
-            monthly_counts, weekday_counts, hour_counts, play_times,
-            play_counted, skip_count, offline_count, track_skip_counts
-        ) = process_entry(
-            entry, min_milliseconds, yearly, dates_set, first_ts, first_entry, 
-            last_ts, last_entry, artist_set, album_set, track_set, artist_tracks, 
-            daily_counts, monthly_counts, weekday_counts, hour_counts, play_times,
-            play_counted, skip_count, offline_count, track_skip_counts
-        )
-
-    date_to_tracks = defaultdict(Counter)
-    for entry in entries:
-        if entry.get("ms_played", 0) > min_milliseconds:
-            dt = datetime.fromisoformat(entry["ts"].replace("Z", "+00:00")).date()
-            mmdd = dt.strftime("%m-%d")
-            full_date = dt.isoformat()
-            track_name = entry.get("master_metadata_track_name", "Unknown Track")
-            artist = entry.get("master_metadata_album_artist_name", "Unknown Artist")
-            track = f"{track_name} — {artist}"
-            date_to_tracks[mmdd][(track, full_date)] += 1
-
-    # Convert to JSON-ready format, excluding any entries with only 1 play
-    otd = {}
-    for mmdd, ctr in date_to_tracks.items():
-        otd[mmdd] = [
-            {"track": track, "date": date, "count": count}
-            for (track, date), count in ctr.items()
-            if count > 2
-        ]
-
-    otd_json = json.dumps(otd, indent=2)
-
-    return (
-        yearly, dates_set, first_ts, first_entry, last_ts, last_entry,
-        artist_set, album_set, track_set, artist_tracks, daily_counts,
-        monthly_counts, weekday_counts, hour_counts, play_times,
-        play_counted, skip_count, offline_count, track_skip_counts, otd_json
-    )
-
-def process_entry_for_deduplication(entry: Dict[str, Any], unique_entries: Dict[str, Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], bool]:
-    """
-    Process a single entry for deduplication.
+        List[Optional[int]]: Epoch milliseconds for each file (NO_LATER_RECORDS after
+            the last one), None where a later file's start is not known
+    """
+    starts = []
+    later: Optional[int] = NO_LATER_RECORDS
+    for file in reversed(json_files):
+        starts.append(later)
+        start = file_start_bound(file, cache_dir)
+        later = None if start is None or later is None else min(start, later)
+    starts.reverse()
+    return starts
+
+def load_spotify_json_files(
+    input_dir: str,
+    inconsistencies: Optional[Counter] = None,
+    workers: int = 1,
+    use_cache: bool = False,
+    json_files: Optional[List[str]] = None,
+    time_range: Optional[TimeRange] = None,
+    entry_filter: Optional[EntryFilter] = None,
+    prefetch: int = 0,
+    json_decoder: str = DEFAULT_DECODER,
+    with_later_start: bool = False
+) -> Generator[Union[EntryStore, Tuple[EntryStore, Optional[int]]], None, None]:
+    """
+    Generator function to load and yield normalized Spotify streaming history records from JSON files.
 
     Args:
-        entry (Dict[str, Any]): The entry to process
-        unique_entries (Dict[str, Dict[str, Any]]): Dictionary of unique entries seen so far
+        input_dir (str): Directory, ZIP archive or .json.gz file containing the JSON files
+        inconsistencies (Optional[Counter]): Counter to track types of inconsistencies fixed
+        workers (int): Number of worker processes used to read and normalize files in parallel
+        use_cache (bool): Whether to use the parsed entry cache in the input directory
+        json_files (Optional[List[str]]): Files to load, defaults to every JSON file in the input directory
+        time_range (Optional[TimeRange]): Only load entries in this range, skipping
+            files that lie entirely outside it
+        entry_filter (Optional[EntryFilter]): Only load entries matching this filter.
+            Files outside a date range the filter requires are skipped as well.
+        prefetch (int): Number of files read ahead on a background thread while
+            the current one is processed
+        json_decoder (str): Name of the JSON decoder backend to use
+        with_later_start (bool): Yield each store with the earliest timestamp the
+            files after it can hold (see later_starts), as merge_stores expects
 
-    Returns:
-        Tuple[Dict[str, Dict[str, Any]], bool]: Updated unique_entries dictionary and a boolean indicating if the entry was a duplicate
+    Yields:
+        EntryStore: Normalized Spotify streaming history records of each usable file,
+            or (records, later start) pairs with with_later_start
+
+    Raises:
+        FileNotFoundError: If the input directory does not exist
+        ValueError: If the input is a file that is not a ZIP archive or JSON file
     """
-    try:
-        ts = entry.get("ts", "")
-        track = entry.get("master_metadata_track_name", "Unknown Track")
-        artist = entry.get("master_metadata_album_artist_name", "Unknown Artist")
-        ms_played = entry.get("ms_played", 0)
+    if inconsistencies is None:
+        inconsistencies = Counter()
+
+    if json_files is None:
+        json_files = find_json_sources(input_dir)
+
+    if not json_files:
+        logging.warning("⚠️ No JSON files found in the directory.")
+        return
+
+    cache_dir = get_cache_dir(input_dir) if use_cache else None
 
-        # Create a unique identifier for this entry
-        entry_key = f"{ts}|{track}|{artist}|{ms_played}"
+    if entry_filter is not None:
+        logging.info(f"Filtering entries with: {entry_filter.expression}")
 
-        is_duplicate = entry_key in unique_entries
-        if not is_duplicate:
-            unique_entries[entry_key] = entry
+    file_range = intersect_ranges(time_range, entry_filter.time_range() if entry_filter is not None else None)
+    if file_range is not None:
+        in_range_files = [file for file in json_files if not file_outside_range(file, file_range, cache_dir)]
+        skipped = len(json_files) - len(in_range_files)
+        if skipped:
+            logging.info(f"Skipping {skipped} JSON files outside the date range")
+        json_files = in_range_files
+        if not json_files:
+            logging.warning("⚠️ No JSON files cover the date range.")
+            return
+
+    total_files = len(json_files)
+    logging.info(f"Loading data from {total_files} JSON files in {input_dir}")
+    starts = later_starts(json_files, cache_dir) if with_later_start else None
 
-        return unique_entries, is_duplicate
-    except Exception as e:
-        logging.error(f"Error processing entry for duplicate check: {e}")
-        # Return the entry as non-duplicate in case of error to avoid data loss
-        return unique_entries, False
+    results = _read_files(json_files, workers, cache_dir, time_range, entry_filter, prefetch, json_decoder)
+    for i, (file, result) in enumerate(zip(json_files, results), 1):
+        logging.info(f"Processing file {i}/{total_files}: {source_name(file)}"
+                     f"{' (cached)' if result['cached'] else ''}")
 
-def check_for_duplicates(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if result["error"]:
+            logging.error(f"⚠️ {result['error']}")
+            continue
+
+        # Validate the JSON data structure
+        if not check_file_validity(file, result):
+            logging.warning(f"⚠️ File {file} has invalid data structure, skipping")
+            continue
+
+        inconsistencies.update(result["inconsistencies"])
+
+        yield (result["entries"], starts[i - 1]) if with_later_start else result["entries"]
+
+def iter_spotify_stores(
+    input_dir: str,
+    workers: int = 1,
+    use_cache: bool = False,
+    time_range: Optional[TimeRange] = None,
+    entry_filter: Optional[EntryFilter] = None,
+    prefetch: int = 0,
+    json_decoder: str = DEFAULT_DECODER
+) -> Generator[EntryStore, None, None]:
     """
-    Check for and remove duplicate entries in the Spotify streaming history data.
-    Uses a generator-based approach for memory efficiency.
+    Load, validate, fix and deduplicate Spotify streaming history records in one pass.
+
+    Each entry is parsed exactly once into the EntryStore of its file. The
+    files are merged into one stream in timestamp order and duplicates are
+    dropped from it, so the result can be fed straight into process_spotify_data.
 
     Args:
-        entries (List[Dict[str, Any]]): List of Spotify streaming history entries
+        input_dir (str): Directory, ZIP archive or .json.gz file containing the JSON files
+        workers (int): Number of worker processes used to read and normalize files in parallel
+        use_cache (bool): Whether to use the parsed entry cache in the input directory
+        time_range (Optional[TimeRange]): Only load entries in this range
+        entry_filter (Optional[EntryFilter]): Only load entries matching this filter
+        prefetch (int): Number of files read ahead on a background thread
+        json_decoder (str): Name of the JSON decoder backend to use
 
-    Returns:
-        List[Dict[str, Any]]: List of entries with duplicates removed
-    """
-    if not entries:
-        return []
+    Yields:
+        EntryStore: Unique normalized Spotify streaming history records, in timestamp order
 
-    # Create a dictionary to track unique entries
-    unique_entries = {}
+    Raises:
+        FileNotFoundError: If the input directory does not exist
+    """
+    inconsistencies = Counter()
+    # Duplicates share their timestamp, so in timestamp order only the keys of
+    # the current timestamp have to be kept
+    deduplicator = StreamingDeduplicator(window_ms=0)
+    add_key = deduplicator.add
+    loaded = 0
     duplicates = 0
 
-    # Process entries one at a time
-    for entry in entries:
-        unique_entries, is_duplicate = process_entry_for_deduplication(entry, unique_entries)
-        if is_duplicate:
-            duplicates += 1
+    stores = load_spotify_json_files(input_dir, inconsistencies, workers, use_cache,
+                                     time_range=time_range, entry_filter=entry_filter, prefetch=prefetch,
+                                     json_decoder=json_decoder, with_later_start=True)
+    for store in merge_stores(stores):
+        loaded += len(store)
+
+        # Check for and skip duplicate entries
+        keep = [i for i, (ts, key) in enumerate(store_dedupe_keys(store)) if add_key(ts, key)]
+
+        if len(keep) < len(store):
+            duplicates += len(store) - len(keep)
+            store = store.select(keep)
+
+        yield store
 
+    logging.info(f"Loaded {loaded} entries")
+    logging.debug(f"Deduplication kept {len(deduplicator)} keys")
     if duplicates > 0:
         logging.info(f"Removed {duplicates} duplicate entries from dataset")
 
-    return list(unique_entries.values())
+    # Log inconsistency statistics
+    if sum(inconsistencies.values()) > 0:
+        logging.info(f"Fixed {sum(inconsistencies.values())} data inconsistencies:")
+        for reason, count in inconsistencies.most_common():
+            logging.info(f"  - {reason}: {count}")
 
-def fix_entry_consistency(entry: Dict[str, Any], inconsistencies: Counter) -> Dict[str, Any]:
+def load_spotify_data(input_dir: str, workers: int = 1) -> EntryStore:
     """
-    Fix consistency issues in a single Spotify streaming history entry.
+    Load Spotify streaming history data from JSON files in the specified directory.
+    Performs validation, deduplication, and consistency checks on the data.
 
     Args:
-        entry (Dict[str, Any]): The entry to check and fix
-        inconsistencies (Counter): Counter to track types of inconsistencies
+        input_dir (str): Directory, ZIP archive or .json.gz file containing the JSON files
+        workers (int): Number of worker processes used to read and normalize files in parallel
 
     Returns:
-        Dict[str, Any]: The fixed entry
+        EntryStore: All valid, normalized Spotify streaming history records
+
+    Raises:
+        FileNotFoundError: If the input directory does not exist
     """
-    try:
-        # Create a copy of the entry to avoid modifying the original
-        fixed_entry = entry.copy()
-
-        # Check for unreasonably large ms_played values (more than 24 hours)
-        if fixed_entry.get("ms_played", 0) > 24 * 60 * 60 * 1000:
-            fixed_entry["ms_played"] = 24 * 60 * 60 * 1000  # Cap at 24 hours
-            inconsistencies["excessive_playtime"] += 1
-
-        # Check for future timestamps
-        if "ts" in fixed_entry:
-            try:
-                ts = datetime.fromisoformat(fixed_entry["ts"].replace("Z", "+00:00"))
-                now = datetime.now()
-                if ts > now:
-                    # Set to the current time if in the future
-                    fixed_entry["ts"] = now.isoformat()
-                    inconsistencies["future_timestamp"] += 1
-            except (ValueError, TypeError):
-                # Already logged in validation function
-                pass
-
-        # Check for missing artist but present track or album
-        if (not fixed_entry.get("master_metadata_album_artist_name") and 
-            (fixed_entry.get("master_metadata_track_name") or fixed_entry.get("master_metadata_album_album_name"))):
-            fixed_entry["master_metadata_album_artist_name"] = "Unknown Artist"
-            inconsistencies["missing_artist"] += 1
-
-        # Check for missing track but present artist
-        if (not fixed_entry.get("master_metadata_track_name") and 
-            fixed_entry.get("master_metadata_album_artist_name")):
-            fixed_entry["master_metadata_track_name"] = "Unknown Track"
-            inconsistencies["missing_track"] += 1
-
-        # Check for a missing album but present artist
-        if (not fixed_entry.get("master_metadata_album_album_name") and 
-            fixed_entry.get("master_metadata_album_artist_name")):
-            fixed_entry["master_metadata_album_album_name"] = "Unknown Album"
-            inconsistencies["missing_album"] += 1
-
-        return fixed_entry
-    except Exception as e:
-        logging.error(f"Error during consistency check: {e}")
-        # Return the original entry to avoid data loss
-        return entry
-
-def perform_data_consistency_checks(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """
-    Perform data consistency checks on Spotify streaming history entries.
-    Uses a generator-based approach for memory efficiency.
+    entries = EntryStore()
+    for store in iter_spotify_stores(input_dir, workers):
+        entries.extend(store)
+
+    if not entries:
+        logging.warning("No valid entries found in any of the JSON files.")
+
+    return entries
+
+
+def export_signature(input_dir: str) -> Tuple[Tuple[str, int, int], ...]:
+    """
+    Get the sizes and modification times of the files of an export, to notice
+    when it changes without reading it.
 
     Args:
-        entries (List[Dict[str, Any]]): List of Spotify streaming history entries
+        input_dir (str): Directory, ZIP archive or .json.gz file containing the JSON files
 
     Returns:
-        List[Dict[str, Any]]: List of entries with inconsistencies fixed where possible
+        Tuple[Tuple[str, int, int], ...]: Source, size and modification time of each file
     """
-    if not entries:
-        return []
+    signature = []
+    for source in find_json_sources(input_dir):
+        stat = source_signature(source)
+        signature.append((source, stat["size"], stat["mtime_ns"]))
+    return tuple(signature)
+
+def process_spotify_data(stores: Iterable[EntryStore], min_milliseconds: int) -> ListeningAccumulator:
+    """
+    Process normalized Spotify streaming history records and extract statistics.
+    Aggregation and the On This Day index are built in the same single pass,
+    so the stores can be streamed straight from iter_spotify_stores.
+
+    Args:
+        stores (Iterable[EntryStore]): Normalized Spotify streaming history records
+        min_milliseconds (int): Minimum milliseconds for a play to count
+
+    Returns:
+        ListeningAccumulator: Accumulator holding all aggregated statistics
+    """
+    accumulator = ListeningAccumulator(min_milliseconds)
+
+    # Process one slice of records at a time
+    for store in stores:
+        accumulator.add_store(store)
+
+    return accumulator
+
+def earliest_timestamp(
+    input_dir: str,
+    json_files: List[str],
+    workers: int = 1,
+    use_cache: bool = False,
+    prefetch: int = 0,
+    json_decoder: str = DEFAULT_DECODER
+) -> Optional[int]:
+    """
+    Find the earliest record of some JSON files.
+
+    Files with a cache entry are not opened; the others are read.
+
+    Args:
+        input_dir (str): Directory, ZIP archive or .json.gz file containing the JSON files
+        json_files (List[str]): Source strings of the JSON files
+        workers (int): Number of worker processes used to read the files
+        use_cache (bool): Whether to use the parsed entry cache in the input directory
+        prefetch (int): Number of files read ahead on a background thread
+        json_decoder (str): Name of the JSON decoder backend to use
+
+    Returns:
+        Optional[int]: Epoch milliseconds of the earliest record, or None if the files have none
+    """
+    cache_dir = get_cache_dir(input_dir) if use_cache else None
+    starts = []
+    uncached = []
+    for file in json_files:
+        cached_range = load_cached_time_range(file, cache_dir) if cache_dir is not None else None
+        if cached_range is None:
+            uncached.append(file)
+        elif cached_range[0] is not None:
+            starts.append(cached_range[0])
+
+    if uncached:
+        for store in load_spotify_json_files(input_dir, None, workers, use_cache, uncached,
+                                             prefetch=prefetch, json_decoder=json_decoder):
+            if len(store):
+                starts.append(min(store.ts))
+    return min(starts, default=None)
+
+def process_spotify_data_incremental(
+    input_dir: str,
+    min_milliseconds: int,
+    workers: int = 1,
+    use_cache: bool = False,
+    prefetch: int = 0,
+    json_decoder: str = DEFAULT_DECODER
+) -> ListeningAccumulator:
+    """
+    Process Spotify streaming history incrementally, starting from the stored aggregates.
+
+    Only files that are new or changed since the last run are read, and of those
+    only records newer than the stored high-water timestamp are applied. Records
+    inside the overlap window before it are deduplicated against the stored keys.
+    If a file that was never applied holds records from before the overlap
+    window, such as an older export added later, every file is processed again.
+
+    Args:
+        input_dir (str): Directory, ZIP archive or .json.gz file containing the JSON files
+        min_milliseconds (int): Minimum milliseconds for a play to count
+        workers (int): Number of worker processes used to read and normalize files in parallel
+        use_cache (bool): Whether to use the parsed entry cache in the input directory
+        prefetch (int): Number of files read ahead on a background thread
+        json_decoder (str): Name of the JSON decoder backend to use
+
+    Returns:
+        ListeningAccumulator: Accumulator holding all aggregated statistics
+
+    Raises:
+        FileNotFoundError: If the input directory does not exist
+    """
+    cache_dir = get_cache_dir(input_dir)
+    state = load_aggregate_state(cache_dir, min_milliseconds)
+
+    json_files = find_json_sources(input_dir)
+    signatures = {source_key(file): source_signature(file) for file in json_files}
+    new_files = [
+        file for file in json_files
+        if state["files"].get(source_key(file)) != signatures[source_key(file)]
+    ]
+
+    if not new_files:
+        logging.info("No new or changed export files, using the stored aggregates")
+        return state["accumulator"]
+
+    cutoff = state["high_water"] - OVERLAP_WINDOW_MS if state["high_water"] is not None else None
+    unseen_files = [file for file in new_files if source_key(file) not in state["files"]]
+    if cutoff is not None and unseen_files:
+        earliest = earliest_timestamp(input_dir, unseen_files, workers, use_cache, prefetch, json_decoder)
+        if earliest is not None and earliest < cutoff:
+            logging.warning("⚠️ New export files hold listens from before the stored aggregates, "
+                            "processing all files again")
+            state = new_aggregate_state(min_milliseconds)
+            new_files = json_files
+            cutoff = None
+
+    logging.info(f"Applying {len(new_files)} new or changed export files incrementally")
+
+    accumulator = state["accumulator"]
+    high_water = state["high_water"]
+    seen_keys = state["boundary_keys"]
 
-    fixed_entries = []
     inconsistencies = Counter()
+    applied = 0
+    before_window = 0
+    duplicates = 0
 
-    # Process entries one at a time
-    for entry in entries:
-        fixed_entry = fix_entry_consistency(entry, inconsistencies)
-        fixed_entries.append(fixed_entry)
+    stores = load_spotify_json_files(input_dir, inconsistencies, workers, use_cache, new_files,
+                                     prefetch=prefetch, json_decoder=json_decoder, with_later_start=True)
+    for store in merge_stores(stores):
+        keep = []
+        for i, (ts, entry_key) in enumerate(store_dedupe_keys(store)):
+            # Changed files repeat the records an earlier run applied from them,
+            # so records before the overlap window are not applied again
+            if cutoff is not None and ts < cutoff:
+                before_window += 1
+                continue
 
-    # Log inconsistency statistics
-    if sum(inconsistencies.values()) > 0:
-        logging.info(f"Fixed {sum(inconsistencies.values())} data inconsistencies:")
-        for reason, count in inconsistencies.most_common():
-            logging.info(f"  - {reason}: {count}")
+            if entry_key in seen_keys:
+                duplicates += 1
+                continue
+            seen_keys[entry_key] = ts
+
+            keep.append(i)
+            if high_water is None or ts > high_water:
+                high_water = ts
+
+        accumulator.add_store(store.select(keep))
+        applied += len(keep)
+
+    logging.info(f"Applied {applied} new entries "
+                 f"({before_window} before the overlap window of the stored aggregates, "
+                 f"{duplicates} duplicates skipped)")
+
+    state["high_water"] = high_water
+    state["boundary_keys"] = prune_boundary_keys(seen_keys, high_water)
+    state["files"].update((source_key(file), signatures[source_key(file)]) for file in new_files)
+    save_aggregate_state(cache_dir, state)
 
-    return fixed_entries
+    return accumulator
 
 def aggregate_yearly_data(yearly: DefaultDict[int, Dict[str, DefaultDict[str, int]]]) -> Dict[str, DefaultDict[str, int]]:
     """
@@ -0,0 +1,143 @@
+"""
+Date range filtering for Spotify Extended Streaming History.
+
+This module turns the DATE_FROM / DATE_TO settings into a range of epoch
+milliseconds, and reads the years covered by an export file from its name
+(e.g. Streaming_History_Audio_2019-2020_3.json) so files outside the range can
+be skipped without opening them.
+"""
+import re
+from datetime import date, timedelta
+from typing import Optional, Tuple
+
+from entry_store import EntryStore, MS_PER_DAY
+
+# Start (inclusive) and end (exclusive) in epoch milliseconds, None for an open end
+TimeRange = Tuple[Optional[int], Optional[int]]
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Year or year range in Spotify's export file names
+FILENAME_YEARS = re.compile(r"_(\d{4})(?:-(\d{4}))?(?:_\d+)?\.json(?:\.gz)?$", re.IGNORECASE)
+
+
+def _date_ms(day: date) -> int:
+    return (day.toordinal() - EPOCH_ORDINAL) * MS_PER_DAY
+
+
+def _parse_day(text: str) -> date:
+    try:
+        return date.fromisoformat(text)
+    except ValueError as e:
+        raise ValueError(f"{text!r} is not a YYYY-MM-DD date ({e})") from None
+
+
+def parse_date_range(date_from: str, date_to: str) -> Optional[TimeRange]:
+    """
+    Build the time range covered by two YYYY-MM-DD dates, both inclusive.
+
+    Args:
+        date_from (str): First day to include, or "" for no lower limit
+        date_to (str): Last day to include, or "" for no upper limit
+
+    Returns:
+        Optional[TimeRange]: The range, or None if neither date is set
+
+    Raises:
+        ValueError: If a date is malformed or the range is empty
+    """
+    if not date_from and not date_to:
+        return None
+
+    start = _date_ms(_parse_day(date_from)) if date_from else None
+    end = _date_ms(_parse_day(date_to) + timedelta(days=1)) if date_to else None
+    if start is not None and end is not None and start >= end:
+        raise ValueError(f"Date range start {date_from} is after its end {date_to}")
+    return start, end
+
+
+def filename_time_range(name: str) -> Optional[TimeRange]:
+    """
+    Get the time range an export file covers, judging by its name.
+
+    Args:
+        name (str): File name, such as Streaming_History_Audio_2019-2020_3.json
+
+    Returns:
+        Optional[TimeRange]: From January 1st of the first year up to the end of
+            the last year, or None if the name does not contain the years
+    """
+    match = FILENAME_YEARS.search(name)
+    if not match:
+        return None
+    first_year = int(match.group(1))
+    last_year = int(match.group(2) or first_year)
+    return _date_ms(date(first_year, 1, 1)), _date_ms(date(last_year + 1, 1, 1))
+
+
+def ranges_overlap(first_ms: int, last_ms: int, time_range: TimeRange) -> bool:
+    """
+    Check whether records from first_ms to last_ms (both inclusive) can fall in a range.
+
+    Args:
+        first_ms (int): Earliest timestamp
+        last_ms (int): Latest timestamp
+        time_range (TimeRange): The range to check against
+
+    Returns:
+        bool: True if the two overlap
+    """
+    start, end = time_range
+    return (start is None or last_ms >= start) and (end is None or first_ms < end)
+
+
+def intersect_ranges(first: Optional[TimeRange], second: Optional[TimeRange]) -> Optional[TimeRange]:
+    """
+    Get the range covered by both of two ranges.
+
+    Args:
+        first (Optional[TimeRange]): A range, or None for no limit
+        second (Optional[TimeRange]): Another range, or None for no limit
+
+    Returns:
+        Optional[TimeRange]: The overlap, or None if neither range limits anything
+    """
+    if first is None:
+        return second
+    if second is None:
+        return first
+    starts = [start for start in (first[0], second[0]) if start is not None]
+    ends = [end for end in (first[1], second[1]) if end is not None]
+    return (max(starts) if starts else None), (min(ends) if ends else None)
+
+
+def in_range(ts: int, time_range: TimeRange) -> bool:
+    """
+    Check whether a timestamp falls in a range.
+
+    Args:
+        ts (int): Epoch milliseconds
+        time_range (TimeRange): The range to check against
+
+    Returns:
+        bool: True if start <= ts < end
+    """
+    start, end = time_range
+    return (start is None or ts >= start) and (end is None or ts < end)
+
+
+def filter_store(store: EntryStore, time_range: TimeRange) -> EntryStore:
+    """
+    Keep only the records of a store that fall in a range.
+
+    Args:
+        store (EntryStore): The records to filter
+        time_range (TimeRange): The range to keep
+
+    Returns:
+        EntryStore: The store itself if every record is in range, otherwise a filtered copy
+    """
+    keep = [i for i, ts in enumerate(store.ts) if in_range(ts, time_range)]
+    if len(keep) == len(store):
+        return store
+    return store.select(keep)
@@ -0,0 +1,186 @@
+"""
+Day-indexed play counts for Spotify Extended Streaming History.
+
+This module contains the DayIndex class, which keeps the plays of every
+listening day in one typed array indexed by the day's offset from the first
+day, instead of sets and counters keyed by date objects. Days played, streaks,
+hiatuses and the heatmap counts are all read from that array. Streaks and
+hiatuses are found as runs in a mask of played days with a single C-level
+scan, so the order in which the records arrived does not matter.
+"""
+import re
+from array import array
+from typing import Dict, Optional
+
+# Runs of played and unplayed days in a mask with one byte per day
+PLAYED_RUN = re.compile(b"\x01+")
+UNPLAYED_RUN = re.compile(b"\x00+")
+
+
+def _zeros(count: int) -> array:
+    return array("I", bytes(4 * count))
+
+
+class DayIndex:
+    """
+    Plays per day and playtime bucket, with one row of bucket counts per day.
+
+    Row i holds the plays of epoch day start + i. Rows are only added for days
+    with plays, so the first and last rows are always listening days.
+
+    Attributes:
+        buckets: Number of playtime buckets in each row
+        start: Days since the Unix epoch of the first row, None while empty
+        hist: Play counts, row after row
+    """
+
+    __slots__ = ("buckets", "start", "hist")
+
+    def __init__(self, buckets: int):
+        """
+        Create an index with no days.
+
+        Args:
+            buckets (int): Number of playtime buckets in each row
+        """
+        self.buckets = buckets
+        self.start: Optional[int] = None
+        self.hist = _zeros(0)
+
+    def __len__(self) -> int:
+        return len(self.hist) // self.buckets
+
+    def row(self, day: int) -> int:
+        """
+        Get the offset of a day's row in hist, adding rows up to the day if needed.
+
+        A day before the first row moves every row, so offsets returned before
+        are no longer valid.
+
+        Args:
+            day (int): Days since the Unix epoch
+
+        Returns:
+            int: Index in hist of the day's first bucket
+        """
+        if self.start is None:
+            self.start = day
+        elif day < self.start:
+            self.hist[0:0] = _zeros((self.start - day) * self.buckets)
+            self.start = day
+
+        offset = (day - self.start) * self.buckets
+        missing = offset + self.buckets - len(self.hist)
+        if missing > 0:
+            self.hist.extend(_zeros(missing))
+        return offset
+
+    def merge(self, other: "DayIndex") -> None:
+        """
+        Add the plays of another index with the same buckets.
+
+        Args:
+            other (DayIndex): The index whose plays are added
+        """
+        if other.start is None:
+            return
+        # Add both ends first, so the rows only move once
+        self.row(other.start + len(other) - 1)
+        offset = self.row(other.start)
+        hist = self.hist
+        for i, count in enumerate(other.hist, offset):
+            if count:
+                hist[i] += count
+
+    def slice(self, first_day: int, last_day: int) -> "DayIndex":
+        """
+        Get the listening days of a range as a new index.
+
+        Args:
+            first_day (int): Days since the Unix epoch of the first day of the range
+            last_day (int): Days since the Unix epoch of the last day of the range
+
+        Returns:
+            DayIndex: The days of the range, from its first to its last listening day
+        """
+        part = DayIndex(self.buckets)
+        if self.start is None:
+            return part
+        nb = self.buckets
+        hist = self.hist
+        lo = max(first_day - self.start, 0)
+        hi = min(last_day - self.start + 1, len(self))
+        # Keep the invariant that the first and last rows are listening days
+        while lo < hi and not any(hist[lo * nb:(lo + 1) * nb]):
+            lo += 1
+        while hi > lo and not any(hist[(hi - 1) * nb:hi * nb]):
+            hi -= 1
+        if lo == hi:
+            return part
+        part.start = self.start + lo
+        part.hist = self.hist[lo * nb:hi * nb]
+        return part
+
+    def counts(self, first_bucket: int = 0) -> array:
+        """
+        Get the number of plays of every day.
+
+        Args:
+            first_bucket (int): Only plays in this bucket or above are counted
+
+        Returns:
+            array: Plays of each day from start on
+        """
+        nb = self.buckets
+        hist = self.hist
+        return array("q", [sum(hist[row + first_bucket:row + nb]) for row in range(0, len(hist), nb)])
+
+    def played_mask(self) -> bytes:
+        """
+        Get which days have plays.
+
+        Returns:
+            bytes: 1 for each day with plays in any bucket and 0 for the others, from start on
+        """
+        return bytes(map(bool, self.counts()))
+
+    def days_played(self) -> int:
+        """
+        Count the days with plays.
+
+        Returns:
+            int: Number of listening days
+        """
+        return self.played_mask().count(1)
+
+    def runs(self) -> Dict[str, Optional[int]]:
+        """
+        Find the longest run of listening days and the longest gap between them.
+
+        The first of equally long runs or gaps is kept.
+
+        Returns:
+            Dict[str, Optional[int]]: Lengths in days and first and last days
+                (days since the Unix epoch), None where there is no run or gap:
+                - max_streak, streak_start, streak_end
+                - longest_hiatus, hiatus_start, hiatus_end
+        """
+        mask = self.played_mask()
+
+        def longest(pattern):
+            run = max(pattern.finditer(mask), key=lambda m: m.end() - m.start(), default=None)
+            if run is None:
+                return 0, None, None
+            return run.end() - run.start(), self.start + run.start(), self.start + run.end() - 1
+
+        # The mask starts and ends with a listening day, so every unplayed run is a gap between two
+        max_streak, streak_start, streak_end = longest(PLAYED_RUN)
+        longest_hiatus, hiatus_start, hiatus_end = longest(UNPLAYED_RUN)
+        return {
+            "max_streak": max_streak,
+            "streak_start": streak_start,
+            "streak_end": streak_end,
+            "longest_hiatus": longest_hiatus,
+            "hiatus_start": hiatus_start,
+            "hiatus_end": hiatus_end,
+        }
@@ -0,0 +1,135 @@
+"""
+Streaming deduplication for Spotify Extended Streaming History.
+
+Overlapping export files repeat the same records. This module identifies a
+record by a 64-bit key built from its timestamp, playtime, track and artist,
+and remembers the keys of the records seen so far. Export files are ordered in
+time, so only the keys inside a sliding window behind the newest record are
+kept in a hash set; older keys are moved to a compact int64 array that is only
+consulted if an out-of-order record shows up.
+"""
+import hashlib
+import sys
+from array import array
+from collections import deque
+from datetime import timedelta
+from typing import Deque, Dict, Iterator, Optional, Set, Tuple
+
+from entry_store import EntryStore
+
+# Records this far behind the newest record seen are moved out of the hash set
+DEDUPE_WINDOW = timedelta(days=7)
+DEDUPE_WINDOW_MS = DEDUPE_WINDOW // timedelta(milliseconds=1)
+
+# Identifies how keys are built, so stored keys from another scheme are not reused.
+# Tuples of ints hash the same in every run of the same Python version.
+KEY_SCHEME = f"blake2b64-tuple/{sys.implementation.cache_tag}"
+
+
+def name_hash(track: Optional[str], artist: Optional[str]) -> int:
+    """
+    Get a stable 64-bit hash of a track and artist name.
+
+    Args:
+        track (Optional[str]): Track name
+        artist (Optional[str]): Artist name
+
+    Returns:
+        int: The hash, the same in every run
+    """
+    digest = hashlib.blake2b(repr((track, artist)).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def store_dedupe_keys(store: EntryStore) -> Iterator[Tuple[int, int]]:
+    """
+    Build the keys that identify duplicate records.
+
+    Args:
+        store (EntryStore): Normalized records
+
+    Yields:
+        Tuple[int, int]: Epoch milliseconds and 64-bit key of each record
+    """
+    names = store.lookup()
+    name_hashes: Dict[Tuple[int, int], int] = {}
+    for ts, track, artist, ms_played in zip(store.ts, store.track, store.artist, store.ms_played):
+        h = name_hashes.get((track, artist))
+        if h is None:
+            h = name_hashes[(track, artist)] = name_hash(names[track], names[artist])
+        yield ts, hash((ts, ms_played, h))
+
+
+class StreamingDeduplicator:
+    """
+    Remembers the keys of the records seen so far in a bounded amount of memory.
+
+    Duplicates always share their timestamp, so a record inside the window can
+    only be a duplicate of a key that is still in the hash set. Keys that fall
+    out of the window are kept as 8 bytes each in an array, which is turned into
+    a set the first time a record from before the window arrives.
+    """
+
+    __slots__ = ("window_ms", "_recent", "_order", "_evicted", "_archive", "_newest")
+
+    def __init__(self, window_ms: int = DEDUPE_WINDOW_MS):
+        """
+        Create an empty deduplicator.
+
+        Args:
+            window_ms (int): Width of the window of keys kept in the hash set, in milliseconds
+        """
+        self.window_ms = window_ms
+        self._recent: Set[int] = set()
+        self._order: Deque[Tuple[int, int]] = deque()
+        self._evicted = array("q")
+        self._archive: Optional[Set[int]] = None
+        self._newest: Optional[int] = None
+
+    def __len__(self) -> int:
+        archived = len(self._archive) if self._archive is not None else len(self._evicted)
+        return len(self._recent) + archived
+
+    def add(self, ts: int, key: int) -> bool:
+        """
+        Record a key, unless it was seen before.
+
+        Args:
+            ts (int): Epoch milliseconds of the record
+            key (int): 64-bit key of the record
+
+        Returns:
+            bool: True if the key is new, False if the record is a duplicate
+        """
+        newest = self._newest
+        if newest is not None and ts < newest - self.window_ms:
+            # Out of order: the key may already have left the hash set
+            if self._archive is None:
+                self._archive = set(self._evicted)
+                self._evicted = array("q")
+            if key in self._archive or key in self._recent:
+                return False
+            self._archive.add(key)
+            return True
+
+        if key in self._recent:
+            return False
+        self._recent.add(key)
+        self._order.append((ts, key))
+
+        if newest is None or ts > newest:
+            self._newest = ts
+            self._evict(ts - self.window_ms)
+        return True
+
+    def _evict(self, cutoff: int) -> None:
+        order = self._order
+        recent = self._recent
+        archive = self._archive
+        while order and order[0][0] < cutoff:
+            _, key = order.popleft()
+            recent.discard(key)
+            if archive is not None:
+                archive.add(key)
+            else:
+                self._evicted.append(key)
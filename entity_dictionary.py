@@ -0,0 +1,195 @@
+"""
+Entity dictionary for Spotify Extended Streaming History.
+
+This module assigns compact integer IDs to the artists, tracks and albums seen
+while processing streaming history records, so aggregates can be keyed by int
+instead of by freshly built name strings. Names are only turned back into the
+"Track - Artist" labels shown in the report when it is rendered.
+"""
+from typing import Dict, List, Optional, Tuple
+
+
+class EntityDictionary:
+    """
+    String-interning dictionary mapping artists, tracks and albums to integer IDs.
+
+    Tracks and albums are identified by their name together with their artist,
+    so the same song title by two artists gets two IDs. Records that carry a
+    spotify_track_uri are looked up by URI first, which skips hashing the names.
+
+    Attributes:
+        artist_names: Artist name of each artist ID
+        track_names: Track name of each track ID
+        track_artists: Artist ID of each track ID
+        album_names: Album name of each album ID
+        album_artists: Artist ID of each album ID
+    """
+
+    __slots__ = (
+        "artist_names", "track_names", "track_artists", "album_names", "album_artists",
+        "_artist_ids", "_track_ids", "_album_ids", "_uri_ids",
+    )
+
+    def __init__(self):
+        """
+        Create an empty entity dictionary.
+        """
+        self.artist_names: List[Optional[str]] = []
+        self.track_names: List[Optional[str]] = []
+        self.track_artists: List[int] = []
+        self.album_names: List[Optional[str]] = []
+        self.album_artists: List[int] = []
+        self._artist_ids: Dict[Optional[str], int] = {}
+        self._track_ids: Dict[Tuple[Optional[str], int], int] = {}
+        self._album_ids: Dict[Tuple[Optional[str], int], int] = {}
+        # spotify_track_uri -> (artist, track, album names, (artist, track, album IDs))
+        self._uri_ids: Dict[str, Tuple[Optional[str], Optional[str], Optional[str], Tuple[int, int, int]]] = {}
+
+    def artist_id(self, name: Optional[str]) -> int:
+        """
+        Get the ID of an artist, assigning a new one if needed.
+
+        Args:
+            name (Optional[str]): Artist name
+
+        Returns:
+            int: The artist ID
+        """
+        aid = self._artist_ids.get(name)
+        if aid is None:
+            aid = self._artist_ids[name] = len(self.artist_names)
+            self.artist_names.append(name)
+        return aid
+
+    def track_id(self, name: Optional[str], artist_id: int) -> int:
+        """
+        Get the ID of a track, assigning a new one if needed.
+
+        Args:
+            name (Optional[str]): Track name
+            artist_id (int): ID of the track's artist
+
+        Returns:
+            int: The track ID
+        """
+        key = (name, artist_id)
+        tid = self._track_ids.get(key)
+        if tid is None:
+            tid = self._track_ids[key] = len(self.track_names)
+            self.track_names.append(name)
+            self.track_artists.append(artist_id)
+        return tid
+
+    def album_id(self, name: Optional[str], artist_id: int) -> int:
+        """
+        Get the ID of an album, assigning a new one if needed.
+
+        Args:
+            name (Optional[str]): Album name
+            artist_id (int): ID of the album's artist
+
+        Returns:
+            int: The album ID
+        """
+        key = (name, artist_id)
+        alid = self._album_ids.get(key)
+        if alid is None:
+            alid = self._album_ids[key] = len(self.album_names)
+            self.album_names.append(name)
+            self.album_artists.append(artist_id)
+        return alid
+
+    def entry_ids(
+        self,
+        artist: Optional[str],
+        track: Optional[str],
+        album: Optional[str],
+        uri: Optional[str] = None
+    ) -> Tuple[int, int, int]:
+        """
+        Get the artist, track and album IDs of a record.
+
+        Args:
+            artist (Optional[str]): Artist name
+            track (Optional[str]): Track name
+            album (Optional[str]): Album name
+            uri (Optional[str]): spotify_track_uri of the record, if any
+
+        Returns:
+            Tuple[int, int, int]: Artist ID, track ID and album ID
+        """
+        if uri:
+            cached = self._uri_ids.get(uri)
+            # The names are compared too, since a track can be renamed or moved
+            # to another album between exports and the names are what is counted
+            if cached is not None and cached[0] == artist and cached[1] == track and cached[2] == album:
+                return cached[3]
+
+        artist_id = self.artist_id(artist)
+        ids = (artist_id, self.track_id(track, artist_id), self.album_id(album, artist_id))
+        if uri:
+            self._uri_ids[uri] = (artist, track, album, ids)
+        return ids
+
+    def artist_label(self, artist_id: int) -> str:
+        """
+        Get the report label of an artist.
+
+        Args:
+            artist_id (int): The artist ID
+
+        Returns:
+            str: The artist name
+        """
+        return self.artist_names[artist_id]
+
+    def track_label(self, track_id: int, separator: str = " - ") -> str:
+        """
+        Get the report label of a track.
+
+        Args:
+            track_id (int): The track ID
+            separator (str): Text placed between the track and artist name
+
+        Returns:
+            str: The label "Track - Artist"
+        """
+        return f"{self.track_names[track_id]}{separator}{self.artist_names[self.track_artists[track_id]]}"
+
+    def album_label(self, album_id: int) -> str:
+        """
+        Get the report label of an album.
+
+        Args:
+            album_id (int): The album ID
+
+        Returns:
+            str: The label "Album - Artist"
+        """
+        return f"{self.album_names[album_id]} - {self.artist_names[self.album_artists[album_id]]}"
+
+    def remap(self, other: "EntityDictionary") -> Tuple[List[int], List[int], List[int]]:
+        """
+        Add every entity of another dictionary to this one.
+
+        Args:
+            other (EntityDictionary): The dictionary whose entities are added
+
+        Returns:
+            Tuple[List[int], List[int], List[int]]: For artists, tracks and albums,
+                lists mapping each ID of the other dictionary to the ID in this one
+        """
+        artist_map = [self.artist_id(name) for name in other.artist_names]
+        track_map = [
+            self.track_id(name, artist_map[artist_id])
+            for name, artist_id in zip(other.track_names, other.track_artists)
+        ]
+        album_map = [
+            self.album_id(name, artist_map[artist_id])
+            for name, artist_id in zip(other.album_names, other.album_artists)
+        ]
+        for uri, (artist, track, album, (artist_id, track_id, album_id)) in other._uri_ids.items():
+            self._uri_ids.setdefault(
+                uri, (artist, track, album, (artist_map[artist_id], track_map[track_id], album_map[album_id]))
+            )
+        return artist_map, track_map, album_map
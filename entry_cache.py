@@ -0,0 +1,319 @@
+"""
+Parsed entry cache for Spotify Extended Streaming History.
+
+This module stores the EntryStore of each JSON file in a compact binary
+columnar format, so later runs over an unchanged export can skip JSON decoding
+and validation entirely. Each cache file is keyed by the size, modification time
+and content hash of the JSON file it was built from.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import struct
+import sys
+from array import array
+from collections import Counter
+from typing import BinaryIO, Dict, List, Any, Optional, Tuple
+
+from entry_store import EntryStore, NUMERIC_COLUMNS
+from input_sources import get_input_cache_dir, open_source, source_key, source_signature
+
+# Name of the cache directory created inside the input directory
+CACHE_DIR_NAME = ".sesh_cache"
+
+# Bumped whenever the layout of the cache files changes
+CACHE_VERSION = 3
+
+CACHE_MAGIC = b"SESHCACH"
+
+def get_cache_dir(input_dir: str) -> str:
+    """
+    Get the cache directory used for an input directory or archive.
+
+    Args:
+        input_dir (str): Directory or archive containing the JSON files
+
+    Returns:
+        str: Path of the cache directory
+    """
+    return get_input_cache_dir(input_dir, CACHE_DIR_NAME)
+
+
+def _cache_path(file: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, source_key(file) + ".cache")
+
+
+def hash_file(file: str) -> str:
+    """
+    Compute the content hash of a file, after decompression.
+
+    Args:
+        file (str): Source string of the file
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.sha1()
+    with open_source(file) as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_fingerprint(file: str, content_hash: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build the fingerprint that identifies a version of a JSON file.
+
+    Args:
+        file (str): Source string of the file
+        content_hash (Optional[str]): Precomputed content hash, computed if not given
+
+    Returns:
+        Dict[str, Any]: Fingerprint with size, mtime_ns and sha1
+    """
+    fingerprint = source_signature(file)
+    fingerprint["sha1"] = content_hash if content_hash is not None else hash_file(file)
+    return fingerprint
+
+
+def _fingerprint_matches(file: str, cached: Dict[str, Any]) -> Optional[str]:
+    """
+    Check whether a file still matches a cached fingerprint.
+
+    The size must match. If the modification time also matches the file is
+    considered unchanged, otherwise the content hash decides, so touched or
+    copied files with identical contents still hit the cache.
+
+    Returns:
+        Optional[str]: "mtime" or "hash" depending on what matched, None if the file changed
+    """
+    signature = source_signature(file)
+    if signature["size"] != cached.get("size"):
+        return None
+    if signature["mtime_ns"] == cached.get("mtime_ns"):
+        return "mtime"
+    return "hash" if hash_file(file) == cached.get("sha1") else None
+
+
+def _encode_strings(strings: List[str]) -> Tuple[array, bytes]:
+    encoded = [s.encode("utf-8") for s in strings]
+    return array("I", (len(b) for b in encoded)), b"".join(encoded)
+
+
+def _decode_strings(lengths: array, blob: bytes) -> List[str]:
+    strings = []
+    offset = 0
+    for length in lengths:
+        strings.append(blob[offset:offset + length].decode("utf-8"))
+        offset += length
+    return strings
+
+
+def _read_meta(f: BinaryIO, file: str) -> Optional[Dict[str, Any]]:
+    """
+    Read the header of an open cache file.
+
+    Returns:
+        Optional[Dict[str, Any]]: The metadata, with "rehashed" set when the file
+            only matched by content hash, or None if the cache file has another
+            format or was built from other file contents
+    """
+    if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+        return None
+    (meta_len,) = struct.unpack("<I", f.read(4))
+    meta = json.loads(f.read(meta_len).decode("utf-8"))
+    if meta.get("version") != CACHE_VERSION or meta.get("byteorder") != sys.byteorder:
+        return None
+    matched = _fingerprint_matches(file, meta["fingerprint"])
+    if matched is None:
+        return None
+    meta["rehashed"] = matched == "hash"
+    return meta
+
+
+def _refresh_fingerprint(file: str, cache_dir: str, meta: Dict[str, Any]) -> None:
+    """
+    Store the current modification time of a file whose contents matched by hash.
+
+    Later checks, in this run and the next, then match on the modification
+    time and skip hashing the file again. Called with the cache file closed,
+    so it can be replaced on Windows. Failures are logged and otherwise ignored.
+    """
+    path = _cache_path(file, cache_dir)
+    tmp_path = path + ".tmp"
+    try:
+        meta = {key: value for key, value in meta.items() if key != "rehashed"}
+        meta["fingerprint"] = {**meta["fingerprint"], **source_signature(file)}
+        meta_bytes = json.dumps(meta).encode("utf-8")
+        with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            src.seek(len(CACHE_MAGIC))
+            (meta_len,) = struct.unpack("<I", src.read(4))
+            src.seek(meta_len, os.SEEK_CUR)
+            dst.write(CACHE_MAGIC)
+            dst.write(struct.pack("<I", len(meta_bytes)))
+            dst.write(meta_bytes)
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp_path, path)
+    except (OSError, struct.error) as e:
+        logging.debug(f"Could not update the cached fingerprint of {file}: {e}")
+
+
+def save_cached_result(file: str, cache_dir: str, result: Dict[str, Any], content_hash: Optional[str] = None) -> None:
+    """
+    Write the normalized result of a JSON file to its cache file.
+
+    Failures are logged and otherwise ignored, the cache is only an optimization.
+
+    Args:
+        file (str): Source string of the JSON file the result was read from
+        cache_dir (str): Cache directory
+        result (Dict[str, Any]): Result of read_spotify_json_file
+        content_hash (Optional[str]): Content hash of the file, computed if not given
+    """
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        store = result["entries"]
+        string_lengths, blob = _encode_strings(store.strings)
+        meta = {
+            "version": CACHE_VERSION,
+            "byteorder": sys.byteorder,
+            "fingerprint": file_fingerprint(file, content_hash),
+            "count": len(store),
+            # Lets date range filtering skip the file without loading it
+            "min_ts": min(store.ts) if store else None,
+            "max_ts": max(store.ts) if store else None,
+            "total": result["total"],
+            "inconsistencies": dict(result["inconsistencies"]),
+            "invalid_reasons": dict(result["invalid_reasons"]),
+        }
+        meta_bytes = json.dumps(meta).encode("utf-8")
+
+        path = _cache_path(file, cache_dir)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(CACHE_MAGIC)
+            f.write(struct.pack("<I", len(meta_bytes)))
+            f.write(meta_bytes)
+            sections = [getattr(store, name).tobytes() for name, _ in NUMERIC_COLUMNS]
+            sections += [string_lengths.tobytes(), blob]
+            for data in sections:
+                f.write(struct.pack("<Q", len(data)))
+                f.write(data)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.warning(f"Could not write cache for {file}: {e}")
+
+
+def load_cached_result(file: str, cache_dir: str) -> Optional[Dict[str, Any]]:
+    """
+    Load the normalized result of a JSON file from its cache file.
+
+    Args:
+        file (str): Source string of the JSON file
+        cache_dir (str): Cache directory
+
+    Returns:
+        Optional[Dict[str, Any]]: A result shaped like read_spotify_json_file's,
+            or None if there is no usable cache entry for the current file contents
+    """
+    path = _cache_path(file, cache_dir)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, 'rb') as f:
+            meta = _read_meta(f, file)
+            if meta is None:
+                return None
+
+            def read_array(typecode: str) -> array:
+                (length,) = struct.unpack("<Q", f.read(8))
+                column = array(typecode)
+                column.frombytes(f.read(length))
+                return column
+
+            store = EntryStore()
+            for name, typecode in NUMERIC_COLUMNS:
+                setattr(store, name, read_array(typecode))
+            string_lengths = read_array("I")
+            (length,) = struct.unpack("<Q", f.read(8))
+            store.strings = _decode_strings(string_lengths, f.read(length))
+    except (OSError, ValueError, KeyError, struct.error) as e:
+        logging.warning(f"Ignoring unreadable cache for {file}: {e}")
+        return None
+
+    if any(len(getattr(store, name)) != meta["count"] for name, _ in NUMERIC_COLUMNS):
+        logging.warning(f"Ignoring truncated cache for {file}")
+        return None
+    if meta["rehashed"]:
+        _refresh_fingerprint(file, cache_dir, meta)
+
+    return {
+        "entries": store,
+        "total": meta["total"],
+        "inconsistencies": Counter(meta["inconsistencies"]),
+        "invalid_reasons": Counter(meta["invalid_reasons"]),
+        "error": None,
+    }
+
+
+def has_cached_result(file: str, cache_dir: str) -> bool:
+    """
+    Check whether a JSON file has a usable cache file, without loading the entries.
+
+    Args:
+        file (str): Source string of the JSON file
+        cache_dir (str): Cache directory
+
+    Returns:
+        bool: True if load_cached_result should find the file in the cache
+    """
+    path = _cache_path(file, cache_dir)
+    if not os.path.exists(path):
+        return False
+
+    try:
+        with open(path, 'rb') as f:
+            meta = _read_meta(f, file)
+    except (OSError, ValueError, KeyError, struct.error):
+        return False
+
+    if meta is None:
+        return False
+    if meta["rehashed"]:
+        _refresh_fingerprint(file, cache_dir, meta)
+    return True
+
+
+def load_cached_time_range(file: str, cache_dir: str) -> Optional[Tuple[Optional[int], Optional[int]]]:
+    """
+    Get the earliest and latest timestamp of a JSON file from its cache file, without loading the entries.
+
+    Args:
+        file (str): Source string of the JSON file
+        cache_dir (str): Cache directory
+
+    Returns:
+        Optional[Tuple[Optional[int], Optional[int]]]: Earliest and latest epoch
+            milliseconds (both None if the file has no valid entries), or None if
+            there is no usable cache entry that records them
+    """
+    path = _cache_path(file, cache_dir)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, 'rb') as f:
+            meta = _read_meta(f, file)
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+
+    if meta is None:
+        return None
+    if meta["rehashed"]:
+        _refresh_fingerprint(file, cache_dir, meta)
+    if "min_ts" not in meta:
+        return None
+    return meta["min_ts"], meta["max_ts"]
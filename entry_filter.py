@@ -0,0 +1,424 @@
+"""
+Filter expressions for Spotify Extended Streaming History.
+
+This module parses small filter expressions such as
+
+    platform ~ "android" and conn_country == "US" and not incognito_mode
+    artist == "Radiohead" and ts >= 2019-01-01 and ts <= 2019-12-31
+
+and compiles them into a predicate that is checked against each entry as it
+is normalized, so entries that do not match never reach the entry store. The
+artist, track, album, uri and flag fields are read from the normalized record
+(with the Unknown ... placeholders filled in), the same as for entries loaded
+from the cache, and other fields from the raw entry.
+
+Grammar:
+    expression := term ("or" term)*
+    term       := factor ("and" factor)*
+    factor     := "not" factor | "(" expression ")" | field [operator value]
+
+Fields are the keys of Spotify's export entries (platform, conn_country,
+incognito_mode, reason_start, ...) plus the short names artist, track, album
+and uri. Field names are not case-sensitive, like the keywords, and an unknown
+field is an error rather than a filter that matches nothing. ts (or date) is
+compared against dates written as YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS, and
+cannot be used with ~ or !~. A field on its own is true when its value is truthy.
+
+Operators: == != < <= > >= and ~ / !~ for case-insensitive "contains".
+Values: "strings" or 'strings', numbers, dates, true, false and null.
+"""
+import re
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from date_range import TimeRange
+from entry_store import EntryStore, FLAG_OFFLINE, FLAG_SHUFFLE, FLAG_SKIPPED, MS_PER_DAY
+from timestamps import parse_timestamp
+
+# Short field names accepted in expressions
+FIELD_ALIASES = {
+    "artist": "master_metadata_album_artist_name",
+    "track": "master_metadata_track_name",
+    "album": "master_metadata_album_album_name",
+    "uri": "spotify_track_uri",
+    "date": "ts",
+}
+
+# Fields kept in the entry store, which cached files can be filtered on
+STORE_FIELDS = {
+    "ts", "ms_played", "master_metadata_album_artist_name", "master_metadata_track_name",
+    "master_metadata_album_album_name", "spotify_track_uri", "skipped", "offline", "shuffle",
+}
+
+# Every field of the export entries, across the export versions Spotify has used
+EXPORT_FIELDS = STORE_FIELDS | {
+    "username", "platform", "conn_country", "ip_addr", "ip_addr_decrypted", "user_agent_decrypted",
+    "episode_name", "episode_show_name", "spotify_episode_uri", "audiobook_title", "audiobook_uri",
+    "audiobook_chapter_uri", "audiobook_chapter_title", "reason_start", "reason_end",
+    "offline_timestamp", "incognito_mode",
+}
+
+KEYWORDS = {"and", "or", "not", "true", "false", "null"}
+
+TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+      | (?P<date>\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2})?)?Z?)
+      | (?P<number>-?\d+(?:\.\d+)?)
+      | (?P<op>==|!=|<=|>=|!~|<|>|~)
+      | (?P<paren>[()])
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    )""", re.VERBOSE)
+
+# Predicate over an entry's fields and its timestamp in epoch milliseconds
+Predicate = Callable[[Dict[str, Any], Optional[int]], bool]
+
+COMPARISONS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+def _tokenize(expression: str) -> List[Tuple[str, str]]:
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = TOKEN_PATTERN.match(expression, position)
+        if not match:
+            raise ValueError(f"Unexpected text in filter at position {position}: {expression[position:]!r}")
+        tokens.append((match.lastgroup, match.group(match.lastgroup)))
+        position = match.end()
+    return tokens
+
+
+def _date_bounds(text: str) -> Tuple[int, int]:
+    """
+    Get the first millisecond of a date value and the first millisecond after it.
+
+    A date covers its whole day, a date and time covers only that instant.
+    """
+    if len(text) == 10:
+        start = parse_timestamp(text + "T00:00:00Z")
+        return start, start + MS_PER_DAY
+    start = parse_timestamp(text)
+    return start, start + 1
+
+
+class _Parser:
+    """
+    Recursive descent parser turning a token list into nested tuples.
+
+    Nodes are ("or", [nodes]), ("and", [nodes]), ("not", node),
+    ("truthy", field) and ("compare", field, operator, value).
+    """
+
+    def __init__(self, tokens: List[Tuple[str, str]]):
+        self.tokens = tokens
+        self.position = 0
+        self.fields: Set[str] = set()
+
+    def peek(self) -> Optional[Tuple[str, str]]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def next(self) -> Tuple[str, str]:
+        token = self.peek()
+        if token is None:
+            raise ValueError("Filter ends unexpectedly")
+        self.position += 1
+        return token
+
+    def accept_word(self, word: str) -> bool:
+        token = self.peek()
+        if token is not None and token[0] == "name" and token[1].lower() == word:
+            self.position += 1
+            return True
+        return False
+
+    def parse(self) -> tuple:
+        node = self.expression()
+        if self.peek() is not None:
+            raise ValueError(f"Unexpected {self.peek()[1]!r} in filter")
+        return node
+
+    def expression(self) -> tuple:
+        terms = [self.term()]
+        while self.accept_word("or"):
+            terms.append(self.term())
+        return terms[0] if len(terms) == 1 else ("or", terms)
+
+    def term(self) -> tuple:
+        factors = [self.factor()]
+        while self.accept_word("and"):
+            factors.append(self.factor())
+        return factors[0] if len(factors) == 1 else ("and", factors)
+
+    def factor(self) -> tuple:
+        if self.accept_word("not"):
+            return ("not", self.factor())
+
+        kind, text = self.next()
+        if kind == "paren" and text == "(":
+            node = self.expression()
+            if self.next() != ("paren", ")"):
+                raise ValueError("Missing ) in filter")
+            return node
+        if kind != "name" or text.lower() in KEYWORDS:
+            raise ValueError(f"Expected a field name in filter, got {text!r}")
+
+        # Field names are matched without case, like the keywords
+        field = FIELD_ALIASES.get(text.lower(), text.lower())
+        if field not in EXPORT_FIELDS:
+            raise ValueError(f"Unknown field {text!r} in filter")
+        self.fields.add(field)
+
+        token = self.peek()
+        if token is None or token[0] != "op":
+            return ("truthy", field)
+        operator = self.next()[1]
+        return ("compare", field, operator, self.value(field, operator))
+
+    def value(self, field: str, operator: str) -> Any:
+        kind, text = self.next()
+        if field == "ts":
+            if operator in ("~", "!~"):
+                raise ValueError(f"ts cannot be used with {operator}, compare it with == != < <= > or >=")
+            if kind not in ("date", "string"):
+                raise ValueError(f"ts must be compared with a date, got {text!r}")
+            try:
+                return _date_bounds(text.strip("\"'") if kind == "string" else text)
+            except ValueError:
+                raise ValueError(f"Invalid date in filter: {text!r}") from None
+        if kind == "string":
+            return re.sub(r"\\(.)", r"\1", text[1:-1])
+        if kind == "number":
+            return float(text) if "." in text else int(text)
+        if kind == "date":
+            return text
+        if kind == "name" and text.lower() in ("true", "false", "null"):
+            return {"true": True, "false": False, "null": None}[text.lower()]
+        raise ValueError(f"Expected a value after {operator} in filter, got {text!r}")
+
+
+def _compile(node: tuple) -> Predicate:
+    kind = node[0]
+    if kind == "or":
+        parts = [_compile(child) for child in node[1]]
+        return lambda entry, ts_ms: any(part(entry, ts_ms) for part in parts)
+    if kind == "and":
+        parts = [_compile(child) for child in node[1]]
+        return lambda entry, ts_ms: all(part(entry, ts_ms) for part in parts)
+    if kind == "not":
+        inner = _compile(node[1])
+        return lambda entry, ts_ms: not inner(entry, ts_ms)
+    if kind == "truthy":
+        field = node[1]
+        if field == "ts":
+            return lambda entry, ts_ms: ts_ms is not None
+        return lambda entry, ts_ms: bool(entry.get(field))
+
+    _, field, operator, value = node
+    if field == "ts":
+        return _compile_ts(operator, value)
+
+    if operator in ("~", "!~"):
+        needle = str(value).lower()
+        negate = operator == "!~"
+
+        def contains(entry, ts_ms):
+            actual = entry.get(field)
+            return isinstance(actual, str) and (needle in actual.lower()) != negate
+        return contains
+
+    compare = COMPARISONS[operator]
+    if operator in ("==", "!="):
+        return lambda entry, ts_ms: compare(entry.get(field), value)
+
+    def ordered(entry, ts_ms):
+        actual = entry.get(field)
+        try:
+            return actual is not None and compare(actual, value)
+        except TypeError:
+            return False
+    return ordered
+
+
+def _compile_ts(operator: str, bounds: Tuple[int, int]) -> Predicate:
+    start, end = bounds
+    if operator == "==":
+        return lambda entry, ts_ms: ts_ms is not None and start <= ts_ms < end
+    if operator == "!=":
+        return lambda entry, ts_ms: ts_ms is not None and not start <= ts_ms < end
+    if operator == "<":
+        return lambda entry, ts_ms: ts_ms is not None and ts_ms < start
+    if operator == "<=":
+        return lambda entry, ts_ms: ts_ms is not None and ts_ms < end
+    if operator == ">":
+        return lambda entry, ts_ms: ts_ms is not None and ts_ms >= end
+    return lambda entry, ts_ms: ts_ms is not None and ts_ms >= start
+
+
+def _node_time_range(node: tuple) -> Optional[TimeRange]:
+    """
+    Get the range a node limits ts to, if it is a ts comparison or a conjunction of them.
+    """
+    if node[0] == "and":
+        start, end = None, None
+        for child in node[1]:
+            child_range = _node_time_range(child)
+            if child_range is None:
+                continue
+            if child_range[0] is not None:
+                start = child_range[0] if start is None else max(start, child_range[0])
+            if child_range[1] is not None:
+                end = child_range[1] if end is None else min(end, child_range[1])
+        return None if start is None and end is None else (start, end)
+
+    if node[0] != "compare" or node[1] != "ts":
+        return None
+    _, _, operator, (start, end) = node
+    return {
+        "==": (start, end),
+        "<": (None, start),
+        "<=": (None, end),
+        ">": (end, None),
+        ">=": (start, None),
+    }.get(operator)
+
+
+def _record_view(ms_played: int, artist: Optional[str], track: Optional[str], album: Optional[str],
+                 uri: Optional[str], skipped: bool, offline: bool, shuffle: bool) -> Dict[str, Any]:
+    """
+    Build the fields an expression sees for a normalized record, the same on both read paths.
+    """
+    return {
+        "ms_played": ms_played,
+        "master_metadata_album_artist_name": artist,
+        "master_metadata_track_name": track,
+        "master_metadata_album_album_name": album,
+        "spotify_track_uri": uri,
+        "skipped": skipped,
+        "offline": offline,
+        "shuffle": shuffle,
+    }
+
+
+class EntryFilter:
+    """
+    A compiled filter expression.
+
+    Only the expression text is pickled, so filters can be sent to worker
+    processes and are compiled again there.
+
+    Attributes:
+        expression: The filter expression
+        fields: Entry fields the expression reads
+    """
+
+    __slots__ = ("expression", "fields", "_tree", "_predicate")
+
+    def __init__(self, expression: str):
+        """
+        Parse and compile a filter expression.
+
+        Args:
+            expression (str): The filter expression
+
+        Raises:
+            ValueError: If the expression is not valid
+        """
+        self.expression = expression
+        parser = _Parser(_tokenize(expression))
+        if not parser.tokens:
+            raise ValueError("Filter is empty")
+        self._tree = parser.parse()
+        self.fields = frozenset(parser.fields)
+        self._predicate = _compile(self._tree)
+
+    def __getstate__(self):
+        return self.expression
+
+    def __setstate__(self, expression):
+        self.__init__(expression)
+
+    def __repr__(self) -> str:
+        return f"EntryFilter({self.expression!r})"
+
+    @property
+    def needs_raw_entries(self) -> bool:
+        """
+        bool: Whether the expression reads fields that are not kept in the entry store.
+        """
+        return not self.fields <= STORE_FIELDS
+
+    def matches(self, record: Dict[str, Any], entry: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Check a normalized record against the filter.
+
+        The store fields are read from the record as the entry store keeps them,
+        so an entry matches the same way whether it is read from JSON or from
+        the cache.
+
+        Args:
+            record (Dict[str, Any]): The record as built by normalize_entry
+            entry (Optional[Dict[str, Any]]): The raw entry as decoded from JSON, for the
+                fields the store does not keep (see needs_raw_entries)
+
+        Returns:
+            bool: True if the entry should be kept
+        """
+        view = _record_view(
+            int(record["ms_played"]),
+            record["master_metadata_album_artist_name"],
+            record["master_metadata_track_name"],
+            record["master_metadata_album_album_name"],
+            record["spotify_track_uri"],
+            bool(record["skipped"]),
+            bool(record["offline"]),
+            bool(record["shuffle"]),
+        )
+        if entry is not None:
+            view = {**entry, **view}
+        return self._predicate(view, record["ts_ms"])
+
+    def time_range(self) -> Optional[TimeRange]:
+        """
+        Get the date range every matching entry must fall in, used to skip whole files.
+
+        Returns:
+            Optional[TimeRange]: The range, or None if the filter does not limit ts
+                at its top level
+        """
+        return _node_time_range(self._tree)
+
+    def select(self, store: EntryStore) -> EntryStore:
+        """
+        Keep only the records of a store that match the filter.
+
+        Only valid for filters that read store fields (see needs_raw_entries).
+
+        Args:
+            store (EntryStore): The records to filter
+
+        Returns:
+            EntryStore: The store itself if every record matches, otherwise a filtered copy
+        """
+        names = store.lookup()
+        predicate = self._predicate
+        keep = []
+        for i, (ts, ms_played, artist, track, album, uri, flags) in enumerate(zip(
+            store.ts, store.ms_played, store.artist, store.track, store.album, store.uri, store.flags
+        )):
+            entry = _record_view(
+                ms_played, names[artist], names[track], names[album], names[uri],
+                bool(flags & FLAG_SKIPPED), bool(flags & FLAG_OFFLINE), bool(flags & FLAG_SHUFFLE),
+            )
+            if predicate(entry, ts):
+                keep.append(i)
+
+        if len(keep) == len(store):
+            return store
+        return store.select(keep)
@@ -0,0 +1,226 @@
+"""
+Columnar entry store for Spotify Extended Streaming History.
+
+This module contains the EntryStore class, which holds normalized streaming
+history records as typed arrays instead of one dict per entry. Only the fields
+the report uses are kept, and names are stored once in a string table that the
+artist, track, album and URI columns index into. Stores are built while the
+JSON files are parsed and are the input for all aggregation.
+"""
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+# Bits used in the flags column
+FLAG_SKIPPED = 1
+FLAG_OFFLINE = 2
+FLAG_SHUFFLE = 4
+
+# Numeric columns in storage order, with their array type codes
+NUMERIC_COLUMNS = [
+    ("ts", "q"),            # Epoch milliseconds (UTC)
+    ("ms_played", "i"),
+    ("artist", "i"),        # Index into the string table, -1 for None
+    ("track", "i"),
+    ("album", "i"),
+    ("uri", "i"),
+    ("flags", "B"),
+]
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MS_PER_DAY = 86_400_000
+MS_PER_HOUR = 3_600_000
+
+
+def datetime_to_ms(dt: datetime) -> int:
+    """
+    Convert a timezone aware datetime to epoch milliseconds.
+
+    Args:
+        dt (datetime): The datetime to convert
+
+    Returns:
+        int: Milliseconds since the Unix epoch
+    """
+    return (dt - EPOCH) // timedelta(milliseconds=1)
+
+
+def ms_to_datetime(ms: int) -> datetime:
+    """
+    Convert epoch milliseconds to a UTC datetime.
+
+    Args:
+        ms (int): Milliseconds since the Unix epoch
+
+    Returns:
+        datetime: The timezone aware datetime
+    """
+    return EPOCH + timedelta(milliseconds=ms)
+
+
+class EntryStore:
+    """
+    Typed-array storage for normalized streaming history records.
+
+    Attributes:
+        ts: Epoch milliseconds of each record
+        ms_played: Playtime of each record
+        artist: String table index of each record's artist, -1 for None
+        track: String table index of each record's track name, -1 for None
+        album: String table index of each record's album name, -1 for None
+        uri: String table index of each record's spotify_track_uri, -1 for None
+        flags: FLAG_SKIPPED, FLAG_OFFLINE and FLAG_SHUFFLE bits of each record
+        strings: String table
+    """
+
+    __slots__ = ("ts", "ms_played", "artist", "track", "album", "uri", "flags", "strings", "_string_ids")
+
+    def __init__(self, strings: Optional[List[str]] = None):
+        """
+        Create an empty store.
+
+        Args:
+            strings (Optional[List[str]]): String table to start from, shared rather than copied
+        """
+        for name, typecode in NUMERIC_COLUMNS:
+            setattr(self, name, array(typecode))
+        self.strings: List[str] = strings if strings is not None else []
+        self._string_ids: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def __getstate__(self):
+        state = {name: getattr(self, name) for name, _ in NUMERIC_COLUMNS}
+        state["strings"] = self.strings
+        return state
+
+    def __setstate__(self, state):
+        for name, _ in NUMERIC_COLUMNS:
+            setattr(self, name, state[name])
+        self.strings = state["strings"]
+        self._string_ids = None
+
+    def intern(self, value: Optional[str]) -> int:
+        """
+        Get the string table index of a value, adding it if needed.
+
+        Args:
+            value (Optional[str]): The string to look up
+
+        Returns:
+            int: Index into the string table, -1 for None
+        """
+        if value is None:
+            return -1
+        if self._string_ids is None:
+            self._string_ids = {s: i for i, s in enumerate(self.strings)}
+        sid = self._string_ids.get(value)
+        if sid is None:
+            sid = self._string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return sid
+
+    def append_record(self, record: Dict[str, Any]) -> None:
+        """
+        Append a normalized record.
+
+        Args:
+            record (Dict[str, Any]): Record as built by normalize_entry
+        """
+        self.ts.append(record["ts_ms"])
+        self.ms_played.append(int(record["ms_played"]))
+        self.artist.append(self.intern(record["master_metadata_album_artist_name"]))
+        self.track.append(self.intern(record["master_metadata_track_name"]))
+        self.album.append(self.intern(record["master_metadata_album_album_name"]))
+        self.uri.append(self.intern(record["spotify_track_uri"]))
+        self.flags.append(
+            (FLAG_SKIPPED if record["skipped"] else 0)
+            | (FLAG_OFFLINE if record["offline"] else 0)
+            | (FLAG_SHUFFLE if record["shuffle"] else 0)
+        )
+
+    def lookup(self) -> List[Optional[str]]:
+        """
+        Get a list that resolves string table indexes, including -1 to None.
+
+        Returns:
+            List[Optional[str]]: The string table followed by None
+        """
+        return self.strings + [None]
+
+    def record(self, i: int) -> Dict[str, Any]:
+        """
+        Rebuild the normalized record at an index.
+
+        Args:
+            i (int): Index of the record
+
+        Returns:
+            Dict[str, Any]: The record, shaped like normalize_entry's result
+                plus the "ts" string and "dt" datetime
+        """
+        names = self.lookup()
+        dt = ms_to_datetime(self.ts[i])
+        flags = self.flags[i]
+        return {
+            "ts_ms": self.ts[i],
+            "ts": dt.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "dt": dt,
+            "ms_played": self.ms_played[i],
+            "master_metadata_album_artist_name": names[self.artist[i]],
+            "master_metadata_track_name": names[self.track[i]],
+            "master_metadata_album_album_name": names[self.album[i]],
+            "spotify_track_uri": names[self.uri[i]],
+            "skipped": bool(flags & FLAG_SKIPPED),
+            "offline": bool(flags & FLAG_OFFLINE),
+            "shuffle": bool(flags & FLAG_SHUFFLE),
+        }
+
+    def select(self, indices: Iterable[int]) -> "EntryStore":
+        """
+        Build a store holding only some of the records, sharing the string table.
+
+        Args:
+            indices (Iterable[int]): Indexes of the records to keep, in order
+
+        Returns:
+            EntryStore: The new store
+        """
+        indices = list(indices)
+        selected = EntryStore(self.strings)
+        for name, typecode in NUMERIC_COLUMNS:
+            column = getattr(self, name)
+            setattr(selected, name, array(typecode, [column[i] for i in indices]))
+        return selected
+
+    def slice(self, start: int, stop: int) -> "EntryStore":
+        """
+        Build a store holding a consecutive range of the records, sharing the string table.
+
+        Args:
+            start (int): Index of the first record to keep
+            stop (int): Index after the last record to keep
+
+        Returns:
+            EntryStore: The new store
+        """
+        sliced = EntryStore(self.strings)
+        for name, _ in NUMERIC_COLUMNS:
+            setattr(sliced, name, getattr(self, name)[start:stop])
+        return sliced
+
+    def extend(self, other: "EntryStore") -> None:
+        """
+        Append every record of another store.
+
+        Args:
+            other (EntryStore): The store whose records are appended
+        """
+        names = other.lookup()
+        sid_map = [self.intern(s) for s in names]
+        for name, _ in NUMERIC_COLUMNS:
+            column = getattr(other, name)
+            if name in ("artist", "track", "album", "uri"):
+                column = (sid_map[sid] for sid in column)
+            getattr(self, name).extend(column)
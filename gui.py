@@ -7,6 +7,7 @@ import importlib.util
 import logging
 from GenerateHTMLSummary import count_plays_from_directory, VERSION
 from logging_config import log_exception
+from input_sources import is_archive
 
 CONFIG_PATH = "config.py"
 
@@ -56,6 +57,19 @@ class ConfigApp:
         if directory:  # If a directory was selected (not cancelled)
             self.input_dir_var.set(directory)
 
+    def browse_archive(self):
+        """
+        Open a file selection dialog for a Spotify export ZIP archive and update the input field.
+        """
+        current = self.input_dir_var.get()
+        archive = filedialog.askopenfilename(
+            initialdir=os.path.dirname(current) if os.path.isfile(current) else os.getcwd(),
+            title="Select Spotify Export Archive",
+            filetypes=[("Spotify export", "*.zip *.json.gz"), ("All files", "*.*")]
+        )
+        if archive:  # If a file was selected (not cancelled)
+            self.input_dir_var.set(archive)
+
     def build_ui(self):
         padding = {'padx': 10, 'pady': 5}
 
@@ -77,7 +91,8 @@ class ConfigApp:
 
         ttk.Label(
             input_frame,
-            text="Folder where you extracted your Spotify JSON files are located."
+            text="Folder where you extracted your Spotify JSON files are located,\n"
+                 "or the my_spotify_data.zip archive itself."
         ).pack(anchor="w", padx=10, pady=(5, 0))
 
         # Create a frame to hold the entry field and browse button side by side
@@ -87,7 +102,8 @@ class ConfigApp:
         # Add the entry field
         ttk.Entry(dir_frame, textvariable=self.input_dir_var, width=30, font=("Helvetica", 14)).pack(side="left", fill="x", expand=True)
 
-        # Add the browse button
+        # Add the browse buttons
+        ttk.Button(dir_frame, text="Browse ZIP...", command=self.browse_archive).pack(side="right", padx=(5, 0))
         ttk.Button(dir_frame, text="Browse...", command=self.browse_directory).pack(side="right", padx=(5, 0))
 
         # Output File
@@ -132,7 +148,11 @@ class ConfigApp:
         if not input_dir:
             tk.messagebox.showerror("Invalid Input", "Input directory cannot be empty. Please specify the folder where your Spotify JSON files are located.")
             return False
-        if not os.path.exists(input_dir):
+        if is_archive(input_dir) or input_dir.lower().endswith(".json.gz"):
+            if not os.path.isfile(input_dir):
+                tk.messagebox.showerror("File Not Found", f"The file '{input_dir}' does not exist.")
+                return False
+        elif not os.path.exists(input_dir):
             response = tk.messagebox.askquestion("Directory Not Found", 
                 f"The directory '{input_dir}' does not exist. Would you like to create it?")
             if response == 'yes':
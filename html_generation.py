@@ -6,7 +6,7 @@ Spotify Extended Streaming History summary report.
 """
 import json
 import logging
-from typing import Dict, List, Any, DefaultDict
+from typing import Dict, List, Any, DefaultDict, Optional
 
 
 def ms_to_hms(ms: int) -> str:
@@ -210,13 +210,16 @@ def build_all_section(all_data: Dict[str, DefaultDict[str, int]]) -> str:
     return sections
 
 
-def build_year_sections(years: List[int], yearly: DefaultDict[int, Dict[str, DefaultDict[str, int]]]) -> str:
+def build_year_sections(years: List[int], yearly: DefaultDict[int, Dict[str, DefaultDict[str, int]]],
+                        year_stats: Optional[Dict[int, Dict[str, Any]]] = None) -> str:
     """
     Build HTML for per-year sections with tables for artists, tracks, and albums.
 
     Args:
         years (List[int]): List of years
         yearly (DefaultDict[int, Dict[str, DefaultDict[str, int]]]): Dictionary of yearly statistics
+        year_stats (Optional[Dict[int, Dict[str, Any]]]): Statistics of each year, shown below
+            the tables when given
 
     Returns:
         str: HTML for per-year sections as a string
@@ -234,10 +237,113 @@ def build_year_sections(years: List[int], yearly: DefaultDict[int, Dict[str, Def
         sections += build_table("💿 Albums",
                                 yearly[yr]["album_time"], yearly[yr]["album_counts"],
                                 f"album-table-{yr}")
+        if year_stats is not None:
+            sections += build_year_stats_html(yr, year_stats[yr])
         sections += "</div>"
     return sections
 
 
+def build_session_months(months: List[Any]) -> str:
+    """
+    Build the text of a per-month session breakdown.
+
+    Args:
+        months (List[Any]): (month name, number of sessions, average length string) for each month
+
+    Returns:
+        str: One "month: sessions (average)" entry per month, separated by dots
+    """
+    return " · ".join(f"{month}: {count} ({avg})" for month, count, avg in months)
+
+
+def build_year_stats_html(year: int, stats_data: Dict[str, Any]) -> str:
+    """
+    Build HTML for the statistics panel of a year section.
+
+    The panel has the statistics of the main Stats section that are meaningful
+    for a single year, without the heatmap, On This Day and every-year artists.
+
+    Args:
+        year (int): The year
+        stats_data (Dict[str, Any]): Dictionary containing the year's statistics data
+
+    Returns:
+        str: HTML for the year's statistics panel as a string
+    """
+    # Every session figure comes from the year's own sessions, which end at New Year
+    session_months = stats_data['session_years'].get(year, {}).get('months', [])
+    return f"""
+    <h2>{year} Stats</h2>
+    <div class="year-stats" id="year-stats-{year}">
+      <div class="stats-group">
+        <h3>Overview & Time</h3>
+        <ul>
+          <li>Days played: {stats_data['days_played']} ({stats_data['pct_days']:.2f}%)</li>
+          <li>First play: {stats_data['first_desc']}</li>
+          <li>Last play: {stats_data['last_desc']}</li>
+          <li>Total play: {stats_data['total_plays']}</li>
+          <li>Total listening time: {stats_data['total_time_str']}</li>
+          <li>Average playtime per play: {stats_data['avg_play_str']}</li>
+          <li>Listening personality: {stats_data.get('personality_type', 'Undefined')}</li>
+        </ul>
+      </div>
+
+      <div class="stats-group">
+        <h3>Library</h3>
+        <ul>
+          <li>Artists: {stats_data['artists_count']}</li>
+          <li>One hit wonders: {stats_data['one_hits']} ({stats_data['pct_one_hits']:.2f}%)</li>
+          <li>Albums: {stats_data['albums_count']}</li>
+          <li>Tracks: {stats_data['tracks_count']}</li>
+          <li>Unique tracks ratio: {stats_data['unique_tracks']}/{stats_data['total_plays']} ({stats_data['unique_ratio_pct']:.2f}%)</li>
+          <li>Gini coefficient: {stats_data['gini']:.3f}</li>
+        </ul>
+      </div>
+
+      <div class="stats-group">
+        <h3>Milestones & Popularity</h3>
+        <ul>
+          <li>Eddington number: {stats_data['edd']}</li>
+          <li>Artist cut-over point: {stats_data['art_cut']}</li>
+          <li>Most popular month: {stats_data['pop_mon_str']} ({stats_data['pop_mon_plays']} plays)</li>
+          <li>Most popular week: {stats_data['week_str']} ({stats_data['week_plays']} plays)</li>
+          <li>Most popular day: {stats_data['day_str']} ({stats_data['day_plays']} plays)</li>
+          <li>Most skipped track: {stats_data['most_skipped']} ({stats_data['skip_ct']} skips)</li>
+        </ul>
+      </div>
+
+      <div class="stats-group">
+        <h3>Patterns</h3>
+        <ul>
+          <li>Longest listening streak: {stats_data['max_streak']} days
+             ({stats_data['streak_start'].strftime("%b %d, %Y")} – {stats_data['streak_end'].strftime("%b %d, %Y")})
+          </li>
+          <li>Longest hiatus: {stats_data['longest_hiatus']} days
+             {f"({stats_data['hi_start_str']} – {stats_data['hi_end_str']})" if stats_data['longest_hiatus'] > 0 else ""}
+          </li>
+          <li>Average plays per active day: {stats_data['avg_plays']:.2f}</li>
+          <li>Most active weekday: {stats_data['wd_name']} ({stats_data['wd_count']} plays)</li>
+          <li>Peak listening hour: {stats_data['peak_hour_str']} ({stats_data['hour_count']} plays)</li>
+          <li>Weekend vs Weekday plays: {stats_data['weekend']}/{stats_data['weekday']} ({stats_data['ratio_pct']:.2f}% weekend)</li>
+        </ul>
+      </div>
+
+      <div class="stats-group">
+        <h3>Sessions & Behavior</h3>
+        <ul>
+          <li>Number of sessions: {stats_data['num_sessions']}</li>
+          <li>Average session length: {stats_data['avg_str']}</li>
+          <li>Longest single session: {stats_data['long_str']} on {stats_data['long_date_str']}</li>
+          <li>Most sessions in a month: {stats_data['session_month_str']} ({stats_data['session_month_count']} sessions)</li>
+          <li>Sessions per month: {build_session_months(session_months)}</li>
+          <li>Skip rate: {stats_data['skip_count']}/{stats_data['play_counted']} ({stats_data['skip_rate_pct']:.2f}%)</li>
+          <li>Offline vs Online ratio: {stats_data['ratio_str']} ({stats_data['offline_ratio_pct']:.2f}% offline)</li>
+        </ul>
+      </div>
+    </div>
+    """
+
+
 def build_stats_html(stats_data: Dict[str, Any], daily_counts: Dict[str, int], otd_data) -> str:
     """
     Build HTML for the statistics section.
@@ -347,10 +453,24 @@ def build_stats_html(stats_data: Dict[str, Any], daily_counts: Dict[str, int], o
         <ul>
           <li>Number of sessions: {stats_data['num_sessions']}
              <button class="info-button stats-button"
-                     data-info='A "session" is consecutive plays with <30 min gaps.'>i</button>
+                     data-info='A "session" is consecutive plays with <{stats_data['session_gap_min']} min gaps.'>i</button>
           </li>
           <li>Average session length: {stats_data['avg_str']}</li>
           <li>Longest single session: {stats_data['long_str']} on {stats_data['long_date_str']}</li>
+          <li>Most sessions in a month: {stats_data['session_month_str']} ({stats_data['session_month_count']} sessions)</li>
+          <li>Session lengths: {" · ".join(f"{label}: {count}" for label, count in stats_data['session_lengths'])}</li>
+          <li>Sessions per year:
+            <ul>
+              {"".join(f"<li>{year}: {data['num_sessions']} sessions, average {data['avg_str']}<br>"
+                       f"{build_session_months(data['months'])}</li>"
+                       for year, data in stats_data['session_years'].items())}
+            </ul>
+          </li>
+          <li>Longest sessions:
+            <ol>
+              {"".join(f"<li>{length} on {day}</li>" for length, day in stats_data['top_sessions'])}
+            </ol>
+          </li>
           <li>Skip rate: {stats_data['skip_count']}/{stats_data['play_counted']} ({stats_data['skip_rate_pct']:.2f}%)</li>
           <li>Offline vs Online ratio: {stats_data['ratio_str']} ({stats_data['offline_ratio_pct']:.2f}% offline)</li>
         </ul>
@@ -0,0 +1,305 @@
+"""
+Input sources for Spotify Extended Streaming History.
+
+This module finds and opens the JSON files of an export. The input can be a
+directory of .json or .json.gz files, a single .json.gz file, or the
+my_spotify_data.zip archive Spotify delivers. Archive members are streamed
+straight from the archive without extracting them to disk.
+
+A source is identified by a string: a plain file path, or for archive members
+"<archive path>::<member name>".
+
+Plain .json files are memory-mapped, so their contents are read straight from
+the OS page cache instead of being copied through a file buffer. Compressed
+files and archive members, or platforms without mmap, use buffered reads.
+"""
+import gzip
+import os
+import zipfile
+from datetime import datetime
+from typing import IO, Dict, List, Optional, Tuple
+
+try:
+    import mmap
+except ImportError:
+    mmap = None
+
+# Separates the archive path from the member name in a source string
+ZIP_MEMBER_SEPARATOR = "::"
+
+# Suffixes of the files read from an input directory
+JSON_SUFFIXES = (".json", ".json.gz")
+
+# Pages of a memory-mapped file that have been read are handed back to the OS
+# in steps of this many bytes, so they do not count against the process memory
+MAPPED_RELEASE_STEP = 4 * 1024 * 1024
+
+# Buffer size used to pull a file into the OS page cache ahead of time
+WARM_CHUNK_SIZE = 1024 * 1024
+
+
+def is_archive(path: str) -> bool:
+    """
+    Check whether a path is a ZIP archive to read the export from.
+
+    Args:
+        path (str): Input path
+
+    Returns:
+        bool: True if the path names a .zip file
+    """
+    return path.lower().endswith(".zip")
+
+
+def _split_source(source: str) -> Tuple[str, str]:
+    archive, _, member = source.partition(ZIP_MEMBER_SEPARATOR)
+    return archive, member
+
+
+def find_json_sources(input_path: str) -> List[str]:
+    """
+    List the JSON sources of an export.
+
+    Args:
+        input_path (str): Directory, .zip archive, or single .json / .json.gz file
+
+    Returns:
+        List[str]: Source strings of the JSON files found, sorted by name so
+            Spotify's numbered export files come in time order
+
+    Raises:
+        FileNotFoundError: If the input path does not exist
+        ValueError: If the input is a file that is not a readable archive or JSON file
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Input directory '{input_path}' does not exist")
+
+    if os.path.isdir(input_path):
+        return [
+            os.path.join(input_path, filename)
+            for filename in sorted(os.listdir(input_path))
+            if filename.lower().endswith(JSON_SUFFIXES)
+        ]
+
+    if is_archive(input_path):
+        try:
+            with zipfile.ZipFile(input_path) as archive:
+                return [
+                    f"{input_path}{ZIP_MEMBER_SEPARATOR}{info.filename}"
+                    for info in sorted(archive.infolist(), key=lambda info: info.filename)
+                    if not info.is_dir() and info.filename.lower().endswith(".json")
+                ]
+        except zipfile.BadZipFile as e:
+            raise ValueError(f"'{input_path}' is not a valid ZIP archive: {e}")
+
+    if input_path.lower().endswith(JSON_SUFFIXES):
+        return [input_path]
+
+    raise ValueError(f"Input '{input_path}' must be a directory, a .zip archive or a .json/.json.gz file")
+
+
+def open_source(source: str) -> IO[bytes]:
+    """
+    Open a JSON source for binary reading, decompressing it on the fly.
+
+    Args:
+        source (str): Source string returned by find_json_sources
+
+    Returns:
+        IO[bytes]: Readable binary stream of the JSON document
+    """
+    archive_path, member = _split_source(source)
+    if member:
+        archive = zipfile.ZipFile(archive_path)
+        try:
+            stream = archive.open(member)
+        except Exception:
+            archive.close()
+            raise
+        # The member stream keeps its own handle on the archive file, so the
+        # ZipFile object can be closed right away
+        archive.close()
+        return stream
+
+    if source.lower().endswith(".gz"):
+        return gzip.open(source, 'rb')
+    return open(source, 'rb')
+
+
+def read_source(source: str) -> bytes:
+    """
+    Read the whole decompressed contents of a JSON source.
+
+    Args:
+        source (str): Source string returned by find_json_sources
+
+    Returns:
+        bytes: The JSON document
+    """
+    with open_source(source) as f:
+        return f.read()
+
+
+class MappedSource:
+    """
+    Read-only memory map of a plain JSON file that reads like a binary file.
+
+    Reads return the next bytes of the mapping without going through a file
+    buffer. Pages that have been read are released again as reading moves on,
+    so decoding a large file does not keep all of it mapped into memory.
+    """
+
+    __slots__ = ("_file", "_map", "_released")
+
+    def __init__(self, path: str):
+        """
+        Map a file.
+
+        Args:
+            path (str): Path of the file
+
+        Raises:
+            OSError: If the file cannot be opened or mapped
+            ValueError: If the file is empty, which cannot be mapped
+        """
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self._released = 0
+
+    def __enter__(self) -> "MappedSource":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def read(self, size: int = -1) -> bytes:
+        """
+        Read the next bytes of the file.
+
+        Args:
+            size (int): Number of bytes to read, -1 for the rest of the file
+
+        Returns:
+            bytes: The bytes read, empty at the end of the file
+        """
+        data = self._map.read(size)
+        position = self._map.tell()
+        if position - self._released >= MAPPED_RELEASE_STEP and hasattr(mmap, "MADV_DONTNEED"):
+            end = position - position % mmap.PAGESIZE
+            self._map.madvise(mmap.MADV_DONTNEED, self._released, end - self._released)
+            self._released = end
+        return data
+
+    def warm(self) -> None:
+        """
+        Read the whole file once so its pages are in the OS cache before it is decoded.
+
+        This goes through the file rather than the mapping, so the reads happen
+        without holding the GIL and nothing stays mapped afterwards.
+        """
+        buffer = bytearray(WARM_CHUNK_SIZE)
+        self._file.seek(0)
+        while self._file.readinto(buffer):
+            pass
+
+    def close(self) -> None:
+        """
+        Unmap and close the file.
+        """
+        self._map.close()
+        self._file.close()
+
+
+def map_source(source: str) -> Optional[MappedSource]:
+    """
+    Memory-map a JSON source if it is a plain file.
+
+    Args:
+        source (str): Source string returned by find_json_sources
+
+    Returns:
+        Optional[MappedSource]: The mapped file, or None if the source is
+            compressed, inside an archive, empty, or cannot be mapped here
+    """
+    if mmap is None or _split_source(source)[1] or source.lower().endswith(".gz"):
+        return None
+    try:
+        return MappedSource(source)
+    except (OSError, ValueError):
+        return None
+
+
+def source_name(source: str) -> str:
+    """
+    Get the short display name of a source.
+
+    Args:
+        source (str): Source string
+
+    Returns:
+        str: File name of the source, without any directories
+    """
+    archive_path, member = _split_source(source)
+    return os.path.basename(member or archive_path)
+
+
+def source_key(source: str) -> str:
+    """
+    Get a name for a source that is unique within its input and safe to use as a file name.
+
+    Args:
+        source (str): Source string
+
+    Returns:
+        str: The file name, prefixed with the archive name for archive members
+    """
+    archive_path, member = _split_source(source)
+    if member:
+        return f"{os.path.basename(archive_path)}-{os.path.basename(member)}"
+    return os.path.basename(archive_path)
+
+
+def source_signature(source: str) -> Dict[str, int]:
+    """
+    Get the size and modification time of a source.
+
+    For archive members these come from the archive's directory, so no
+    decompression is needed.
+
+    Args:
+        source (str): Source string
+
+    Returns:
+        Dict[str, int]: Size in bytes and modification time in nanoseconds
+    """
+    archive_path, member = _split_source(source)
+    if member:
+        with zipfile.ZipFile(archive_path) as archive:
+            info = archive.getinfo(member)
+        mtime = datetime(*info.date_time).timestamp()
+        return {"size": info.file_size, "mtime_ns": int(mtime * 1_000_000_000)}
+
+    stat = os.stat(source)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def get_input_cache_dir(input_path: str, cache_dir_name: str) -> str:
+    """
+    Get the cache directory of an input.
+
+    Args:
+        input_path (str): Directory, archive or single file the export is read from
+        cache_dir_name (str): Name of the cache directory
+
+    Returns:
+        str: The cache directory inside an input directory, or for a single archive
+            or file a per-input folder in the cache directory next to it
+    """
+    if os.path.isdir(input_path):
+        return os.path.join(input_path, cache_dir_name)
+    input_path = os.path.abspath(input_path)
+    return os.path.join(os.path.dirname(input_path), cache_dir_name, os.path.basename(input_path))
@@ -0,0 +1,113 @@
+"""
+JSON decoder backends for Spotify Extended Streaming History.
+
+Export files can be decoded by different JSON libraries. The standard
+library decoder is always available and streams entries one at a time
+(see json_stream). orjson, when installed, decodes a whole file at once and
+is several times faster, at the cost of holding the file's decoded entries in
+memory together.
+
+Backends are selected by name, so the choice can be passed to worker processes.
+"""
+import logging
+from typing import IO, Any, Callable, Dict, Iterator, List
+
+from json_stream import iter_json_array
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Name of the standard library backend, used when nothing else is requested
+DEFAULT_DECODER = "json"
+
+# Picks the fastest installed backend
+AUTO_DECODER = "auto"
+
+
+def _decode_json(f: IO[bytes]) -> Iterator[Any]:
+    return iter_json_array(f)
+
+
+def _decode_orjson(f: IO[bytes]) -> Iterator[Any]:
+    data = orjson.loads(f.read())
+    if not isinstance(data, list):
+        raise ValueError("Spotify data must be a list of entries")
+    return iter(data)
+
+
+# Backend name -> function decoding a file's entries, fastest first
+DECODERS: Dict[str, Callable[[IO[bytes]], Iterator[Any]]] = {
+    "orjson": _decode_orjson,
+    "json": _decode_json,
+}
+
+
+def available_decoders() -> List[str]:
+    """
+    List the JSON decoder backends that can be used on this system.
+
+    Returns:
+        List[str]: Names of the installed backends, fastest first
+    """
+    return [name for name in DECODERS if name != "orjson" or orjson is not None]
+
+
+def decoder_version(name: str) -> str:
+    """
+    Get a description of a backend including its version.
+
+    Args:
+        name (str): Backend name
+
+    Returns:
+        str: For example "orjson 3.8.3"
+    """
+    if name == "orjson" and orjson is not None:
+        return f"orjson {orjson.__version__}"
+    if name == "json":
+        return "json (standard library)"
+    return name
+
+
+def resolve_decoder(name: str) -> str:
+    """
+    Turn a requested backend name into the backend that will actually be used.
+
+    "auto" picks the fastest installed backend. A backend that is not
+    installed falls back to the standard library with a warning.
+
+    Args:
+        name (str): Requested backend name, or "auto"
+
+    Returns:
+        str: Name of an available backend
+    """
+    available = available_decoders()
+    if name == AUTO_DECODER:
+        return available[0]
+    if name in available:
+        return name
+    if name in DECODERS:
+        logging.warning(f"⚠️ JSON decoder '{name}' is not installed, using '{DEFAULT_DECODER}' instead.")
+    else:
+        logging.warning(f"⚠️ Unknown JSON decoder '{name}', using '{DEFAULT_DECODER}' instead.")
+    return DEFAULT_DECODER
+
+
+def iter_json_entries(f: IO[bytes], decoder: str = DEFAULT_DECODER) -> Iterator[Any]:
+    """
+    Decode the entries of an export file with a backend.
+
+    Args:
+        f (IO[bytes]): The file, opened for binary reading
+        decoder (str): Name of an available backend
+
+    Returns:
+        Iterator[Any]: The decoded entries
+
+    Raises:
+        ValueError: If the file is not a JSON array (json.JSONDecodeError for invalid JSON)
+    """
+    return DECODERS[decoder](f)
@@ -0,0 +1,104 @@
+"""
+Incremental JSON array decoding for Spotify Extended Streaming History.
+
+Every export file is one top-level JSON array of entry objects. This module
+decodes such an array one element at a time as bytes are read, using the
+standard library's JSONDecoder.raw_decode, so the whole list never has to be
+built in memory before the first entry can be processed.
+"""
+import codecs
+import json
+import json.scanner
+import re
+from typing import IO, Any, Iterator
+
+# Bytes read from the file at a time
+CHUNK_SIZE = 256 * 1024
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# Characters that can follow an array element
+DELIMITERS = frozenset(" \t\n\r,]")
+
+
+def iter_json_array(f: IO[bytes], chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Decode the elements of a top-level JSON array from a binary file as they arrive.
+
+    Args:
+        f (IO[bytes]): File positioned at the start of the JSON document
+        chunk_size (int): Number of bytes read at a time
+
+    Yields:
+        Any: Each element of the array, in order
+
+    Raises:
+        ValueError: If the document is not a JSON array
+        json.JSONDecodeError: If the document is not valid JSON
+        UnicodeDecodeError: If the file is not UTF-8
+    """
+    # The C scanner behind JSONDecoder.raw_decode, called directly to skip the wrapper
+    scan_once = json.scanner.make_scanner(json.JSONDecoder())
+    match_whitespace = WHITESPACE.match
+    text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def read_more() -> bool:
+        # Drop the consumed text and append the next chunk, False at the end of the file
+        nonlocal buffer, pos, eof
+        if eof:
+            return False
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + text_decoder.decode(chunk, final=eof)
+        pos = 0
+        return not eof or bool(buffer)
+
+    def next_char() -> str:
+        # Skip whitespace and return the next character, "" at the end of the document
+        nonlocal pos
+        while True:
+            pos = match_whitespace(buffer, pos).end()
+            if pos < len(buffer):
+                return buffer[pos]
+            if not read_more():
+                return ""
+
+    if next_char() != "[":
+        raise ValueError("Spotify data must be a list of entries")
+    pos += 1
+
+    if next_char() == "]":
+        pos += 1
+    else:
+        while True:
+            pos = match_whitespace(buffer, pos).end()
+            try:
+                value, end = scan_once(buffer, pos)
+            except (StopIteration, json.JSONDecodeError) as e:
+                # The element may continue in the next chunk
+                if read_more():
+                    continue
+                if isinstance(e, StopIteration):
+                    raise json.JSONDecodeError("Expecting value", buffer, e.value) from None
+                raise
+            # A number cut off by the end of the chunk still decodes (as 1 for
+            # "1.5"), so only accept a value followed by a delimiter
+            if not eof and (end == len(buffer) or buffer[end] not in DELIMITERS) and read_more():
+                continue
+            yield value
+
+            # Fast path for the usual ",\n  " between elements
+            pos = match_whitespace(buffer, end).end()
+            separator = buffer[pos] if pos < len(buffer) else next_char()
+            pos += 1
+            if separator == "]":
+                break
+            if separator != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos - 1)
+
+    if next_char():
+        raise json.JSONDecodeError("Extra data", buffer, pos)
@@ -168,11 +168,17 @@ def log_exception(exc_info=None):
             exc_info=exc_info
         )
 
-def log_system_info():
+def log_system_info(json_decoder: Optional[str] = None, stats_backend: Optional[str] = None):
     """
     Log system information that might be useful for troubleshooting.
+
+    Args:
+        json_decoder (Optional[str]): Name of the JSON decoder backend in use
+        stats_backend (Optional[str]): Name of the statistics backend in use
     """
     import platform
+    from json_backends import available_decoders, decoder_version
+    from stats_backends import available_backends, backend_version
     
     logging.info("System Information:")
     logging.info(f"  Python version: {platform.python_version()}")
@@ -180,6 +186,12 @@ def log_system_info():
     logging.info(f"  System: {platform.system()} {platform.release()}")
     logging.info(f"  Machine: {platform.machine()}")
     logging.info(f"  Processor: {platform.processor()}")
+    if json_decoder:
+        logging.info(f"  JSON decoder: {decoder_version(json_decoder)}")
+    logging.debug(f"  Available JSON decoders: {', '.join(map(decoder_version, available_decoders()))}")
+    if stats_backend:
+        logging.info(f"  Statistics backend: {backend_version(stats_backend)}")
+    logging.debug(f"  Available statistics backends: {', '.join(map(backend_version, available_backends()))}")
 
     # Log environment variables that might be relevant
     env_vars = ["PATH", "PYTHONPATH", "TEMP", "TMP"]
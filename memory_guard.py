@@ -0,0 +1,145 @@
+"""
+Memory guard for Spotify Extended Streaming History processing.
+
+This module reads the peak resident set size (RSS) of the current process and
+can stop processing once it grows past a configured limit, so a huge export
+fails with a clear message instead of pushing the machine into swap.
+"""
+import ctypes
+import logging
+import sys
+from typing import Iterable, Iterator, Optional, TypeVar
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+T = TypeVar("T")
+
+BYTES_PER_MB = 1024 * 1024
+
+
+class MemoryLimitExceeded(MemoryError):
+    """
+    Raised when the peak memory use of the process goes over the configured limit.
+    """
+
+
+def _windows_peak_rss() -> Optional[int]:
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ("cb", ctypes.c_ulong),
+            ("PageFaultCount", ctypes.c_ulong),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    try:
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+    except (AttributeError, OSError):
+        return None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """
+    Get the highest resident set size this process has reached so far.
+
+    Returns:
+        Optional[int]: Peak RSS in bytes, or None if it cannot be measured on this platform
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+    if sys.platform == "win32":
+        return _windows_peak_rss()
+    return None
+
+
+def format_mb(size: int) -> str:
+    """
+    Format a size in bytes as megabytes.
+
+    Args:
+        size (int): Size in bytes
+
+    Returns:
+        str: The size, e.g. "153.2 MB"
+    """
+    return f"{size / BYTES_PER_MB:.1f} MB"
+
+
+class MemoryGuard:
+    """
+    Checks the peak RSS of the process against a limit.
+
+    Attributes:
+        limit_mb: Highest allowed peak RSS in megabytes, 0 for no limit
+    """
+
+    def __init__(self, limit_mb: int = 0):
+        """
+        Create a memory guard.
+
+        Args:
+            limit_mb (int): Highest allowed peak RSS in megabytes, 0 for no limit
+        """
+        self.limit_mb = limit_mb
+        if limit_mb and peak_rss_bytes() is None:
+            logging.warning("⚠️ Peak memory use cannot be measured on this platform, the memory limit is ignored.")
+            self.limit_mb = 0
+
+    def check(self, stage: str) -> None:
+        """
+        Stop processing if the peak RSS has gone over the limit.
+
+        Args:
+            stage (str): What was being processed, used in the error message
+
+        Raises:
+            MemoryLimitExceeded: If the limit has been exceeded
+        """
+        if not self.limit_mb:
+            return
+        peak = peak_rss_bytes()
+        if peak is not None and peak > self.limit_mb * BYTES_PER_MB:
+            raise MemoryLimitExceeded(
+                f"Peak memory use of {format_mb(peak)} exceeded the limit of {self.limit_mb} MB while {stage}"
+            )
+
+    def watch(self, items: Iterable[T], stage: str) -> Iterator[T]:
+        """
+        Pass items through, checking the limit after each one has been consumed.
+
+        Args:
+            items (Iterable[T]): Items to pass through, such as one EntryStore per file
+            stage (str): What is being processed, used in the error message
+
+        Yields:
+            T: The items, unchanged
+        """
+        for item in items:
+            yield item
+            self.check(stage)
+
+    def report(self) -> None:
+        """
+        Log the peak RSS of the process.
+        """
+        peak = peak_rss_bytes()
+        if peak is None:
+            return
+        limit = f" (limit {self.limit_mb} MB)" if self.limit_mb else ""
+        logging.info(f"Peak memory use: {format_mb(peak)}{limit}")
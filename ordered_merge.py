@@ -0,0 +1,111 @@
+"""
+Time-ordered merging of export files for Spotify Extended Streaming History.
+
+Each export file is ordered in time on its own, but files can overlap, for
+example when a newer export repeats the end of an older one. This module
+merges the per-file runs with a k-way heap merge into one stream ordered by
+timestamp, so sessions, streaks and duplicates can be handled as the records
+go past instead of sorting everything at the end.
+
+Records are not merged one by one: whenever a run is the earliest, every
+record it has before the next run's head is handed out as one slice, so files
+that do not overlap pass through whole.
+
+Each file comes with the earliest timestamp any later file can hold (from the
+file names or the cache). Records before it are handed out as soon as their
+file is read, so only files that overlap a later one stay in memory, instead
+of the whole export.
+"""
+import heapq
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from entry_store import EntryStore
+
+# Later start of the last file: no later file can hold any record
+NO_LATER_RECORDS = 1 << 63
+
+
+def is_ordered(store: EntryStore) -> bool:
+    """
+    Check whether the records of a store are in timestamp order.
+
+    Args:
+        store (EntryStore): Normalized records
+
+    Returns:
+        bool: True if no record is older than the one before it
+    """
+    ts = store.ts
+    return all(a <= b for a, b in zip(ts, ts[1:]))
+
+
+def sort_store(store: EntryStore) -> EntryStore:
+    """
+    Put the records of a store in timestamp order.
+
+    Records with the same timestamp keep their order in the file.
+
+    Args:
+        store (EntryStore): Normalized records
+
+    Returns:
+        EntryStore: The same store if it is already ordered, otherwise a sorted copy
+    """
+    if is_ordered(store):
+        return store
+    return store.select(sorted(range(len(store)), key=store.ts.__getitem__))
+
+
+def merge_stores(files: Iterable[Tuple[EntryStore, Optional[int]]]) -> Iterator[EntryStore]:
+    """
+    Merge stores into one stream of records in timestamp order.
+
+    A store's records are held back only while a later file can still hold
+    earlier ones. Records with the same timestamp come in the order of their
+    stores, so the first copy of a duplicate is the one from the earliest file,
+    as when the files are read one after another.
+
+    Args:
+        files (Iterable[Tuple[EntryStore, Optional[int]]]): Normalized records of each file, in
+            file order, with the earliest timestamp any later file can hold (NO_LATER_RECORDS
+            after the last file), or None if that is not known
+
+    Yields:
+        EntryStore: Consecutive slices of the stores, together in timestamp order
+    """
+    runs: Dict[int, EntryStore] = {}
+    # Heap of (head timestamp, run number, head index)
+    heap: List[Tuple[int, int, int]] = []
+
+    for seq, (store, later_start) in enumerate(files):
+        if len(store):
+            run = runs[seq] = sort_store(store)
+            heapq.heappush(heap, (run.ts[0], seq, 0))
+        if later_start is not None:
+            yield from _merge_until(runs, heap, later_start)
+
+    yield from _merge_until(runs, heap, NO_LATER_RECORDS)
+
+
+def _merge_until(runs: Dict[int, EntryStore], heap: List[Tuple[int, int, int]], limit: int) -> Iterator[EntryStore]:
+    # Hand out the records before limit, in timestamp order
+    while heap and heap[0][0] < limit:
+        _, seq, start = heap[0]
+        run = runs[seq]
+        end = len(run) if limit == NO_LATER_RECORDS else bisect_left(run.ts, limit, start)
+        if len(heap) > 1:
+            # The next earliest run: with only a few runs checking both children is cheapest
+            other_ts, other_seq, _ = min(heap[1:3])
+            # Ties go to the run that comes first
+            find = bisect_right if seq < other_seq else bisect_left
+            end = find(run.ts, other_ts, start, end)
+
+        yield run if start == 0 and end == len(run) else run.slice(start, end)
+
+        if end < len(run):
+            heapq.heapreplace(heap, (run.ts[end], seq, end))
+        else:
+            heapq.heappop(heap)
+            # Let go of a store as soon as all its records are handed out
+            del runs[seq]
@@ -0,0 +1,82 @@
+"""
+Read-ahead of export files for Spotify Extended Streaming History.
+
+Reading a file from a slow disk or network share leaves the CPU idle. This
+module reads the next few files on a background thread while the main thread
+decodes and aggregates the current one. File reads (and gzip/ZIP
+decompression) release the GIL, so the I/O time is hidden behind the work on
+the main thread.
+"""
+import threading
+from queue import Empty, Queue
+from typing import Callable, Iterable, Iterator, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_DONE = object()
+
+
+def read_ahead(
+    items: Iterable[T],
+    fetch: Callable[[T], Optional[R]],
+    depth: int
+) -> Iterator[Tuple[T, Optional[R]]]:
+    """
+    Fetch the data of upcoming items on a background thread, in order.
+
+    At most `depth` items are fetched ahead of the one the caller is working
+    on. If fetching an item fails its data is None, so the caller can read it
+    again itself and report the error. If the caller stops early, data that
+    was fetched but not handed out is closed if it has a close() method, so
+    mapped files do not stay open.
+
+    Args:
+        items (Iterable[T]): Items to fetch, such as source strings
+        fetch (Callable[[T], Optional[R]]): Reads the data of an item (such as
+            its bytes), or returns None if the caller should read it itself
+        depth (int): Number of items fetched ahead, at least 1
+
+    Yields:
+        Tuple[T, Optional[R]]: Each item with its data
+    """
+    results: Queue = Queue()
+    slots = threading.Semaphore(max(depth, 1))
+    stop = threading.Event()
+
+    def worker():
+        for item in items:
+            slots.acquire()
+            if stop.is_set():
+                break
+            try:
+                data = fetch(item)
+            except Exception:
+                data = None
+            results.put((item, data))
+        results.put(_DONE)
+
+    thread = threading.Thread(target=worker, name="sesh-read-ahead", daemon=True)
+    thread.start()
+    try:
+        while True:
+            result = results.get()
+            if result is _DONE:
+                break
+            # Handing out an item frees its slot, so the next file can be read
+            # while the caller works on this one
+            slots.release()
+            yield result
+    finally:
+        stop.set()
+        slots.release()
+        thread.join()
+        while True:
+            try:
+                result = results.get_nowait()
+            except Empty:
+                break
+            if result is not _DONE:
+                close = getattr(result[1], "close", None)
+                if close is not None:
+                    close()
@@ -0,0 +1,238 @@
+"""
+Running statistics over time-ordered Spotify Extended Streaming History.
+
+When the plays arrive in timestamp order, listening sessions only depend on
+the previous play, so they are tracked in one pass over an array of epoch
+milliseconds instead of comparing datetime objects. Each finished session
+updates the per-year and per-month totals, the length distribution and the
+longest sessions, using integer date arithmetic only.
+
+The merged stream hands the plays over in timestamp order, so the
+accumulator's play times can be tracked as they are. Only when the
+accumulator saw a play before the previous one (plays_in_order is False)
+does track_sessions sort the play times first.
+"""
+import heapq
+from bisect import bisect_left
+from collections import Counter
+from datetime import date, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from date_range import EPOCH_ORDINAL
+from entry_store import MS_PER_DAY
+
+# Plays further apart than this start a new listening session
+SESSION_GAP = timedelta(minutes=30)
+SESSION_GAP_MS = SESSION_GAP // timedelta(milliseconds=1)
+
+# Upper limits (inclusive) of the session length groups, in minutes.
+# Longer sessions fall in one more group after the last limit.
+SESSION_LENGTH_LIMITS = [15, 30, 60, 120, 240]
+SESSION_LENGTH_LIMITS_MS = [minutes * 60_000 for minutes in SESSION_LENGTH_LIMITS]
+
+# Number of longest sessions that are kept
+TOP_SESSIONS = 5
+
+
+def epoch_day_to_date(day: int) -> date:
+    """
+    Convert a day number to a date.
+
+    Args:
+        day (int): Days since the Unix epoch (epoch milliseconds // MS_PER_DAY)
+
+    Returns:
+        date: The UTC date
+    """
+    return date.fromordinal(EPOCH_ORDINAL + day)
+
+
+def epoch_day_to_year_month(day: int) -> Tuple[int, int]:
+    """
+    Get the year and month of a day number without creating a date.
+
+    Args:
+        day (int): Days since the Unix epoch (epoch milliseconds // MS_PER_DAY)
+
+    Returns:
+        Tuple[int, int]: The UTC year and month (1-12)
+    """
+    # Days since 0000-03-01 in the proleptic Gregorian calendar, split into 400 year eras
+    z = day + 719_468
+    era = z // 146_097
+    day_of_era = z - era * 146_097
+    year_of_era = (day_of_era - day_of_era // 1460 + day_of_era // 36_524 - day_of_era // 146_096) // 365
+    day_of_year = day_of_era - (365 * year_of_era + year_of_era // 4 - year_of_era // 100)
+    # Months counted from March, so the leap day comes last
+    march_month = (5 * day_of_year + 2) // 153
+    month = march_month + 3 if march_month < 10 else march_month - 9
+    return year_of_era + era * 400 + (month <= 2), month
+
+
+class SessionTracker:
+    """
+    Splits time-ordered plays into listening sessions.
+
+    Sessions are counted in the year and month they start in.
+
+    Attributes:
+        gap_ms: Plays further apart than this many milliseconds start a new session
+        top_n: Number of longest sessions kept
+        in_order: False once a play arrived before the previous one
+        count: Number of finished sessions
+        total_ms: Total length of the finished sessions
+        longest_ms: Length of the longest finished session
+        longest_start: Epoch milliseconds of the start of the longest finished session
+        year_counts: Counter of finished sessions per year
+        year_ms: Counter of the length of the finished sessions per year
+        month_counts: Counter of finished sessions per (year, month)
+        month_ms: Counter of the length of the finished sessions per (year, month)
+        length_counts: Number of finished sessions in each SESSION_LENGTH_LIMITS group
+    """
+
+    __slots__ = ("gap_ms", "top_n", "in_order", "count", "total_ms", "longest_ms", "longest_start", "year_counts",
+                 "year_ms", "month_counts", "month_ms", "length_counts", "_top", "_start", "_last")
+
+    def __init__(self, gap_ms: int = SESSION_GAP_MS, top_n: int = TOP_SESSIONS):
+        """
+        Create a tracker with no plays.
+
+        Args:
+            gap_ms (int): Plays further apart than this many milliseconds start a new session
+            top_n (int): Number of longest sessions kept
+        """
+        self.gap_ms = gap_ms
+        self.top_n = top_n
+        self.in_order = True
+        self.count = 0
+        self.total_ms = 0
+        self.longest_ms = 0
+        self.longest_start: Optional[int] = None
+        self.year_counts: Counter = Counter()
+        self.year_ms: Counter = Counter()
+        self.month_counts: Counter = Counter()
+        self.month_ms: Counter = Counter()
+        self.length_counts = [0] * (len(SESSION_LENGTH_LIMITS_MS) + 1)
+        # Min-heap of (length, -start), so the earlier of equally long sessions stays
+        self._top: List[Tuple[int, int]] = []
+        self._start: Optional[int] = None
+        self._last: Optional[int] = None
+
+    def add(self, ts: int) -> None:
+        """
+        Add a play.
+
+        Args:
+            ts (int): Epoch milliseconds of the play, not before the previous one
+        """
+        last = self._last
+        if last is None:
+            self._start = ts
+        elif ts < last:
+            self.in_order = False
+        elif ts - last > self.gap_ms:
+            self._finish()
+            self._start = ts
+        self._last = ts
+
+    def add_all(self, play_times: Iterable[int]) -> "SessionTracker":
+        """
+        Add time-ordered plays, like calling add for each.
+
+        Args:
+            play_times (Iterable[int]): Epoch milliseconds of the plays, in order
+
+        Returns:
+            SessionTracker: This tracker, for chaining
+        """
+        gap_ms = self.gap_ms
+        start, last = self._start, self._last
+        for ts in play_times:
+            if last is None:
+                start = ts
+            elif ts - last > gap_ms:
+                self._start, self._last = start, last
+                self._finish()
+                start = ts
+            elif ts < last:
+                self.in_order = False
+            last = ts
+        self._start, self._last = start, last
+        return self
+
+    def _finish(self) -> None:
+        start = self._start
+        length = self._last - start
+        self.count += 1
+        self.total_ms += length
+        # The first of equally long sessions is kept
+        if self.longest_start is None or length > self.longest_ms:
+            self.longest_ms = length
+            self.longest_start = start
+
+        year, month = epoch_day_to_year_month(start // MS_PER_DAY)
+        self.year_counts[year] += 1
+        self.year_ms[year] += length
+        self.month_counts[(year, month)] += 1
+        self.month_ms[(year, month)] += length
+        self.length_counts[bisect_left(SESSION_LENGTH_LIMITS_MS, length)] += 1
+
+        top = self._top
+        if len(top) < self.top_n:
+            heapq.heappush(top, (length, -start))
+        elif top and (length, -start) > top[0]:
+            heapq.heapreplace(top, (length, -start))
+
+    def longest_sessions(self) -> List[Tuple[int, int]]:
+        """
+        Get the longest finished sessions.
+
+        Returns:
+            List[Tuple[int, int]]: (length, start) in milliseconds of up to top_n
+                sessions, longest first and earliest first among equally long ones
+        """
+        return [(length, -neg_start) for length, neg_start in sorted(self._top, reverse=True)]
+
+    def summary(self) -> "SessionTracker":
+        """
+        Get the totals including the session that is still open.
+
+        Returns:
+            SessionTracker: A copy in which the last session is finished
+        """
+        done = SessionTracker(self.gap_ms, self.top_n)
+        done.in_order = self.in_order
+        done.count = self.count
+        done.total_ms = self.total_ms
+        done.longest_ms = self.longest_ms
+        done.longest_start = self.longest_start
+        done.year_counts = self.year_counts.copy()
+        done.year_ms = self.year_ms.copy()
+        done.month_counts = self.month_counts.copy()
+        done.month_ms = self.month_ms.copy()
+        done.length_counts = list(self.length_counts)
+        done._top = list(self._top)
+        if self._last is not None:
+            done._start, done._last = self._start, self._last
+            done._finish()
+        return done
+
+
+def track_sessions(play_times: Iterable[int], gap_ms: int = SESSION_GAP_MS, in_order: bool = False,
+                   top_n: int = TOP_SESSIONS) -> SessionTracker:
+    """
+    Split plays into listening sessions in one pass.
+
+    Args:
+        play_times (Iterable[int]): Epoch milliseconds of the plays
+        gap_ms (int): Plays further apart than this many milliseconds start a new session
+        in_order (bool): Whether the plays are known to be in timestamp order.
+            They are sorted first otherwise.
+        top_n (int): Number of longest sessions kept
+
+    Returns:
+        SessionTracker: The finished totals (see SessionTracker.summary)
+    """
+    if not in_order:
+        play_times = sorted(play_times)
+    return SessionTracker(gap_ms, top_n).add_all(play_times).summary()
@@ -8,14 +8,22 @@ import calendar
 import logging
 from collections import Counter
 from datetime import datetime, date, timedelta
-from typing import Dict, List, Any, Set, DefaultDict
+from typing import Dict, Any, Set, DefaultDict, Iterable, List, Optional
+
+from accumulator import ListeningAccumulator
+from day_index import DayIndex
+from entry_store import ms_to_datetime
+from running_stats import SESSION_GAP_MS, SESSION_LENGTH_LIMITS, epoch_day_to_date, track_sessions
+from stats_backends import NUMPY_BACKEND, PYTHON_BACKEND, numpy_busiest_week, numpy_gini_sums, numpy_sessions
+from stats_registry import LazyStats, StatsRegistry
 
 def calculate_basic_stats(
     first_ts: datetime,
     first_entry: Dict[str, Any],
     last_ts: datetime,
     last_entry: Dict[str, Any],
-    dates_set: Set[date]
+    days: DayIndex,
+    until: Optional[date] = None
 ) -> Dict[str, Any]:
     """
     Calculate basic statistics about the listening history.
@@ -25,7 +33,8 @@ def calculate_basic_stats(
         first_entry: First entry
         last_ts: Last timestamp
         last_entry: Last entry
-        dates_set: Set of dates played
+        days: Plays per listening day
+        until: Day after the end of the period the days are counted in, None for today
 
     Returns:
         Dict containing basic statistics:
@@ -38,7 +47,7 @@ def calculate_basic_stats(
             - last_desc: Last play description
     """
     try:
-        today = date.today()
+        today = until or date.today()
 
         # Handle case where no valid entries were found
         if first_ts is None:
@@ -54,7 +63,7 @@ def calculate_basic_stats(
             }
 
         days_since_first = (today - first_ts.date()).days
-        days_played = len(dates_set)
+        days_played = days.days_played()
         pct_days = days_played / days_since_first * 100 if days_since_first > 0 else 0
 
         # Format first entry details with fallbacks for missing data
@@ -187,7 +196,8 @@ def calculate_milestone_stats(
     daily_counts: Counter,
     all_data: Dict[str, DefaultDict[str, int]],
     yearly: DefaultDict[int, Dict[str, DefaultDict[str, int]]],
-    monthly_counts: Counter
+    monthly_counts: Counter,
+    backend: str = PYTHON_BACKEND
 ) -> Dict[str, Any]:
     """
     Calculate milestone statistics.
@@ -197,6 +207,7 @@ def calculate_milestone_stats(
         all_data: Aggregated data for all years
         yearly: Dictionary of yearly statistics
         monthly_counts: Counter of plays per month
+        backend: Name of the statistics backend (see stats_backends)
 
     Returns:
         Dict containing milestone statistics:
@@ -262,14 +273,20 @@ def calculate_milestone_stats(
 
         # Most popular week
         try:
-            weekly_counts = Counter()
-            for d, cnt in daily_counts.items():
-                yr, wk, _ = d.isocalendar()
-                weekly_counts[(yr, wk)] += cnt
-
-            if weekly_counts:
-                (wy, ww), week_plays = weekly_counts.most_common(1)[0]
-                week_start = datetime.strptime(f"{wy}-W{ww}-1", "%G-W%V-%u").date()
+            if backend == NUMPY_BACKEND and daily_counts:
+                week_start, week_plays = numpy_busiest_week(list(daily_counts), list(daily_counts.values()))
+            else:
+                weekly_counts = Counter()
+                for d, cnt in daily_counts.items():
+                    yr, wk, _ = d.isocalendar()
+                    weekly_counts[(yr, wk)] += cnt
+
+                week_start = None
+                if weekly_counts:
+                    (wy, ww), week_plays = weekly_counts.most_common(1)[0]
+                    week_start = datetime.strptime(f"{wy}-W{ww}-1", "%G-W%V-%u").date()
+
+            if week_start is not None:
                 week_end = week_start + timedelta(days=6)
                 week_str = f"{week_start.strftime('%b %d')} – {week_end.strftime('%b %d, %Y')}"
             else:
@@ -319,7 +336,7 @@ def calculate_milestone_stats(
         }
 
 def calculate_pattern_stats(
-    dates_set: Set[date],
+    days: DayIndex,
     daily_counts: Counter,
     weekday_counts: Counter,
     hour_counts: Counter
@@ -328,7 +345,7 @@ def calculate_pattern_stats(
     Calculate listening pattern statistics.
 
     Args:
-        dates_set: Set of dates played
+        days: Plays per listening day
         daily_counts: Counter of plays per day
         weekday_counts: Counter of plays per weekday
         hour_counts: Counter of plays per hour
@@ -351,27 +368,18 @@ def calculate_pattern_stats(
             - ratio_pct: Weekend to weekday ratio percentage
     """
     result = {}
+    try:
+        runs = days.runs()
+    except Exception as e:
+        logging.error(f"Error finding listening streaks: {e}")
+        runs = {"max_streak": 0, "longest_hiatus": 0}
 
     # — Longest Listening Streak (with date range) —
     try:
-        sorted_dates = sorted(dates_set)
-        if sorted_dates:
-            # initialize
-            max_streak = curr_streak = 1
-            streak_start = streak_end = sorted_dates[0]
-            temp_start = sorted_dates[0]
-
-            for prev_day, next_day in zip(sorted_dates, sorted_dates[1:]):
-                if next_day == prev_day + timedelta(days=1):
-                    curr_streak += 1
-                else:
-                    curr_streak = 1
-                    temp_start = next_day
-                # record a new max
-                if curr_streak > max_streak:
-                    max_streak = curr_streak
-                    streak_start = temp_start
-                    streak_end = next_day
+        if runs["max_streak"]:
+            max_streak = runs["max_streak"]
+            streak_start = epoch_day_to_date(runs["streak_start"])
+            streak_end = epoch_day_to_date(runs["streak_end"])
         else:
             logging.warning("No dates found, using default values for streak stats")
             max_streak = 0
@@ -387,8 +395,9 @@ def calculate_pattern_stats(
 
     # — Average Plays per Active Day —
     try:
-        if dates_set:
-            avg_plays = sum(daily_counts.values()) / len(dates_set)
+        days_played = days.days_played()
+        if days_played:
+            avg_plays = sum(daily_counts.values()) / days_played
         else:
             avg_plays = 0
     except Exception as e:
@@ -444,23 +453,10 @@ def calculate_pattern_stats(
 
     # ─── Longest Hiatus ───────────────────────────────────────
     try:
-        longest_hiatus = 0
-        hiatus_start = hiatus_end = None
-
-        # Only compute if we have enough dates
-        if len(sorted_dates) > 1:
-            for prev_day, next_day in zip(sorted_dates, sorted_dates[1:]):
-                gap = (next_day - prev_day).days - 1
-                if gap > longest_hiatus:
-                    longest_hiatus = gap
-                    hiatus_start = prev_day + timedelta(days=1)
-                    hiatus_end = next_day - timedelta(days=1)
-
-            if longest_hiatus > 0:
-                hi_start_str = hiatus_start.strftime("%b %d, %Y")
-                hi_end_str = hiatus_end.strftime("%b %d, %Y")
-            else:
-                hi_start_str = hi_end_str = None
+        longest_hiatus = runs["longest_hiatus"]
+        if longest_hiatus > 0:
+            hi_start_str = epoch_day_to_date(runs["hiatus_start"]).strftime("%b %d, %Y")
+            hi_end_str = epoch_day_to_date(runs["hiatus_end"]).strftime("%b %d, %Y")
         else:
             hi_start_str = hi_end_str = None
     except Exception as e:
@@ -474,27 +470,73 @@ def calculate_pattern_stats(
 
     return result
 
+def format_hms(seconds: int) -> str:
+    """
+    Format a duration as hours:minutes:seconds.
+
+    Args:
+        seconds (int): The duration in whole seconds
+
+    Returns:
+        str: Formatted string in the format "HH:MM:SS", hours are not limited to 24
+    """
+    return f"{seconds // 3600:02}:{(seconds % 3600) // 60:02}:{seconds % 60:02}"
+
+def _average_hms(total_ms: int, count: int) -> str:
+    average = timedelta(milliseconds=total_ms) / count if count else timedelta()
+    return format_hms(int(average.total_seconds()))
+
+def _minutes_label(minutes: int) -> str:
+    return f"{minutes // 60} h" if minutes % 60 == 0 else f"{minutes} min"
+
+def session_length_labels() -> List[str]:
+    """
+    Get the labels of the session length groups.
+
+    Returns:
+        List[str]: One label per SESSION_LENGTH_LIMITS group, plus one for longer sessions
+    """
+    labels = [f"up to {_minutes_label(SESSION_LENGTH_LIMITS[0])}"]
+    for low, high in zip(SESSION_LENGTH_LIMITS, SESSION_LENGTH_LIMITS[1:]):
+        labels.append(f"{_minutes_label(low)} – {_minutes_label(high)}")
+    labels.append(f"over {_minutes_label(SESSION_LENGTH_LIMITS[-1])}")
+    return labels
+
 def calculate_session_stats(
-    play_times: List[datetime],
+    play_times: Iterable[int],
     play_counted: int,
     skip_count: int,
-    offline_count: int
+    offline_count: int,
+    plays_in_order: bool = False,
+    backend: str = PYTHON_BACKEND,
+    gap_ms: int = SESSION_GAP_MS
 ) -> Dict[str, Any]:
     """
     Calculate listening session statistics.
 
     Args:
-        play_times: List of play timestamps
+        play_times: Epoch milliseconds of the counted plays
         play_counted: Total number of plays counted
         skip_count: Number of skipped tracks
         offline_count: Number of offline plays
+        plays_in_order: Whether play_times is known to be in timestamp order.
+            The play times are sorted first otherwise.
+        backend: Name of the statistics backend (see stats_backends)
+        gap_ms: Plays further apart than this many milliseconds start a new session
 
     Returns:
         Dict containing session statistics:
+            - session_gap_min: Gap between sessions in minutes
             - num_sessions: Number of listening sessions
             - avg_str: Average session length
             - long_str: Longest single session
             - long_date_str: Date of the longest session
+            - top_sessions: (length, date) strings of the longest sessions, longest first
+            - session_lengths: (label, number of sessions) of each session length group
+            - session_years: Number of sessions and average length string per year, with
+              (month name, number of sessions, average length string) for each month of the year
+            - session_month_str: Month with the most sessions
+            - session_month_count: Number of sessions in that month
             - skip_count: Number of skipped tracks
             - play_counted: Total number of plays counted
             - skip_rate_pct: Skip rate percentage
@@ -507,31 +549,22 @@ def calculate_session_stats(
 
     # ─── Listening session stats ───────────────────────────
     try:
-        play_times.sort()
-        sessions = []
-        if play_times:
-            start = prev = play_times[0]
-            gap = timedelta(minutes=30)
-            for t in play_times[1:]:
-                if t - prev > gap:
-                    sessions.append((start, prev))
-                    start = t
-                prev = t
-            sessions.append((start, prev))
-
-        num_sessions = len(sessions)
-        durations = [(end - start) for start, end in sessions]
-        total_dur = sum(durations, timedelta())
+        if backend == NUMPY_BACKEND:
+            sessions = numpy_sessions(play_times, gap_ms)
+        else:
+            sessions = track_sessions(play_times, gap_ms, plays_in_order)
+
+        num_sessions = sessions.count
+        total_dur = timedelta(milliseconds=sessions.total_ms)
         avg_session = total_dur / num_sessions if num_sessions else timedelta()
 
-        if durations:
-            # find the longest session and its start
-            longest_dur = max(durations)
-            idx = durations.index(longest_dur)
-            longest_start, longest_end = sessions[idx]
+        if num_sessions:
+            # the longest session and its start
+            longest_dur = timedelta(milliseconds=sessions.longest_ms)
+            longest_start = ms_to_datetime(sessions.longest_start)
         else:
             longest_dur = timedelta()
-            longest_start = longest_end = None
+            longest_start = None
 
         # format durations
         avg_seconds = int(avg_session.total_seconds())
@@ -551,17 +584,46 @@ def calculate_session_stats(
             long_date_str = longest_start.strftime("%b %d, %Y")
         else:
             long_date_str = "N/A"
+
+        # Breakdowns, dates are only created for the sessions shown
+        top_sessions = [
+            (format_hms(length // 1000), ms_to_datetime(start).strftime("%b %d, %Y"))
+            for length, start in sessions.longest_sessions()
+        ]
+        session_lengths = list(zip(session_length_labels(), sessions.length_counts))
+        session_years = {
+            year: {"num_sessions": count, "avg_str": _average_hms(sessions.year_ms[year], count), "months": []}
+            for year, count in sorted(sessions.year_counts.items())
+        }
+        for (year, month), count in sorted(sessions.month_counts.items()):
+            session_years[year]["months"].append(
+                (calendar.month_abbr[month], count, _average_hms(sessions.month_ms[(year, month)], count)))
+        if sessions.month_counts:
+            (sm_y, sm_m), session_month_count = sessions.month_counts.most_common(1)[0]
+            session_month_str = f"{calendar.month_name[sm_m]} {sm_y}"
+        else:
+            session_month_str, session_month_count = "N/A", 0
     except Exception as e:
         logging.error(f"Error computing listening session stats: {e}")
         num_sessions = 0
         avg_str = "00:00:00"
         long_str = "00:00:00"
         long_date_str = "N/A"
+        top_sessions = []
+        session_lengths = list(zip(session_length_labels(), [0] * (len(SESSION_LENGTH_LIMITS) + 1)))
+        session_years = {}
+        session_month_str, session_month_count = "N/A", 0
 
+    result["session_gap_min"] = f"{gap_ms / 60_000:g}"
     result["num_sessions"] = num_sessions
     result["avg_str"] = avg_str
     result["long_str"] = long_str
     result["long_date_str"] = long_date_str
+    result["top_sessions"] = top_sessions
+    result["session_lengths"] = session_lengths
+    result["session_years"] = session_years
+    result["session_month_str"] = session_month_str
+    result["session_month_count"] = session_month_count
 
     # ─── Skip rate and offline/online ratio ─────────────────────
     try:
@@ -595,7 +657,8 @@ def calculate_session_stats(
 def calculate_track_stats(
     all_data: Dict[str, DefaultDict[str, int]],
     track_set: Set[str],
-    track_skip_counts: Counter
+    track_skip_counts: Counter,
+    backend: str = PYTHON_BACKEND
 ) -> Dict[str, Any]:
     """
     Calculate track-related statistics.
@@ -604,6 +667,7 @@ def calculate_track_stats(
         all_data: Aggregated data for all years
         track_set: Set of tracks
         track_skip_counts: Counter of skips per track
+        backend: Name of the statistics backend (see stats_backends)
 
     Returns:
         Dict containing track statistics:
@@ -688,11 +752,15 @@ def calculate_track_stats(
 
     # ─── Gini Coefficient of Artist Plays ─────────────────────
     try:
-        vals = sorted(all_data["artist_counts"].values())
-        n = len(vals)
-        if n and sum(vals):
+        if backend == NUMPY_BACKEND:
+            n, total, weighted = numpy_gini_sums(all_data["artist_counts"].values())
+        else:
+            vals = sorted(all_data["artist_counts"].values())
+            n = len(vals)
+            total = sum(vals)
             weighted = sum((i + 1) * v for i, v in enumerate(vals))
-            gini = (2 * weighted) / (n * sum(vals)) - (n + 1) / n
+        if n and total:
+            gini = (2 * weighted) / (n * total) - (n + 1) / n
         else:
             gini = 0
     except Exception as e:
@@ -886,100 +954,149 @@ def calculate_personality_type(stats: Dict[str, Any]) -> Dict[str, Any]:
         logging.error(f"Error computing personality type: {e}")
         return {
             "personality_type": "Undefined",
-            "personality_desc": "We couldn't determine your listening personality type."
+            "personality_desc": "We couldn't determine your listening personality type.",
+            "personality_scores": {},
+            "personality_percentages": {}
         }
 
+# Statistic groups, with the inputs each reads and the statistics it produces.
+# The sources are acc, all_data, yearly, backend, session_gap_ms and until (see calculate_all_stats).
+STATS = StatsRegistry()
+
+
+@STATS.register("basic", inputs=["acc", "until"], outputs=[
+    "days_since_first", "days_played", "pct_days", "first_str", "first_desc", "last_str", "last_desc"])
+def _basic_group(acc: ListeningAccumulator, until: Optional[date]) -> Dict[str, Any]:
+    return calculate_basic_stats(acc.first_ts, acc.first_entry, acc.last_ts, acc.last_entry, acc.days, until)
+
+
+@STATS.register("library", inputs=["acc", "yearly"], outputs=[
+    "artists_count", "one_hits", "pct_one_hits", "every_year_list", "every_year_count", "albums_count",
+    "albums_per_artist", "tracks_count"])
+def _library_group(acc: ListeningAccumulator, yearly: Dict[int, Dict[str, DefaultDict[str, int]]]) -> Dict[str, Any]:
+    return calculate_library_stats(acc.artist_set, acc.album_set, acc.track_set, acc.artist_tracks, yearly)
+
+
+@STATS.register("milestone", inputs=["acc", "all_data", "yearly", "backend"], outputs=[
+    "edd", "next_need", "art_cut", "pop_year", "pop_year_plays", "pop_mon_str", "pop_mon_plays", "week_str",
+    "week_plays", "day_str", "day_plays"])
+def _milestone_group(acc: ListeningAccumulator, all_data: Dict[str, DefaultDict[str, int]],
+                     yearly: Dict[int, Dict[str, DefaultDict[str, int]]], backend: str) -> Dict[str, Any]:
+    return calculate_milestone_stats(acc.daily_counts, all_data, yearly, acc.monthly_counts, backend)
+
+
+@STATS.register("pattern", inputs=["acc"], outputs=[
+    "max_streak", "streak_start", "streak_end", "avg_plays", "wd_name", "wd_count", "peak_hour_str", "hour_count",
+    "weekend", "weekday", "ratio_pct", "longest_hiatus", "hi_start_str", "hi_end_str"])
+def _pattern_group(acc: ListeningAccumulator) -> Dict[str, Any]:
+    return calculate_pattern_stats(acc.days, acc.daily_counts, acc.weekday_counts, acc.hour_counts)
+
+
+@STATS.register("session", inputs=["acc", "backend", "session_gap_ms"], outputs=[
+    "session_gap_min", "num_sessions", "avg_str", "long_str", "long_date_str", "top_sessions", "session_lengths",
+    "session_years", "session_month_str", "session_month_count", "skip_count", "play_counted", "skip_rate_pct",
+    "offline_count", "online_count", "offline_ratio_pct", "ratio_str"])
+def _session_group(acc: ListeningAccumulator, backend: str, session_gap_ms: int) -> Dict[str, Any]:
+    return calculate_session_stats(acc.play_times, acc.play_counted, acc.skip_count, acc.offline_count,
+                                   acc.plays_in_order, backend, session_gap_ms)
+
+
+@STATS.register("track", inputs=["acc", "all_data", "backend"], outputs=[
+    "total_ms", "total_plays", "total_time_str", "avg_play_ms", "avg_play_str", "unique_tracks", "unique_ratio_pct",
+    "most_skipped", "skip_ct", "gini"])
+def _track_group(acc: ListeningAccumulator, all_data: Dict[str, DefaultDict[str, int]], backend: str) -> Dict[str, Any]:
+    return calculate_track_stats(all_data, acc.track_set, acc.named_track_skip_counts(), backend)
+
+
+@STATS.register("personality", inputs=[
+    "unique_ratio_pct", "gini", "skip_rate_pct", "ratio_pct", "artists_count", "pct_one_hits", "avg_play_ms",
+    "total_plays", "days_played", "days_since_first", "max_streak", "tracks_count", "albums_count"], outputs=[
+    "personality_type", "personality_desc", "personality_scores", "personality_percentages"])
+def _personality_group(**stats: Any) -> Dict[str, Any]:
+    return calculate_personality_type(stats)
+
+
 def calculate_all_stats(
-    yearly: DefaultDict[int, Dict[str, DefaultDict[str, int]]],
+    acc: ListeningAccumulator,
     all_data: Dict[str, DefaultDict[str, int]],
-    dates_set: Set[date],
-    first_ts: datetime,
-    first_entry: Dict[str, Any],
-    last_ts: datetime,
-    last_entry: Dict[str, Any],
-    artist_set: Set[str],
-    album_set: Set[str],
-    track_set: Set[str],
-    artist_tracks: DefaultDict[str, Set[str]],
-    daily_counts: Counter,
-    monthly_counts: Counter,
-    weekday_counts: Counter,
-    hour_counts: Counter,
-    play_times: List[datetime],
-    play_counted: int,
-    skip_count: int,
-    offline_count: int,
-    track_skip_counts: Counter
-) -> Dict[str, Any]:
+    yearly: Dict[int, Dict[str, DefaultDict[str, int]]],
+    backend: str = PYTHON_BACKEND,
+    session_gap_ms: int = SESSION_GAP_MS,
+    names: Optional[Iterable[str]] = None,
+    workers: int = 1,
+    until: Optional[date] = None
+) -> LazyStats:
     """
-    Calculate all statistics for the Spotify streaming history.
+    Calculate statistics for the Spotify streaming history.
+
+    Statistics are calculated by group (see STATS) the first time one of them is
+    read, so only the groups that are used cost any time.
 
     Args:
-        yearly: Dictionary of yearly statistics
+        acc: Accumulator holding the aggregated listening data
         all_data: Aggregated data for all years
-        dates_set: Set of dates played
-        first_ts: First timestamp
-        first_entry: First entry
-        last_ts: Last timestamp
-        last_entry: Last entry
-        artist_set: Set of artists
-        album_set: Set of albums
-        track_set: Set of tracks
-        artist_tracks: Dictionary mapping artists to their tracks
-        daily_counts: Counter of plays per day
-        monthly_counts: Counter of plays per month
-        weekday_counts: Counter of plays per weekday
-        hour_counts: Counter of plays per hour
-        play_times: List of play timestamps
-        play_counted: Total number of plays counted
-        skip_count: Number of skipped tracks
-        offline_count: Number of offline plays
-        track_skip_counts: Counter of skips per track
+        yearly: Yearly statistics keyed by name, as returned by acc.named_yearly()
+        backend: Name of an available statistics backend (see stats_backends)
+        session_gap_ms: Plays further apart than this many milliseconds start a new session
+        names: Groups or statistics to calculate right away, None for none
+        workers: Number of threads the groups calculated right away are spread over
+        until: Day after the end of the period the days since the first play are counted in, None for today
+
+    Returns:
+        LazyStats: Mapping of statistic names to values
+
+    Raises:
+        ValueError: If one of the names is not a group or statistic
+    """
+    stats = LazyStats(STATS, {
+        "acc": acc,
+        "all_data": all_data,
+        "yearly": yearly,
+        "backend": backend,
+        "session_gap_ms": session_gap_ms,
+        "until": until,
+    })
+    if names is not None:
+        keys = STATS.resolve(names)
+        if workers > 1:
+            # Build the shared play counts once, before the groups read them from several threads
+            acc.counted()
+        stats.compute(keys, workers)
+    return stats
+
+
+def calculate_year_stats(
+    acc: ListeningAccumulator,
+    yearly: Dict[int, Dict[str, DefaultDict[str, int]]],
+    backend: str = PYTHON_BACKEND,
+    session_gap_ms: int = SESSION_GAP_MS,
+    names: Optional[Iterable[str]] = None,
+    workers: int = 1
+) -> Dict[int, LazyStats]:
+    """
+    Calculate the statistics of each year of the Spotify streaming history.
+
+    Each year's statistics come from the year's partition of the accumulator
+    (see ListeningAccumulator.year_view), so the records are not processed
+    again. Sessions and streaks end at the turn of the year.
+
+    Args:
+        acc: Accumulator holding the aggregated listening data
+        yearly: Yearly statistics keyed by name, as returned by acc.named_yearly()
+        backend: Name of an available statistics backend (see stats_backends)
+        session_gap_ms: Plays further apart than this many milliseconds start a new session
+        names: Groups or statistics to calculate right away, None for none
+        workers: Number of threads the groups calculated right away are spread over
 
     Returns:
-        Dict[str, Any]: Dictionary containing all statistics
+        Dict[int, LazyStats]: Mapping of statistic names to values for each year
     """
-    # Calculate basic stats
-    basic_stats = calculate_basic_stats(
-        first_ts, first_entry, last_ts, last_entry, dates_set
-    )
-
-    # Calculate library stats
-    library_stats = calculate_library_stats(
-        artist_set, album_set, track_set, artist_tracks, yearly
-    )
-
-    # Calculate milestone stats
-    milestone_stats = calculate_milestone_stats(
-        daily_counts, all_data, yearly, monthly_counts
-    )
-
-    # Calculate pattern stats
-    pattern_stats = calculate_pattern_stats(
-        dates_set, daily_counts, weekday_counts, hour_counts
-    )
-
-    # Calculate session stats
-    session_stats = calculate_session_stats(
-        play_times, play_counted, skip_count, offline_count
-    )
-
-    # Calculate track stats
-    track_stats = calculate_track_stats(
-        all_data, track_set, track_skip_counts
-    )
-
-    # Combine all stats into a single dictionary
-    all_stats = {}
-    all_stats.update(basic_stats)
-    all_stats.update(library_stats)
-    all_stats.update(milestone_stats)
-    all_stats.update(pattern_stats)
-    all_stats.update(session_stats)
-    all_stats.update(track_stats)
-
-    # Calculate personality type
-    personality_stats = calculate_personality_type(all_stats)
-    all_stats.update(personality_stats)
-
-    return all_stats
+    today = date.today()
+    year_stats = {}
+    for year in sorted(yearly):
+        tables = yearly[year]
+        year_stats[year] = calculate_all_stats(
+            acc.year_view(year), tables, {year: tables}, backend, session_gap_ms, names, workers,
+            min(date(year + 1, 1, 1), today)
+        )
+    return year_stats
@@ -0,0 +1,194 @@
+"""
+Statistics backends for Spotify Extended Streaming History.
+
+The statistics are calculated in pure Python by default. When NumPy is
+installed, the parts that grow with the number of plays or artists (listening
+sessions, the Gini coefficient and the weekly play counts) can be calculated
+on integer arrays instead, which is many times faster on large histories.
+Both backends give exactly the same results: the NumPy code only produces the
+integer sums the Python code would, and the final formulas are shared.
+
+Backends are selected by name, like the JSON decoders (see json_backends).
+"""
+import heapq
+import logging
+from array import array
+from datetime import date
+from typing import Iterable, List, Sequence, Tuple
+
+from entry_store import MS_PER_DAY
+from running_stats import SESSION_LENGTH_LIMITS_MS, TOP_SESSIONS, SessionTracker
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Name of the pure Python backend, used when nothing else is requested
+PYTHON_BACKEND = "python"
+
+# Name of the NumPy backend
+NUMPY_BACKEND = "numpy"
+
+# Picks NumPy when it is installed
+AUTO_BACKEND = "auto"
+
+# Backend names, fastest first
+STATS_BACKENDS = [NUMPY_BACKEND, PYTHON_BACKEND]
+
+
+def available_backends() -> List[str]:
+    """
+    List the statistics backends that can be used on this system.
+
+    Returns:
+        List[str]: Names of the installed backends, fastest first
+    """
+    return [name for name in STATS_BACKENDS if name != NUMPY_BACKEND or np is not None]
+
+
+def backend_version(name: str) -> str:
+    """
+    Get a description of a backend including its version.
+
+    Args:
+        name (str): Backend name
+
+    Returns:
+        str: For example "numpy 1.26.4"
+    """
+    if name == NUMPY_BACKEND and np is not None:
+        return f"numpy {np.__version__}"
+    if name == PYTHON_BACKEND:
+        return "python (standard library)"
+    return name
+
+
+def resolve_backend(name: str) -> str:
+    """
+    Turn a requested backend name into the backend that will actually be used.
+
+    "auto" picks NumPy when it is installed. A backend that is not installed
+    falls back to pure Python with a warning.
+
+    Args:
+        name (str): Requested backend name, or "auto"
+
+    Returns:
+        str: Name of an available backend
+    """
+    available = available_backends()
+    if name == AUTO_BACKEND:
+        return available[0]
+    if name in available:
+        return name
+    if name in STATS_BACKENDS:
+        logging.warning(f"⚠️ Statistics backend '{name}' is not installed, using '{PYTHON_BACKEND}' instead.")
+    else:
+        logging.warning(f"⚠️ Unknown statistics backend '{name}', using '{PYTHON_BACKEND}' instead.")
+    return PYTHON_BACKEND
+
+
+def _int64_array(values: Iterable[int]) -> "np.ndarray":
+    if isinstance(values, array) and values.typecode == "q":
+        return np.frombuffer(values, dtype=np.int64)
+    return np.fromiter(values, dtype=np.int64)
+
+
+def numpy_sessions(play_times: Iterable[int], gap_ms: int, top_n: int = TOP_SESSIONS) -> SessionTracker:
+    """
+    Split plays into listening sessions with array operations.
+
+    Args:
+        play_times (Iterable[int]): Epoch milliseconds of the plays, in any order
+        gap_ms (int): Plays further apart than this many milliseconds start a new session
+        top_n (int): Number of longest sessions kept
+
+    Returns:
+        SessionTracker: Finished totals, the same as running_stats.track_sessions gives
+    """
+    sessions = SessionTracker(gap_ms, top_n)
+    ts = _int64_array(play_times)
+    if not ts.size:
+        return sessions
+    if (ts[1:] < ts[:-1]).any():
+        ts = np.sort(ts)
+
+    breaks = np.flatnonzero(np.diff(ts) > gap_ms)
+    starts = ts[np.concatenate(([0], breaks + 1))]
+    ends = ts[np.concatenate((breaks, [ts.size - 1]))]
+    lengths = ends - starts
+
+    # argmax keeps the first of equally long sessions, like SessionTracker
+    longest = int(lengths.argmax())
+    sessions.count = int(lengths.size)
+    sessions.total_ms = int(lengths.sum())
+    sessions.longest_ms = int(lengths[longest])
+    sessions.longest_start = int(starts[longest])
+
+    # Sessions are in start order, so each month is one run of equal values
+    months = (starts // MS_PER_DAY).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    month_starts = np.concatenate(([0], np.flatnonzero(np.diff(months)) + 1))
+    month_counts = np.diff(np.append(month_starts, months.size))
+    month_ms = np.add.reduceat(lengths, month_starts)
+    for month, count, ms in zip(months[month_starts].tolist(), month_counts.tolist(), month_ms.tolist()):
+        # Months since 1970-01
+        key = (1970 + month // 12, month % 12 + 1)
+        sessions.month_counts[key] = count
+        sessions.month_ms[key] = ms
+        sessions.year_counts[key[0]] += count
+        sessions.year_ms[key[0]] += ms
+
+    groups = np.searchsorted(SESSION_LENGTH_LIMITS_MS, lengths, side="left")
+    sessions.length_counts = np.bincount(groups, minlength=len(SESSION_LENGTH_LIMITS_MS) + 1).tolist()
+
+    # Longest first, earlier first among equally long sessions
+    top = np.lexsort((starts, -lengths))[:top_n]
+    sessions._top = [(int(lengths[i]), -int(starts[i])) for i in top]
+    heapq.heapify(sessions._top)
+    return sessions
+
+
+def numpy_gini_sums(values: Iterable[int]) -> Tuple[int, int, int]:
+    """
+    Get the sums the Gini coefficient is calculated from, with array operations.
+
+    Args:
+        values (Iterable[int]): Play counts
+
+    Returns:
+        Tuple[int, int, int]: Number of values, their total, and the sum of each
+            value times its rank (1 for the smallest) in ascending order
+    """
+    vals = np.sort(_int64_array(values))
+    n = int(vals.size)
+    if not n:
+        return 0, 0, 0
+    # Each value is counted once for every rank at or above it:
+    # sum((i + 1) * v[i]) == n * total - sum of the running totals before each value
+    running = np.cumsum(vals)
+    total = int(running[-1])
+    weighted = n * total - int(running[:-1].sum())
+    return n, total, weighted
+
+
+def numpy_busiest_week(days: Sequence[date], counts: Sequence[int]) -> Tuple[date, int]:
+    """
+    Find the ISO week (Monday to Sunday) with the most plays, with array operations.
+
+    Args:
+        days (Sequence[date]): Listening days
+        counts (Sequence[int]): Plays of each day
+
+    Returns:
+        Tuple[date, int]: Monday of the busiest week and its plays. Of equally busy
+            weeks the one whose first day comes first in days is picked, like
+            Counter.most_common
+    """
+    # Day ordinal 1 (0001-01-01) is a Monday, so this numbers the ISO weeks
+    weeks = (np.fromiter((day.toordinal() for day in days), dtype=np.int64, count=len(days)) - 1) // 7
+    first_week = int(weeks.min())
+    totals = np.bincount(weeks - first_week, weights=np.asarray(counts, dtype=np.int64)).astype(np.int64)
+    week_totals = totals[weeks - first_week]
+    best = int(np.flatnonzero(week_totals == week_totals.max())[0])
+    return date.fromordinal(int(weeks[best]) * 7 + 1), int(week_totals[best])
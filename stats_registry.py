@@ -0,0 +1,232 @@
+"""
+Lazy statistics registry for Spotify Extended Streaming History.
+
+Statistics are registered in groups. Each group declares the inputs it reads
+(sources such as the accumulator, or outputs of other groups) and the
+statistics it produces. A LazyStats mapping only runs a group the first time
+one of its statistics is read and keeps the results, so a caller that needs a
+few values does not pay for the rest, and expensive or custom statistics can
+be registered without slowing down every run.
+
+Groups that do not depend on each other can also be run ahead of time on a
+pool of worker threads, one dependency level at a time.
+"""
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Set
+
+
+class StatGroup:
+    """
+    A function calculating several statistics from its inputs.
+
+    Attributes:
+        name: Name of the group
+        func: Called with each input as a keyword argument, returns a dictionary of statistics
+        inputs: Names of the sources or statistics the group reads
+        outputs: Names of the statistics the group produces
+    """
+
+    __slots__ = ("name", "func", "inputs", "outputs")
+
+    def __init__(self, name: str, func: Callable[..., Dict[str, Any]], inputs: List[str], outputs: List[str]):
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.outputs = outputs
+
+
+class StatsRegistry:
+    """
+    The registered statistic groups, and which group produces each statistic.
+    """
+
+    def __init__(self):
+        """
+        Create an empty registry.
+        """
+        self.groups: Dict[str, StatGroup] = {}
+        self._providers: Dict[str, StatGroup] = {}
+
+    def register(self, name: str, inputs: Iterable[str], outputs: Iterable[str]) -> Callable:
+        """
+        Register a group, used as a decorator on the function calculating it.
+
+        Args:
+            name (str): Name of the group
+            inputs (Iterable[str]): Names of the sources or statistics the function reads
+            outputs (Iterable[str]): Names of the statistics the function returns
+
+        Returns:
+            Callable: Decorator that registers the function and returns it unchanged
+
+        Raises:
+            ValueError: If the group name or one of the statistics is already registered
+        """
+        def decorator(func: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+            group = StatGroup(name, func, list(inputs), list(outputs))
+            if name in self.groups:
+                raise ValueError(f"Statistic group '{name}' is already registered")
+            for key in group.outputs:
+                if key in self._providers:
+                    raise ValueError(f"Statistic '{key}' is already produced by '{self._providers[key].name}'")
+            self.groups[name] = group
+            for key in group.outputs:
+                self._providers[key] = group
+            return func
+        return decorator
+
+    def provider(self, key: str) -> StatGroup:
+        """
+        Get the group that produces a statistic.
+
+        Args:
+            key (str): Name of the statistic
+
+        Returns:
+            StatGroup: The group
+
+        Raises:
+            KeyError: If no group produces the statistic
+        """
+        return self._providers[key]
+
+    def keys(self) -> List[str]:
+        """
+        List every registered statistic.
+
+        Returns:
+            List[str]: Names of the statistics, in registration order
+        """
+        return list(self._providers)
+
+    def resolve(self, names: Iterable[str]) -> List[str]:
+        """
+        Turn group and statistic names into the statistics they stand for.
+
+        Args:
+            names (Iterable[str]): Names of groups (all their statistics) or single statistics
+
+        Returns:
+            List[str]: Names of the statistics, without duplicates
+
+        Raises:
+            ValueError: If a name is neither a group nor a statistic
+        """
+        keys = []
+        for name in names:
+            if name in self.groups:
+                keys.extend(self.groups[name].outputs)
+            elif name in self._providers:
+                keys.append(name)
+            else:
+                raise ValueError(f"Unknown statistic '{name}'. Groups: {', '.join(self.groups)}")
+        return list(dict.fromkeys(keys))
+
+
+class LazyStats(Mapping):
+    """
+    Statistics of one set of sources, calculated on first access and then kept.
+
+    Reading a statistic runs its group, after the groups its inputs come from.
+    Iterating goes over every registered statistic, so turning the mapping into
+    a dict calculates them all.
+    """
+
+    def __init__(self, registry: StatsRegistry, sources: Dict[str, Any]):
+        """
+        Create the mapping without calculating anything.
+
+        Args:
+            registry (StatsRegistry): The statistic groups
+            sources (Dict[str, Any]): Values of the inputs that are not statistics
+        """
+        self.registry = registry
+        self._sources = sources
+        self._values: Dict[str, Any] = {}
+        self._done: Set[str] = set()
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._values:
+            return self._values[key]
+        if key in self._sources:
+            return self._sources[key]
+        group = self.registry.provider(key)
+        if group.name not in self._done:
+            self._store(group, group.func(**self._arguments(group)))
+        if key not in self._values:
+            raise KeyError(f"Statistic '{key}' was not produced by group '{group.name}'")
+        return self._values[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.registry.keys())
+
+    def __len__(self) -> int:
+        return len(self.registry.keys())
+
+    def _arguments(self, group: StatGroup) -> Dict[str, Any]:
+        return {name: self[name] for name in group.inputs}
+
+    def _store(self, group: StatGroup, result: Dict[str, Any]) -> None:
+        self._done.add(group.name)
+        for key in group.outputs:
+            if key in result:
+                self._values[key] = result[key]
+
+    def compute(self, keys: Iterable[str], workers: int = 1) -> "LazyStats":
+        """
+        Calculate statistics ahead of time.
+
+        The groups needed for the statistics and their inputs are run one
+        dependency level at a time. Groups of a level that do not depend on
+        each other are run on a pool of worker threads. With one worker, or a
+        level of a single group, they run in this thread instead.
+
+        Args:
+            keys (Iterable[str]): Names of the statistics to calculate
+            workers (int): Number of worker threads, 1 runs everything in this thread
+
+        Returns:
+            LazyStats: This mapping, for chaining
+
+        Raises:
+            KeyError: If a statistic is not registered
+            ValueError: If the groups depend on each other in a cycle
+        """
+        # Collect the groups that still have to run, including those the inputs come from
+        pending: Dict[str, StatGroup] = {}
+        todo = [key for key in keys if key not in self._sources]
+        while todo:
+            group = self.registry.provider(todo.pop())
+            if group.name in self._done or group.name in pending:
+                continue
+            pending[group.name] = group
+            todo.extend(name for name in group.inputs if name not in self._sources)
+
+        pool = None
+        try:
+            while pending:
+                ready = [
+                    group for group in pending.values()
+                    if all(self.registry.provider(name).name not in pending
+                           for name in group.inputs if name not in self._sources)
+                ]
+                if not ready:
+                    raise ValueError(f"Statistic groups depend on each other: {', '.join(pending)}")
+
+                if workers > 1 and len(ready) > 1:
+                    # Started on the first level with independent groups, never with more threads than groups
+                    if pool is None:
+                        pool = ThreadPoolExecutor(min(workers, len(pending)))
+                    futures = [(group, pool.submit(group.func, **self._arguments(group))) for group in ready]
+                    results = [(group, future.result()) for group, future in futures]
+                else:
+                    results = [(group, group.func(**self._arguments(group))) for group in ready]
+
+                for group, result in results:
+                    self._store(group, result)
+                    del pending[group.name]
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return self
@@ -0,0 +1,100 @@
+"""
+Tests for filter expressions checked while reading Spotify export files.
+"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_processing import read_spotify_json_file_cached
+from entry_filter import EntryFilter
+
+
+def _entry(ts, artist, track, album, platform="android", skipped=None):
+    return {
+        "ts": ts,
+        "ms_played": 200000,
+        "platform": platform,
+        "master_metadata_album_artist_name": artist,
+        "master_metadata_track_name": track,
+        "master_metadata_album_album_name": album,
+        "spotify_track_uri": "spotify:track:1" if track else None,
+        "skipped": skipped,
+        "offline": False,
+        "shuffle": True,
+    }
+
+
+ENTRIES = [
+    _entry("2020-01-01T10:00:00Z", "Radiohead", "Creep", "Pablo Honey"),
+    # The album is filled in as "Unknown Album" when normalized
+    _entry("2020-01-02T10:00:00Z", "Radiohead", "Nude", None),
+    _entry("2020-01-03T10:00:00Z", "Radiohead", "Reckoner", "", platform="ios", skipped=True),
+    # Nothing to fill in, the names stay null
+    _entry("2020-01-04T10:00:00Z", None, None, None),
+]
+
+
+class FilterPathTest(unittest.TestCase):
+    """
+    A filter must keep the same entries whether a file is read from JSON or from the entry cache.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.dir.name, "Streaming_History_Audio_2020.json")
+        with open(self.file, "w", encoding="utf-8") as f:
+            json.dump(ENTRIES, f)
+        self.cache_dir = os.path.join(self.dir.name, "cache")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def read(self, expression, cache_dir):
+        result = read_spotify_json_file_cached(self.file, cache_dir, entry_filter=EntryFilter(expression))
+        store = result["entries"]
+        return [store.record(i)["master_metadata_track_name"] for i in range(len(store))]
+
+    def test_cache_and_json_agree(self):
+        expressions = [
+            'album == null',
+            'album ~ "unknown"',
+            'album == "Unknown Album"',
+            'artist == null',
+            'skipped == null',
+            'not skipped',
+            'platform ~ "android" and album ~ "unknown"',
+        ]
+        for expression in expressions:
+            with self.subTest(expression=expression):
+                uncached = self.read(expression, None)
+                self.assertEqual(self.read(expression, self.cache_dir), uncached)  # cache miss
+                self.assertEqual(self.read(expression, self.cache_dir), uncached)  # cache hit
+
+    def test_filter_sees_normalized_values(self):
+        self.assertEqual(self.read('album ~ "unknown"', None), ["Nude", "Reckoner"])
+        self.assertEqual(self.read('album == null', None), [None])
+
+
+class ParserTest(unittest.TestCase):
+    """
+    Field names in filter expressions.
+    """
+
+    def test_field_names_ignore_case(self):
+        self.assertEqual(EntryFilter('Artist == "x"').fields, {"master_metadata_album_artist_name"})
+        self.assertEqual(EntryFilter('Platform ~ "android"').fields, {"platform"})
+        self.assertFalse(EntryFilter('TS >= 2020-01-01').needs_raw_entries)
+
+    def test_unknown_field_is_an_error(self):
+        for expression in ('artsit == "x"', 'foo', 'not bar and platform ~ "ios"'):
+            with self.subTest(expression=expression):
+                with self.assertRaises(ValueError):
+                    EntryFilter(expression)
+
+
+if __name__ == "__main__":
+    unittest.main()